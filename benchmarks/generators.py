@@ -0,0 +1,207 @@
+"""
+Synthetic TikTok payload generators for benchmarking.
+
+The generated payloads follow the shape of what TikTok sends back closely enough to exercise the
+parsing code paths, but all ids, names and text are random.
+"""
+import json
+import random
+import string
+
+import cv2
+import numpy as np
+
+
+def _random_text(rng, length):
+    return ''.join(rng.choice(string.ascii_letters + '     ') for _ in range(length)).strip()
+
+
+def _random_id(rng, digits=19):
+    return str(rng.randrange(10 ** (digits - 1), 10 ** digits))
+
+
+def make_user(rng, username=None):
+    user_id = _random_id(rng)
+    username = username or f"user_{rng.randrange(10 ** 8)}"
+    return {
+        'id': user_id,
+        'uniqueId': username,
+        'nickname': _random_text(rng, 12),
+        'secUid': 'MS4wLjABAAAA' + ''.join(rng.choice(string.ascii_letters + string.digits + '-_') for _ in range(64)),
+        'signature': _random_text(rng, 80),
+        'verified': rng.random() < 0.1,
+        'avatarThumb': f"https://p16-sign.tiktokcdn.com/{user_id}~c5_100x100.jpeg",
+    }
+
+
+def make_user_stats(rng):
+    return {
+        'followingCount': rng.randrange(2000),
+        'followerCount': rng.randrange(10 ** 7),
+        'heartCount': rng.randrange(10 ** 8),
+        'videoCount': rng.randrange(3000),
+        'diggCount': rng.randrange(10 ** 5),
+    }
+
+
+def make_video(rng, author=None, num_hashtags=3, num_mentions=1):
+    author = author or make_user(rng)
+    video_id = _random_id(rng)
+    hashtags = [_random_text(rng, 8).replace(' ', '') or 'fyp' for _ in range(num_hashtags)]
+    mentions = [make_user(rng) for _ in range(num_mentions)]
+    desc = _random_text(rng, 60) + ''.join(f" #{tag}" for tag in hashtags) + ''.join(
+        f" @{mention['uniqueId']}" for mention in mentions)
+    text_extra = [{'hashtagName': tag, 'hashtagId': _random_id(rng, 8), 'type': 1} for tag in hashtags]
+    text_extra += [
+        {'userId': mention['id'], 'userUniqueId': mention['uniqueId'], 'awemeId': '', 'type': 0}
+        for mention in mentions
+    ]
+    play_addr = f"https://v16-webapp-prime.tiktok.com/video/tos/useast2a/{video_id}/?a=1988&bti=abc"
+    return {
+        'id': video_id,
+        'desc': desc,
+        'createTime': str(rng.randrange(1_600_000_000, 1_700_000_000)),
+        'author': author,
+        'authorStats': make_user_stats(rng),
+        'music': {
+            'id': _random_id(rng),
+            'title': _random_text(rng, 20),
+            'authorName': author['uniqueId'],
+            'original': True,
+        },
+        'challenges': [{'id': _random_id(rng, 8), 'title': tag} for tag in hashtags],
+        'stats': {
+            'diggCount': rng.randrange(10 ** 6),
+            'shareCount': rng.randrange(10 ** 4),
+            'commentCount': rng.randrange(10 ** 4),
+            'playCount': rng.randrange(10 ** 7),
+        },
+        'textExtra': text_extra,
+        'video': {
+            'id': video_id,
+            'duration': rng.randrange(5, 180),
+            'playAddr': play_addr,
+            'downloadAddr': play_addr + '&download=1',
+            'bitrate': rng.randrange(300_000, 2_000_000),
+            'width': 576,
+            'height': 1024,
+        },
+    }
+
+
+def make_item_list_page(rng, num_items=35, cursor=0, has_more=True, author=None):
+    author = author or make_user(rng)
+    return {
+        'itemList': [make_video(rng, author=author) for _ in range(num_items)],
+        'cursor': str(cursor + num_items),
+        'hasMore': has_more,
+        'statusCode': 0,
+    }
+
+
+def make_comment(rng, aweme_id, num_replies=0):
+    commenter = make_user(rng)
+    comment = {
+        'cid': _random_id(rng),
+        'create_time': rng.randrange(1_600_000_000, 1_700_000_000),
+        'text': _random_text(rng, 50),
+        'text_extra': [],
+        'aweme_id': aweme_id,
+        'comment_language': 'en',
+        'digg_count': rng.randrange(10 ** 4),
+        'reply_comment_total': num_replies,
+        'user': {
+            'uid': commenter['id'],
+            'unique_id': commenter['uniqueId'],
+            'nickname': commenter['nickname'],
+        },
+    }
+    comment['reply_comment'] = [make_comment(rng, aweme_id) for _ in range(num_replies)] or None
+    return comment
+
+
+def make_comment_page(rng, num_comments=20, cursor=0, aweme_id=None, max_replies=3):
+    aweme_id = aweme_id or _random_id(rng)
+    return {
+        'comments': [make_comment(rng, aweme_id, num_replies=rng.randrange(max_replies + 1))
+                     for _ in range(num_comments)],
+        'cursor': cursor + num_comments,
+        'has_more': 1,
+        'total': 10 * num_comments,
+        'status_code': 0,
+    }
+
+
+def make_user_detail(rng, username=None):
+    return {
+        'userInfo': {
+            'user': make_user(rng, username=username),
+            'stats': make_user_stats(rng),
+        },
+        'statusCode': 0,
+    }
+
+
+def make_rehydration_html(rng, username=None, filler_kb=200):
+    """A profile page with its __UNIVERSAL_DATA_FOR_REHYDRATION__ script buried in filler markup."""
+    detail = make_user_detail(rng, username=username)
+    payload = {
+        '__DEFAULT_SCOPE__': {
+            'webapp.app-context': {'language': 'en', 'region': 'US'},
+            'webapp.user-detail': {'statusCode': 0, 'userInfo': detail['userInfo']},
+        }
+    }
+    filler_div = '<div class="css-1qb12g8-DivThreeColumnContainer"><span>' + _random_text(rng, 60) + '</span></div>'
+    filler = filler_div * max(1, (filler_kb * 1024) // len(filler_div))
+    return (
+        '<!DOCTYPE html><html lang="en"><head><meta charset="utf-8"><title>TikTok</title></head><body>'
+        + filler
+        + '<script id="__UNIVERSAL_DATA_FOR_REHYDRATION__" type="application/json">'
+        + json.dumps(payload)
+        + '</script>'
+        + filler
+        + '</body></html>'
+    )
+
+
+def _textured_image(np_rng, height, width):
+    noise = np_rng.integers(0, 255, size=(height // 8, width // 8, 3), dtype=np.uint8)
+    image = cv2.resize(noise, (width, height), interpolation=cv2.INTER_CUBIC)
+    return cv2.GaussianBlur(image, (5, 5), 0)
+
+
+def make_slide_captcha(seed=0, width=552, height=344, piece_size=110):
+    """
+    Returns (background, piece, x, y): encoded background with a shadowed hole, the encoded piece
+    that fits the hole, and the true top-left position of the hole.
+    """
+    np_rng = np.random.default_rng(seed)
+    background = _textured_image(np_rng, height, width)
+    x = int(np_rng.integers(piece_size, width - piece_size))
+    y = int(np_rng.integers(0, height - piece_size))
+    piece = background[y:y + piece_size, x:x + piece_size].copy()
+    background[y:y + piece_size, x:x + piece_size] = (background[y:y + piece_size, x:x + piece_size] * 0.4).astype(np.uint8)
+    _, background_bytes = cv2.imencode('.jpg', background)
+    _, piece_bytes = cv2.imencode('.png', piece)
+    return background_bytes.tobytes(), piece_bytes.tobytes(), x, y
+
+
+def make_whirl_captcha(seed=0, outer_size=340, inner_size=212):
+    """
+    Returns (outer, inner, angle): an encoded ring image, the encoded inner circle rotated out of
+    place, and the rotation in degrees applied to the inner circle.
+    """
+    np_rng = np.random.default_rng(seed)
+    outer = _textured_image(np_rng, outer_size, outer_size)
+    offset = (outer_size - inner_size) // 2
+    inner = outer[offset:offset + inner_size, offset:offset + inner_size].copy()
+    angle = float(np_rng.uniform(0, 360))
+    rotation = cv2.getRotationMatrix2D((inner_size / 2, inner_size / 2), angle, 1.0)
+    inner = cv2.warpAffine(inner, rotation, (inner_size, inner_size))
+    _, outer_bytes = cv2.imencode('.jpg', outer)
+    _, inner_bytes = cv2.imencode('.png', inner)
+    return outer_bytes.tobytes(), inner_bytes.tobytes(), angle
+
+
+def rng_for(seed=0):
+    return random.Random(seed)
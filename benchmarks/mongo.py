@@ -0,0 +1,133 @@
+"""
+Throughput and latency of the scraper's MongoDB writes, against a local mongod.
+
+Writes the same delete-and-insert pairs the scraper writes per post, once with blocking pymongo
+calls made from coroutines as the scraper used to, and once through the MongoWriter. Besides
+throughput and write latency, it measures how long the event loop was stalled, as that is what
+every browser sharing the loop waits for.
+
+Usage
+```
+python -m benchmarks.mongo --uri mongodb://localhost:27017/ --posts 20000 --workers 8
+```
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from datetime import datetime
+
+from pymongo import DeleteMany, InsertOne, MongoClient
+
+from pytok.mongo import MongoWriter
+
+DB_NAME = 'pytok_benchmark'
+COLLECTION = 'posts'
+
+
+def make_post(worker, index):
+    now = datetime.utcnow()
+    return {
+        'postId': f"{worker}-{index}",
+        'viewCount': index,
+        'teamId': 'benchmark',
+        'accountName': f"account{worker}",
+        'uploadDate': int(time.time()),
+        'createdAt': now,
+        'updatedAt': now,
+        'platform': 'tiktok',
+    }
+
+
+async def measure_loop_lag(stop, lags, interval=0.01):
+    """Records how much later than asked the event loop wakes up, while the writes run."""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lags.append(loop.time() - start - interval)
+
+
+async def run_blocking(uri, posts, workers):
+    collection = MongoClient(uri)[DB_NAME][COLLECTION]
+    latencies = []
+
+    async def worker(worker_id):
+        for index in range(posts // workers):
+            post = make_post(worker_id, index)
+            start = time.perf_counter()
+            collection.delete_many({'postId': post['postId'], 'teamId': post['teamId']})
+            collection.insert_one(post)
+            latencies.append(time.perf_counter() - start)
+            await asyncio.sleep(0)
+
+    await asyncio.gather(*(worker(worker_id) for worker_id in range(workers)))
+    collection.database.client.close()
+    return latencies
+
+
+async def run_writer(uri, posts, workers, pool_size):
+    writer = MongoWriter(uri, DB_NAME, write_concerns={COLLECTION: {'w': 1}}, max_pool_size=pool_size).start()
+    latencies = []
+
+    async def worker(worker_id):
+        for index in range(posts // workers):
+            post = make_post(worker_id, index)
+            start = time.perf_counter()
+            await writer.write(COLLECTION, [
+                DeleteMany({'postId': post['postId'], 'teamId': post['teamId']}),
+                InsertOne(post),
+            ], wait=True)
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(worker(worker_id) for worker_id in range(workers)))
+    await writer.close()
+    return latencies
+
+
+async def run(mode, uri, posts, workers, pool_size):
+    MongoClient(uri)[DB_NAME][COLLECTION].drop()
+    stop = asyncio.Event()
+    lags = []
+    lag_task = asyncio.create_task(measure_loop_lag(stop, lags))
+    start = time.perf_counter()
+    if mode == 'blocking':
+        latencies = await run_blocking(uri, posts, workers)
+    else:
+        latencies = await run_writer(uri, posts, workers, pool_size)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await lag_task
+    latencies.sort()
+    return {
+        'posts': len(latencies),
+        'posts_per_s': len(latencies) / elapsed,
+        'latency_p50_ms': statistics.median(latencies) * 1e3,
+        'latency_p99_ms': latencies[int(len(latencies) * 0.99) - 1] * 1e3,
+        'loop_lag_max_ms': max(lags, default=0) * 1e3,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MongoDB write benchmark")
+    parser.add_argument('--uri', default='mongodb://localhost:27017/', help="URI of the mongod to write to")
+    parser.add_argument('--posts', type=int, default=20_000, help="Number of posts to write in each mode")
+    parser.add_argument('--workers', type=int, default=8, help="Number of coroutines writing at once")
+    parser.add_argument('--pool-size', type=int, default=10, help="MongoWriter connection pool size")
+    parser.add_argument('--output', help="Path to save results to as JSON")
+    args = parser.parse_args()
+
+    results = {}
+    for mode in ('blocking', 'writer'):
+        results[mode] = asyncio.run(run(mode, args.uri, args.posts, args.workers, args.pool_size))
+        print(f"{mode:<10} " + ', '.join(f"{key} {value:.3g}" for key, value in results[mode].items()))
+    MongoClient(args.uri).drop_database(DB_NAME)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,246 @@
+"""
+Micro-benchmarks for pytok's CPU hot paths.
+
+Runs each benchmark on synthetic payloads, prints a summary, and saves the results to JSON so that
+runs on different commits can be compared.
+
+Usage
+```
+python -m benchmarks.run
+python -m benchmarks.run --filter captcha --output before.json
+python -m benchmarks.run --compare before.json
+```
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+from pytok import helpers, utils, captcha_solver
+from pytok.tiktok import PyTok
+from pytok.api.video import Video
+
+from . import generators
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+BENCHMARKS = {}
+ACCURACY = {}
+
+
+def benchmark(name):
+    """Registers a setup function returning the zero-argument callable to time."""
+    def decorator(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return decorator
+
+
+@benchmark('helpers.extract_tag_contents')
+def bench_extract_tag_contents():
+    html = generators.make_rehydration_html(generators.rng_for(0), filler_kb=200)
+    return lambda: helpers.extract_tag_contents(html)
+
+
+@benchmark('helpers.edit_url')
+def bench_edit_url():
+    url = ('https://www.tiktok.com/api/post/item_list/?WebIdLastTime=1700000000&aid=1988&app_language=en'
+           '&app_name=tiktok_web&browser_language=en-GB&browser_name=Mozilla&browser_online=true'
+           '&browser_platform=Win32&channel=tiktok_web&cookie_enabled=true&count=35&coverFormat=2&cursor=0'
+           '&device_id=7300000000000000000&device_platform=web_pc&focus_state=true&from_page=user'
+           '&history_len=3&language=en&os=windows&priority_region=&region=GB&screen_height=1080'
+           '&screen_width=1920&secUid=MS4wLjABAAAAabc&tz_name=Europe%2FLondon&webcast_language=en'
+           '&msToken=abcdefghijklmnopqrstuvwxyz0123456789&X-Bogus=DFSzswVLabc&_signature=_02B4Z6wo00001')
+    params = {'cursor': 1700000000000, 'secUid': 'MS4wLjABAAAAxyz', 'count': 35}
+    return lambda: helpers.edit_url(url, params)
+
+
+@benchmark('Video.__extract_from_data')
+def bench_video_extract_from_data():
+    rng = generators.rng_for(0)
+    page = generators.make_item_list_page(rng, num_items=35)
+    api = PyTok()
+    # never entered, so stop __del__ from trying to shut down a browser
+    api._is_context_manager = True
+
+    def run():
+        for item in page['itemList']:
+            Video(data=item, parent=api)
+    return run
+
+
+@benchmark('utils.get_video_df')
+def bench_get_video_df():
+    rng = generators.rng_for(0)
+    videos = [video for _ in range(10) for video in generators.make_item_list_page(rng)['itemList']]
+    return lambda: utils.get_video_df(videos)
+
+
+@benchmark('utils.get_comment_df')
+def bench_get_comment_df():
+    rng = generators.rng_for(0)
+    comments = [comment for _ in range(10) for comment in generators.make_comment_page(rng)['comments']]
+    return lambda: utils.get_comment_df(comments)
+
+
+@benchmark('utils.get_user_df')
+def bench_get_user_df():
+    rng = generators.rng_for(0)
+    entities = [generators.make_user_detail(rng) for _ in range(200)]
+    entities += [video for video in generators.make_item_list_page(rng, num_items=100)['itemList']]
+
+    def run():
+        # get_user_df merges stats into the entities it is given, so hand it fresh copies
+        return utils.get_user_df(json.loads(json.dumps(entities)))
+    return run
+
+
+@benchmark('captcha.PuzzleSolver.get_position')
+def bench_puzzle_solver():
+    background, piece, _, y = generators.make_slide_captcha(seed=0)
+    return lambda: captcha_solver.PuzzleSolver(background, piece, tip_y=y).get_position()
+
+
+@benchmark('captcha.PuzzleSolver.get_position.full_image')
+def bench_puzzle_solver_full_image():
+    background, piece, _, _ = generators.make_slide_captcha(seed=0)
+    return lambda: captcha_solver.PuzzleSolver(background, piece).get_position()
+
+
+@benchmark('captcha.whirl_solver')
+def bench_whirl_solver():
+    outer, inner, _ = generators.make_whirl_captcha(seed=0)
+    return lambda: captcha_solver.whirl_solver(outer, inner)
+
+
+def accuracy(name):
+    """Registers a function returning quality measurements, i.e. the hit rate of a solver."""
+    def decorator(measure):
+        ACCURACY[name] = measure
+        return measure
+    return decorator
+
+
+@accuracy('captcha.PuzzleSolver')
+def accuracy_puzzle_solver(samples=200, tolerance=5):
+    hits = 0
+    refreshes = 0
+    hits_full_image = 0
+    for seed in range(samples):
+        background, piece, x, y = generators.make_slide_captcha(seed=seed)
+        match = captcha_solver.PuzzleSolver(background, piece, tip_y=y).match()
+        if match.confidence < captcha_solver.MIN_SLIDE_CONFIDENCE:
+            refreshes += 1
+        elif abs(match.x - x) <= tolerance:
+            hits += 1
+        full_image_match = captcha_solver.PuzzleSolver(background, piece).match()
+        hits_full_image += abs(full_image_match.x - x) <= tolerance
+    return {
+        'samples': samples,
+        'hit_rate': hits / samples,
+        'refresh_rate': refreshes / samples,
+        'full_image_hit_rate': hits_full_image / samples,
+    }
+
+
+def time_benchmark(func, repeat, min_time):
+    # calibrate the number of calls per sample so that each sample takes at least min_time
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 1_000_000:
+            break
+        number *= 10 if elapsed < min_time / 10 else 2
+
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - start) / number)
+
+    return {
+        'number': number,
+        'repeat': repeat,
+        'min_s': min(samples),
+        'median_s': statistics.median(samples),
+        'mean_s': statistics.mean(samples),
+        'stdev_s': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+
+def run_benchmarks(name_filter=None, repeat=5, min_time=0.2):
+    results = {}
+    for name, setup in BENCHMARKS.items():
+        if name_filter and name_filter not in name:
+            continue
+        func = setup()
+        results[name] = time_benchmark(func, repeat, min_time)
+        print(f"{name:<40} {results[name]['median_s'] * 1e3:>10.3f} ms/call  (min {results[name]['min_s'] * 1e3:.3f} ms)")
+    accuracy_results = {}
+    for name, measure in ACCURACY.items():
+        if name_filter and name_filter not in name:
+            continue
+        accuracy_results[name] = measure()
+        print(f"{name:<40} " + ', '.join(f"{key} {value:.3g}" for key, value in accuracy_results[name].items()))
+    return {
+        'commit': _git_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'benchmarks': results,
+        'accuracy': accuracy_results,
+    }
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, 'r') as f:
+        baseline = json.load(f)
+    print(f"\nCompared to {baseline_path} ({baseline.get('commit')}):")
+    for name, result in results['benchmarks'].items():
+        if name not in baseline['benchmarks']:
+            continue
+        ratio = result['median_s'] / baseline['benchmarks'][name]['median_s']
+        print(f"{name:<40} {ratio:>6.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="pytok micro-benchmarks")
+    parser.add_argument('--filter', help="Only run benchmarks whose name contains this string")
+    parser.add_argument('--repeat', type=int, default=5, help="Number of timed samples per benchmark")
+    parser.add_argument('--min-time', type=float, default=0.2, help="Minimum seconds per sample")
+    parser.add_argument('--output', help="Path to save results to, defaults to benchmarks/results/<commit>.json")
+    parser.add_argument('--compare', help="Path of previously saved results to compare against")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.filter, args.repeat, args.min_time)
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{(results['commit'] or 'unknown')[:12]}.json")
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nSaved results to {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
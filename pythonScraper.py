@@ -10,7 +10,11 @@ import logging
 import sys
 import time
 from pytok.tiktok import PyTok
-from pymongo import MongoClient
+from pytok import metrics
+from pytok.sessions import SessionStore
+from pytok.cache import EntityCache
+from pytok.mongo import MongoWriter
+from pymongo import DeleteMany, InsertOne
 from datetime import datetime, timedelta
 import os
 import argparse
@@ -32,19 +36,36 @@ MONGO_URI = os.environ.get("MONGO_URI", "mongodb://localhost:27017/")
 DB_NAME = os.environ.get("DB_NAME", "tiktok_data")
 POSTS_COLLECTION = os.environ.get("POSTS_COLLECTION", "posts")
 CREATOR_COLLECTION = os.environ.get("CREATOR_COLLECTION", "Creator")
+# Most connections to keep open to MongoDB, shared by the writer thread and reads
+MONGO_POOL_SIZE = int(os.environ.get("MONGO_POOL_SIZE", "10"))
+# Write concern of posts, which are re-scraped daily so only need acknowledging by the primary
+POSTS_WRITE_CONCERN = os.environ.get("POSTS_WRITE_CONCERN", "1")
 
-# Initialize MongoDB connection
-mongo_client = MongoClient(MONGO_URI)
-db = mongo_client[DB_NAME]
-posts_collection = db[POSTS_COLLECTION]
-creator_collection = db[CREATOR_COLLECTION]
+# Created in main, so that command line arguments apply to it
+mongo_writer = None
 
 # Scraper Configuration
 NUM_BROWSERS = int(os.environ.get("NUM_BROWSERS", "2"))
 MAX_ACCOUNTS_PER_BROWSER = int(os.environ.get("MAX_ACCOUNTS_PER_BROWSER", "20"))
 HEADLESS = os.environ.get("HEADLESS", "true").lower() == "true"
+# Optional JSON-lines file to write per-phase latency spans to
+TRACE_FILE = os.environ.get("TRACE_FILE")
+# Port to serve Prometheus metrics on, set to 0 to disable
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "9100"))
+# Number of video result pages to fetch ahead while the current page is written to MongoDB
+PREFETCH_PAGES = int(os.environ.get("PREFETCH_PAGES", "2"))
+# Root URL of TikTok, point at a pytok.simulator instance for offline load tests
+TIKTOK_BASE_URL = os.environ.get("TIKTOK_BASE_URL", "https://www.tiktok.com/")
+# Scrape this many generated accounts instead of the ones in the Creator collection, for load tests
+SIMULATED_ACCOUNTS = int(os.environ.get("SIMULATED_ACCOUNTS", "0"))
+# Directory to save warmed-up browser sessions in, so new and rotated browsers start warm
+SESSION_DIR = os.environ.get("SESSION_DIR", "sessions")
+# SQLite file to cache user and video lookups in, so creators on several teams are scraped once a day, off by default
+ENTITY_CACHE_PATH = os.environ.get("ENTITY_CACHE_PATH", "")
 
 # Global state for browser management
+session_store = SessionStore(SESSION_DIR) if SESSION_DIR else None
+entity_cache = EntityCache(ENTITY_CACHE_PATH) if ENTITY_CACHE_PATH else None
 browsers = [None] * NUM_BROWSERS
 is_processing = [False] * NUM_BROWSERS
 browser_locks = [asyncio.Lock() for _ in range(NUM_BROWSERS)]
@@ -58,6 +79,7 @@ async def get_browser(browser_id):
         # Check if browser needs rotation
         if browsers[browser_id] is not None and browser_accounts_processed[browser_id] >= MAX_ACCOUNTS_PER_BROWSER:
             logger.info(f"Browser {browser_id} (UUID: {browser_uuids[browser_id]}) has processed {browser_accounts_processed[browser_id]} accounts, rotating...")
+            metrics.BROWSER_RESTARTS.labels(reason='rotation').inc()
             try:
                 await browsers[browser_id].__aexit__(None, None, None)
                 logger.info(f"Browser {browser_id} (UUID: {browser_uuids[browser_id]}) was closed for rotation")
@@ -77,14 +99,12 @@ async def get_browser(browser_id):
                 logging_level=logging.INFO,
                 request_delay=1,
                 manual_captcha_solves=False,
-                instance_id=browser_uuid
+                instance_id=browser_uuid,
+                trace_file=TRACE_FILE,
+                base_url=TIKTOK_BASE_URL,
+                session_store=session_store,
+                entity_cache=entity_cache
             )
-            # Add stats to the PyTok instance
-            browser.created_at = time.time()
-            browser.request_count = 0
-            browser.successful_requests = 0
-            browser.failed_requests = 0
-            
             await browser.__aenter__()
             logger.info(f"Browser {browser_id} (UUID: {browser_uuid}) successfully initialized")
             browsers[browser_id] = browser
@@ -104,6 +124,7 @@ async def check_browser_health(browser_id):
                 logger.info(f"Browser {browser_id} (UUID: {browser_uuids[browser_id]}) health check passed")
             except Exception as e:
                 logger.error(f"Browser {browser_id} (UUID: {browser_uuids[browser_id]}) health check failed: {str(e)}")
+                metrics.BROWSER_RESTARTS.labels(reason='health_check').inc()
                 is_processing[browser_id] = False
                 try:
                     if browsers[browser_id]:
@@ -143,7 +164,7 @@ async def process_account(browser_id, username, team_id):
         logger.info(f"Processing {username} for team {team_id}, today: {today_str}")
         
         try:
-            async for video in user.videos():
+            async for video in user.videos(prefetch=PREFETCH_PAGES):
                 try:
                     video_data = await video.info()
                     post_id = video_data.get("id", "")
@@ -166,16 +187,8 @@ async def process_account(browser_id, username, team_id):
                     
                     # Following the logic from the old script:
                     # 1. Delete any posts from today with the same postId
-                    result = posts_collection.delete_many({
-                        "postId": post_id,
-                        "teamId": team_id,
-                        "createdAt": {"$gte": start_of_day, "$lt": end_of_day}
-                    })
-                    
-                    if result.deleted_count > 0:
-                        logger.info(f"Deleted {result.deleted_count} existing posts from today for postId {post_id}")
-                    
                     # 2. Create and save the new post
+                    # both are queued for the writer thread, which keeps them in order
                     current_time = datetime.utcnow()
                     post_document = {
                         "postId": post_id,
@@ -187,9 +200,15 @@ async def process_account(browser_id, username, team_id):
                         "updatedAt": current_time,
                         "platform": "tiktok"
                     }
-                    
-                    # Insert the new post
-                    posts_collection.insert_one(post_document)
+                    with browser._tracer.span('mongo.write', username=username, post_id=post_id):
+                        await mongo_writer.write(POSTS_COLLECTION, [
+                            DeleteMany({
+                                "postId": post_id,
+                                "teamId": team_id,
+                                "createdAt": {"$gte": start_of_day, "$lt": end_of_day}
+                            }),
+                            InsertOne(post_document),
+                        ])
                     videos_added += 1
                     
                     if count >= max_videos:
@@ -205,6 +224,7 @@ async def process_account(browser_id, username, team_id):
         
         browser.successful_requests += 1
         browser_accounts_processed[browser_id] += 1
+        metrics.ACCOUNTS_PROCESSED.labels(status='completed').inc()
         
         logger.info(f"Browser {browser_id} completed processing {username} with {len(videos)} videos (new posts added: {videos_added}, accounts processed: {browser_accounts_processed[browser_id]}/{MAX_ACCOUNTS_PER_BROWSER})")
         
@@ -220,6 +240,7 @@ async def process_account(browser_id, username, team_id):
         logger.error(f"Browser {browser_id} error processing {username}: {str(e)}")
         browser.failed_requests += 1
         browser_accounts_processed[browser_id] += 1  # Count failed ones too
+        metrics.ACCOUNTS_PROCESSED.labels(status='failed').inc()
         return {
             'status': 'failed',
             'username': username,
@@ -229,8 +250,13 @@ async def process_account(browser_id, username, team_id):
 
 async def get_teams_with_accounts() -> List[Dict[str, Any]]:
     """Retrieve all teams with their accounts from MongoDB"""
+    if SIMULATED_ACCOUNTS:
+        accounts = [f"simulated{i:06d}" for i in range(SIMULATED_ACCOUNTS)]
+        logger.info(f"Using {len(accounts)} simulated accounts")
+        return [{"teamId": "simulated", "accounts": accounts}]
+
     try:
-        result = creator_collection.aggregate([
+        teams = await mongo_writer.aggregate(CREATOR_COLLECTION, [
             { "$unwind": "$teamsData" },
             { "$unwind": "$teamsData.accounts" },
             {
@@ -241,8 +267,6 @@ async def get_teams_with_accounts() -> List[Dict[str, Any]]:
             },
             { "$project": { "_id": 0, "teamId": "$_id", "accounts": 1 } },
         ])
-
-        teams = list(result)
         
         # Convert to expected format and sort accounts
         for team in teams:
@@ -305,6 +329,11 @@ async def main():
     start_time = time.time()
     today_str = datetime.utcnow().strftime("%Y-%m-%d")
     logger.info(f"Starting TikTok scraper job for date: {today_str}")
+
+    metrics_server = None
+    if METRICS_PORT:
+        metrics_server = metrics.start_http_server(METRICS_PORT)
+        logger.info(f"Serving metrics on http://127.0.0.1:{METRICS_PORT}/metrics")
     
     # Start browser health check tasks
     health_check_tasks = []
@@ -312,48 +341,63 @@ async def main():
         task = asyncio.create_task(check_browser_health(browser_id))
         health_check_tasks.append(task)
     
-    # Get all teams and accounts
-    teams = await get_teams_with_accounts()
+    global mongo_writer
+    mongo_writer = MongoWriter(
+        MONGO_URI,
+        DB_NAME,
+        write_concerns={POSTS_COLLECTION: {'w': int(POSTS_WRITE_CONCERN) if POSTS_WRITE_CONCERN.isdigit() else POSTS_WRITE_CONCERN}},
+        max_pool_size=MONGO_POOL_SIZE,
+    ).start()
+
+    try:
+        # Get all teams and accounts
+        teams = await get_teams_with_accounts()
     
-    if not teams:
-        logger.warning("No teams or accounts found to process")
-        return
+        if not teams:
+            logger.warning("No teams or accounts found to process")
+            return
     
-    # Prepare account queue
-    account_queue = []
-    for team in teams:
-        team_id = team['teamId']
-        for username in team['accounts']:
-            account_queue.append({
-                'username': username,
-                'team_id': team_id
-            })
+        # Prepare account queue
+        account_queue = []
+        for team in teams:
+            team_id = team['teamId']
+            for username in team['accounts']:
+                account_queue.append({
+                    'username': username,
+                    'team_id': team_id
+                })
     
-    total_accounts = len(account_queue)
-    logger.info(f"Prepared to process {total_accounts} accounts across {len(teams)} teams")
+        total_accounts = len(account_queue)
+        logger.info(f"Prepared to process {total_accounts} accounts across {len(teams)} teams")
     
-    # Create processor tasks based on number of browsers
-    results = []
-    processor_tasks = []
-    for _ in range(NUM_BROWSERS):
-        task = asyncio.create_task(run_account_processor(account_queue, results))
-        processor_tasks.append(task)
+        # Create processor tasks based on number of browsers
+        results = []
+        processor_tasks = []
+        for _ in range(NUM_BROWSERS):
+            task = asyncio.create_task(run_account_processor(account_queue, results))
+            processor_tasks.append(task)
     
-    # Wait for all accounts to be processed
-    await asyncio.gather(*processor_tasks)
+        # Wait for all accounts to be processed
+        await asyncio.gather(*processor_tasks)
+        # and for their posts to be written
+        await mongo_writer.close()
     
-    # Summarize results
-    completed = sum(1 for r in results if r['status'] == 'completed')
-    failed = sum(1 for r in results if r['status'] == 'failed')
-    total_videos = sum(r.get('videos_count', 0) for r in results)
-    new_posts = sum(r.get('videos_added', 0) for r in results)
+        # Summarize results
+        completed = sum(1 for r in results if r['status'] == 'completed')
+        failed = sum(1 for r in results if r['status'] == 'failed')
+        total_videos = sum(r.get('videos_count', 0) for r in results)
+        new_posts = sum(r.get('videos_added', 0) for r in results)
     
-    logger.info(f"Job completed in {time.time() - start_time:.2f} seconds")
-    logger.info(f"Processed {len(results)}/{total_accounts} accounts")
-    logger.info(f"Completed: {completed}, Failed: {failed}")
-    logger.info(f"Total videos found: {total_videos}")
-    logger.info(f"New posts added: {new_posts}")
+        logger.info(f"Job completed in {time.time() - start_time:.2f} seconds")
+        logger.info(f"Processed {len(results)}/{total_accounts} accounts")
+        logger.info(f"Completed: {completed}, Failed: {failed}")
+        logger.info(f"Total videos found: {total_videos}")
+        logger.info(f"New posts added: {new_posts}")
     
+    finally:
+        # drains writes still queued, i.e. if the job failed part way
+        await mongo_writer.close()
+
     # Clean up browsers
     for browser_id in range(NUM_BROWSERS):
         if browsers[browser_id]:
@@ -366,6 +410,9 @@ async def main():
     # Cancel health check tasks
     for task in health_check_tasks:
         task.cancel()
+
+    if metrics_server:
+        metrics_server.shutdown()
     
     logger.info(f"TikTok scraper job for {today_str} completed")
 
@@ -373,9 +420,17 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="TikTok Scraper")
     parser.add_argument("--mongo-uri", help="MongoDB connection URI")
     parser.add_argument("--db-name", help="Database name")
+    parser.add_argument("--mongo-pool-size", type=int, help="Most connections to keep open to MongoDB")
+    parser.add_argument("--posts-write-concern", help="Write concern of posts, i.e. 1 or majority")
     parser.add_argument("--browsers", type=int, help="Number of browser instances to use")
     parser.add_argument("--accounts-per-browser", type=int, help="Max accounts per browser before rotation")
     parser.add_argument("--headless", type=bool, help="Run browsers in headless mode")
+    parser.add_argument("--metrics-port", type=int, help="Port to serve Prometheus metrics on, 0 to disable")
+    parser.add_argument("--prefetch-pages", type=int, help="Video result pages to fetch ahead of processing")
+    parser.add_argument("--session-dir", help="Directory to save browser sessions in, empty to disable")
+    parser.add_argument("--entity-cache", help="SQLite file to cache user and video lookups in, off unless given")
+    parser.add_argument("--base-url", help="Root URL of TikTok, i.e. that of a local pytok.simulator")
+    parser.add_argument("--simulated-accounts", type=int, help="Scrape this many generated accounts instead of those in MongoDB")
     
     args = parser.parse_args()
     
@@ -384,6 +439,10 @@ if __name__ == "__main__":
         MONGO_URI = args.mongo_uri
     if args.db_name:
         DB_NAME = args.db_name
+    if args.mongo_pool_size:
+        MONGO_POOL_SIZE = args.mongo_pool_size
+    if args.posts_write_concern:
+        POSTS_WRITE_CONCERN = args.posts_write_concern
     if args.browsers:
         NUM_BROWSERS = args.browsers
         browsers = [None] * NUM_BROWSERS
@@ -395,6 +454,20 @@ if __name__ == "__main__":
         MAX_ACCOUNTS_PER_BROWSER = args.accounts_per_browser
     if args.headless is not None:
         HEADLESS = args.headless
+    if args.metrics_port is not None:
+        METRICS_PORT = args.metrics_port
+    if args.prefetch_pages is not None:
+        PREFETCH_PAGES = args.prefetch_pages
+    if args.session_dir is not None:
+        SESSION_DIR = args.session_dir
+        session_store = SessionStore(SESSION_DIR) if SESSION_DIR else None
+    if args.entity_cache is not None:
+        ENTITY_CACHE_PATH = args.entity_cache
+        entity_cache = EntityCache(ENTITY_CACHE_PATH) if ENTITY_CACHE_PATH else None
+    if args.base_url:
+        TIKTOK_BASE_URL = args.base_url
+    if args.simulated_accounts is not None:
+        SIMULATED_ACCOUNTS = args.simulated_accounts
     
     # Run the main async function
     asyncio.run(main())
@@ -1,12 +1,22 @@
 import asyncio
+import contextlib
+from dataclasses import dataclass
 from datetime import datetime
+import json
 import random
-from pyclick import HumanCurve
-from playwright.async_api import expect
-from .. import exceptions, captcha_solver
+import time
+from typing import Optional
+from urllib import parse as url_parsers
+from playwright.async_api import expect, Error as PlaywrightError
+from .. import exceptions, captcha_solver, metrics, governor
+from ..tracing import traced, get_tracer
+from ..trajectories import TRAJECTORIES, MouseDispatcher
 
 TOK_DELAY = 30
+API_RESPONSE_DELAY = 10
 CAPTCHA_DELAY = 999999
+# the most times a captcha without a confident solution is swapped for a new one before trying it anyway
+MAX_CAPTCHA_REFRESHES = 2
 
 
 def get_login_close_element(page):
@@ -23,17 +33,426 @@ def get_captcha_element(page):
 def get_loading_error_element(page):
     return page.get_by_text('Sorry about that! Please try again later.', exact=True) 
 
+
+CAPTCHA_TEXTS = ['Rotate the shapes', 'Verify to continue:', 'Click on the shapes with the same size',
+                 'Drag the slider to fit the puzzle']
+LOGIN_CLOSE_TEXTS = ['Continue as guest', 'Continue without login']
+LOADING_ERROR_TEXTS = ['Sorry about that! Please try again later.']
+PAGE_STATES = ['content', 'captcha', 'login', 'unavailable', 'noContent', 'loadingError']
+
+
+@dataclass
+class PageState:
+    """What a page is showing, found in a single probe. Each text field is the text that was visible, if any."""
+    content: bool = False
+    captcha: Optional[str] = None
+    login: Optional[str] = None
+    unavailable: Optional[str] = None
+    no_content: Optional[str] = None
+    loading_error: Optional[str] = None
+    timed_out: bool = False
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(content=data['content'], captcha=data['captcha'], login=data['login'],
+                   unavailable=data['unavailable'], no_content=data['noContent'],
+                   loading_error=data['loadingError'], timed_out=data.get('timedOut', False))
+
+
+# Checks every known selector and text on the page in one pass, so that finding out what the page
+# is showing costs a single evaluate round-trip instead of one is_visible call per locator. Given
+# a list of states to wait for, it resolves once any of them is showing instead, re-probing only
+# when a MutationObserver sees the page change.
+PAGE_STATE_SCRIPT = """
+({content, texts, until, timeout}) => {
+    const normalize = (text) => text.replace(/\\s+/g, ' ').trim();
+    const isVisible = (element) => {
+        if (!element) {
+            return false;
+        }
+        const style = window.getComputedStyle(element);
+        if (style.visibility === 'hidden' || style.display === 'none') {
+            return false;
+        }
+        const rect = element.getBoundingClientRect();
+        return rect.width > 0 && rect.height > 0;
+    };
+    const kinds = new Map();
+    for (const [kind, kindTexts] of Object.entries(texts)) {
+        for (const text of kindTexts) {
+            kinds.set(text, kind);
+        }
+    }
+
+    const probe = () => {
+        const state = {content: false, captcha: null, login: null, unavailable: null, noContent: null, loadingError: null};
+        if (content) {
+            state.content = Array.from(document.querySelectorAll(content)).some(isVisible);
+        }
+        const root = document.body || document.documentElement;
+        if (root && kinds.size) {
+            const walker = document.createTreeWalker(root, NodeFilter.SHOW_TEXT);
+            for (let node = walker.nextNode(); node; node = walker.nextNode()) {
+                const text = normalize(node.data);
+                const kind = kinds.get(text);
+                if (kind && state[kind] === null && isVisible(node.parentElement)) {
+                    state[kind] = text;
+                }
+            }
+        }
+        return state;
+    };
+    const isSettled = (state) => until.some((kind) => state[kind]);
+
+    if (!until) {
+        return probe();
+    }
+    return new Promise((resolve) => {
+        let scheduled = null;
+        let observer = null;
+        let timer = null;
+        const finish = (state) => {
+            observer.disconnect();
+            clearTimeout(timer);
+            clearTimeout(scheduled);
+            resolve(state);
+        };
+        const check = () => {
+            scheduled = null;
+            const state = probe();
+            if (isSettled(state)) {
+                finish(state);
+            }
+        };
+        observer = new MutationObserver(() => {
+            // coalesce bursts of mutations into one probe
+            if (scheduled === null) {
+                scheduled = setTimeout(check, 50);
+            }
+        });
+        observer.observe(document, {childList: true, subtree: true, characterData: true, attributes: true});
+        timer = setTimeout(() => finish({...probe(), timedOut: true}), timeout);
+        check();
+    });
+}
+"""
+
+
+# Human-like scroll routine run entirely inside the page, so that a whole scroll costs a single
+# evaluate round-trip instead of two per step. Stops on reaching the target, on the page height
+# no longer growing, on a resource matching stopOnPath finishing loading, or on maxDuration.
+SCROLL_SCRIPT = """
+async ({mode, target, speed, interval, stopOnPath, maxDuration, stallTimeout, pauseChance, pauseMs}) => {
+    const sleep = (ms) => new Promise(resolve => setTimeout(resolve, ms));
+    const jitter = (n) => n + Math.round((Math.random() * 2 - 1) * n);
+    const scroller = document.scrollingElement || document.documentElement;
+    const getPosition = () => window.scrollY || scroller.scrollTop || document.body.scrollTop || 0;
+    const getHeight = () => Math.max(document.body.scrollHeight, scroller.scrollHeight);
+
+    let responseSeen = false;
+    let observer = null;
+    if (stopOnPath) {
+        observer = new PerformanceObserver((list) => {
+            for (const entry of list.getEntries()) {
+                if (entry.name.includes(stopOnPath)) {
+                    responseSeen = true;
+                }
+            }
+        });
+        observer.observe({type: 'resource', buffered: false});
+    }
+
+    const start = performance.now();
+    const startPosition = getPosition();
+    let position = startPosition;
+    let height = getHeight();
+    let lastGrowth = start;
+    let steps = 0;
+    let reason = 'timeout';
+
+    if (mode === 'up') {
+        target = Math.max(0, startPosition - target);
+    }
+    const distance = Math.max(1, Math.abs((mode === 'bottom' ? height : target) - startPosition));
+
+    try {
+        while (performance.now() - start < maxDuration) {
+            if (responseSeen) {
+                reason = 'response';
+                break;
+            }
+
+            const goal = mode === 'bottom' ? getHeight() : target;
+            const remaining = Math.abs(goal - position);
+            // ease out as we approach the goal, never dropping below a couple of pixels per step
+            const easing = Math.min(1, Math.max(0.2, remaining / Math.min(distance, 600)));
+            const step = Math.max(2, Math.round(jitter(speed) * easing));
+
+            if (mode === 'up') {
+                position = Math.max(target, position - step);
+            } else {
+                position = Math.min(goal, position + step);
+            }
+            window.scrollTo(0, position);
+            steps += 1;
+
+            const newHeight = getHeight();
+            if (newHeight > height) {
+                height = newHeight;
+                lastGrowth = performance.now();
+            }
+
+            if (mode === 'up' && position <= target) {
+                reason = 'target';
+                break;
+            }
+            if (mode === 'to' && (position >= target || position >= height - window.innerHeight)) {
+                reason = 'target';
+                break;
+            }
+            if (mode === 'bottom' && position >= height - window.innerHeight
+                    && performance.now() - lastGrowth > stallTimeout) {
+                reason = 'bottom';
+                break;
+            }
+
+            if (Math.random() < pauseChance) {
+                await sleep(jitter(pauseMs));
+            } else {
+                await sleep(jitter(interval));
+            }
+        }
+    } finally {
+        if (observer) {
+            observer.disconnect();
+        }
+    }
+
+    return {
+        reason: reason,
+        position: getPosition(),
+        height: getHeight(),
+        steps: steps,
+        elapsed: performance.now() - start,
+    };
+}
+"""
+
 class Base:
     def __init__(self, parent=None):
         # Make sure parent is always set
         self.parent = parent
 
+    def _url(self, path):
+        """Returns the URL of a path on TikTok, or on whatever base_url PyTok was pointed at."""
+        return f"{self.parent._base_url}/{path.lstrip('/')}"
+
+    def _span(self, name, **attributes):
+        return get_tracer(self).span(name, **attributes)
+
+    @contextlib.asynccontextmanager
+    async def _navigation(self, url, kind):
+        await self.parent.request_delay()
+        metrics.PAGES_LOADED.labels(kind=kind).inc()
+        with self._span('navigate', url=url, kind=kind) as span:
+            yield span
+
+    async def _api_get(self, endpoint, url, headers=None, cookies=None, **attributes):
+        """
+        Requests a page of results from a TikTok API endpoint directly, outside of the browser.
+        Uses the cookies of the browser session unless cookies are given.
+        """
+        if cookies is None:
+            cookies = await self.parent._context.cookies()
+            cookies = {cookie['name']: cookie['value'] for cookie in cookies}
+        await self.parent.request_delay()
+        with self._span('api_page', endpoint=endpoint, **attributes) as span:
+            start = time.perf_counter()
+            # off the event loop, so that read-ahead fetches overlap with the consumer
+            r = await asyncio.to_thread(self.parent._http_get, url, headers=headers, cookies=cookies)
+            span.set_attributes(status=r.status_code, bytes=len(r.content))
+        self.parent._observe(url, r.status_code, r.content)
+        if governor.is_throttled(r.status_code, r.content) == governor.VERIFY:
+            # the request shape has been flagged, so capture a fresh one before paging this endpoint again
+            self.parent._request_templates.invalidate(endpoint)
+        metrics.API_PAGES_FETCHED.labels(endpoint=endpoint).inc()
+        metrics.API_PAGE_SECONDS.labels(endpoint=endpoint).observe(time.perf_counter() - start)
+        metrics.BYTES_DOWNLOADED.labels(kind='api').inc(len(r.content))
+        return r
+
+    async def _read_ahead(self, pages, prefetch=0):
+        """
+        Iterates an async generator of result pages, fetching up to prefetch pages ahead of the
+        consumer in a background task. With prefetch=0, pages are fetched only when asked for.
+        Errors raised while fetching are re-raised to the consumer when it reaches that page, and
+        fetching is cancelled as soon as the consumer stops iterating.
+        """
+        if not prefetch:
+            async for page in pages:
+                yield page
+            return
+
+        # pages that are either in flight or buffered, so fetching blocks once prefetch pages are ahead
+        slots = asyncio.Semaphore(prefetch)
+        queue = asyncio.Queue()
+        finished = object()
+
+        async def produce():
+            try:
+                while True:
+                    await slots.acquire()
+                    try:
+                        page = await pages.__anext__()
+                    except StopAsyncIteration:
+                        break
+                    queue.put_nowait((page, None))
+            except Exception as ex:
+                queue.put_nowait((None, ex))
+                return
+            queue.put_nowait((finished, None))
+
+        producer = asyncio.create_task(produce())
+        try:
+            while True:
+                page, ex = await queue.get()
+                if ex is not None:
+                    raise ex
+                if page is finished:
+                    return
+                slots.release()
+                yield page
+        finally:
+            producer.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await producer
+            await pages.aclose()
+
     async def check_initial_call(self, url):
         async with self.wait_for_requests(url) as event:
             response = await event.value.response()
             if response.status >= 300:
                 raise exceptions.NotAvailableException("Content is not available")
 
+    def _page_state_args(self, content_tag, unavailable_text, no_content_text, loading_error_text, until, timeout):
+        def as_list(texts):
+            if not texts:
+                return []
+            return [texts] if isinstance(texts, str) else list(texts)
+
+        if content_tag and content_tag.startswith('css='):
+            content_tag = content_tag[len('css='):]
+        return {
+            'content': content_tag,
+            'texts': {
+                'captcha': CAPTCHA_TEXTS,
+                'login': LOGIN_CLOSE_TEXTS,
+                'unavailable': as_list(unavailable_text),
+                'noContent': as_list(no_content_text),
+                'loadingError': LOADING_ERROR_TEXTS + as_list(loading_error_text),
+            },
+            'until': until,
+            'timeout': timeout * 1000,
+        }
+
+    async def probe_page_state(self, content_tag=None, unavailable_text=None, no_content_text=None,
+                               loading_error_text=None) -> PageState:
+        """
+        Returns what the page is showing: its content, a captcha, a login prompt, an unavailable
+        or no content message, or a loading error, all checked in a single round-trip.
+
+        - Parameters:
+            - content_tag (str): A CSS selector for the content the page is expected to show.
+            - unavailable_text (str | list): Text(s) shown when the content is not available.
+            - no_content_text (str | list): Text(s) shown when there is no content.
+            - loading_error_text (str | list): Text(s) shown on a loading error, besides the usual one.
+
+        Example Usage
+        ```py
+        state = await user.probe_page_state('[data-e2e=user-post-item]', "Couldn't find this account")
+        if state.captcha:
+            await user.solve_captcha()
+        ```
+        """
+        args = self._page_state_args(content_tag, unavailable_text, no_content_text, loading_error_text, None, 0)
+        return PageState.from_dict(await self.parent._page.evaluate(PAGE_STATE_SCRIPT, args))
+
+    async def watch_page_state(self, content_tag=None, unavailable_text=None, no_content_text=None,
+                               loading_error_text=None, until=PAGE_STATES, timeout=TOK_DELAY) -> PageState:
+        """
+        Waits until the page shows any of the states in until, i.e. ['content', 'captcha'], and
+        returns what it is showing. The page is watched from the inside rather than polled.
+        """
+        page = self.parent._page
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            remaining = max(0.0, deadline - loop.time())
+            args = self._page_state_args(content_tag, unavailable_text, no_content_text, loading_error_text,
+                                         until, remaining)
+            try:
+                state = PageState.from_dict(await page.evaluate(PAGE_STATE_SCRIPT, args))
+            except PlaywrightError:
+                # the page navigated while it was being watched, so watch the new one
+                if loop.time() >= deadline:
+                    raise exceptions.TimeoutException("Timed out watching the page state")
+                await page.wait_for_load_state('domcontentloaded')
+                continue
+            if state.timed_out:
+                raise exceptions.TimeoutException(f"Timed out waiting for the page to show any of {until}")
+            return state
+
+    @traced('base.wait_for_page_state')
+    async def wait_for_page_state(self, content_tag, unavailable_text=None, no_content_text=None,
+                                  loading_error_text=None, timeout=TOK_DELAY, max_captcha_solves=3,
+                                  max_refreshes=3) -> PageState:
+        """
+        Waits until the page shows its content, dealing with whatever it shows on the way there:
+        captchas are solved, loading errors are refreshed and login prompts are closed.
+
+        Raises NotAvailableException or NoContentException if the page shows unavailable_text or
+        no_content_text instead.
+
+        Example Usage
+        ```py
+        await user.wait_for_page_state('[data-e2e=user-post-item]', "Couldn't find this account",
+                                       no_content_text=["No content", "This account is private"])
+        ```
+        """
+        page = self.parent._page
+        until = list(PAGE_STATES)
+        captcha_solves = 0
+        refreshes = 0
+        while True:
+            state = await self.watch_page_state(content_tag, unavailable_text, no_content_text, loading_error_text,
+                                                until=until, timeout=timeout)
+            if state.captcha:
+                if captcha_solves >= max_captcha_solves:
+                    raise exceptions.CaptchaException("Captcha is still visible after solving")
+                captcha_solves += 1
+                await self.solve_captcha()
+                continue
+            if state.loading_error:
+                if refreshes >= max_refreshes:
+                    raise exceptions.LoadingErrorException(f"Loading error with message: '{state.loading_error}'")
+                refreshes += 1
+                await page.get_by_text('Refresh', exact=True).click()
+                continue
+            if state.unavailable:
+                raise exceptions.NotAvailableException(f"Content is not available with message: '{state.unavailable}'")
+            if state.no_content:
+                raise exceptions.NoContentException(f"Content is not available with message: '{state.no_content}'")
+            if state.login:
+                try:
+                    await page.get_by_text(state.login, exact=True).click()
+                except PlaywrightError as e:
+                    print(f"Failed to close login with error: {e}, continuing anyway...")
+                # don't wake up again for a prompt that couldn't be closed
+                until.remove('login')
+                if not state.content:
+                    continue
+            return state
+
+    @traced('base.wait_for_content_or_captcha')
     async def wait_for_content_or_captcha(self, content_tag):
         page = self.parent._page
 
@@ -55,54 +474,12 @@ class Base:
 
         return content_element
 
+    @traced('base.wait_for_content_or_unavailable_or_captcha')
     async def wait_for_content_or_unavailable_or_captcha(self, content_tag, unavailable_text, no_content_text=None):
-        page = self.parent._page
-        content_element = page.locator(content_tag).first
-        captcha_element = get_captcha_element(page)
-        unavailable_element = page.get_by_text(unavailable_text, exact=True)
-
-        # try:
-        expected_elements = content_element.or_(captcha_element).or_(unavailable_element)
-
-        def add_no_content_text(expected_es, text):
-            if no_content_text:
-                if isinstance(no_content_text, list):
-                    for text in no_content_text:
-                        expected_es = expected_es.or_(page.get_by_text(text, exact=True))
-                elif isinstance(no_content_text, str):
-                    expected_es = expected_es.or_(page.get_by_text(no_content_text, exact=True))
-            return expected_es
-        expected_elements = add_no_content_text(expected_elements, no_content_text)
-
-        await expect(expected_elements).to_be_visible(
-            timeout=TOK_DELAY * 1000)
-
-        if await captcha_element.is_visible():
-            await self.solve_captcha()
-            await asyncio.sleep(1)
-            if await captcha_element.is_visible():
-                raise exceptions.CaptchaException("Captcha is still visible after solving")
-            expected_elements = content_element.or_(unavailable_element)
-            expected_elements = add_no_content_text(expected_elements, no_content_text)
-            await expect(expected_elements).to_be_visible(
-                timeout=TOK_DELAY * 1000)  # waits TOK_DELAY seconds and launches new browser instance
-
-        if await unavailable_element.is_visible():
-            raise exceptions.NotAvailableException(f"Content is not available with message: '{unavailable_text}'")
-        
-        if no_content_text:
-            if isinstance(no_content_text, list):
-                for text in no_content_text:
-                    no_content_element = page.get_by_text(text, exact=True)
-                    if await no_content_element.is_visible():
-                        raise exceptions.NoContentException(f"Content is not available with message: '{text}'")
-            elif isinstance(no_content_text, str):
-                no_content_element = page.get_by_text(no_content_text, exact=True)
-                if await no_content_element.is_visible():
-                    raise exceptions.NoContentException(f"Content is not available with message: '{no_content_text}'")
-
-        return content_element
+        await self.wait_for_page_state(content_tag, unavailable_text, no_content_text)
+        return self.parent._page.locator(content_tag).first
 
+    @traced('base.check_for_unavailable_or_captcha')
     async def check_for_unavailable_or_captcha(self, unavailable_text):
         """
         This function is used to check for unavailable or captcha.
@@ -114,11 +491,9 @@ class Base:
         ```
         """
         page = self.parent._page
-        captcha_element = get_captcha_element(page)
-        unavailable_element = page.get_by_text(unavailable_text, exact=True)
+        state = await self.probe_page_state(unavailable_text=unavailable_text)
 
-        captcha_visible = await captcha_element.is_visible()
-        if captcha_visible:
+        if state.captcha:
             num_tries = 0
             max_tries = 3
             captcha_exceptions = []
@@ -127,8 +502,8 @@ class Base:
                 try:
                     await self.solve_captcha()
                     await asyncio.sleep(1)
-                    captcha_is_visible = await captcha_element.is_visible()
-                    if captcha_is_visible:
+                    state = await self.probe_page_state(unavailable_text=unavailable_text)
+                    if state.captcha:
                         captcha_exceptions.append(exceptions.CaptchaException("Captcha is still visible after solving"))
                         continue
                     else:
@@ -139,19 +514,14 @@ class Base:
                 print(
                     f"Failed to solve captcha after {max_tries} tries with errors: {captcha_exceptions}, continuing anyway...")
 
-        login_element = get_login_close_element(page)
-        login_visible = await login_element.is_visible()
-        if login_visible:
+        if state.login:
             try:
-                login_close = get_login_close_element(page)
-                login_close_visible = await login_close.is_visible()
-                if login_close_visible:
-                    await login_close.click()
+                await page.get_by_text(state.login, exact=True).click()
             except Exception as e:
                 print(f"Failed to close login with error: {e}, continuing anyway...")
 
-        if await unavailable_element.is_visible():
-            raise exceptions.NotAvailableException(f"Content is not available with message: '{unavailable_text}'")
+        if state.unavailable:
+            raise exceptions.NotAvailableException(f"Content is not available with message: '{state.unavailable}'")
 
     async def check_for_unavailable(self, unavailable_text):
         page = self.parent._page
@@ -165,6 +535,7 @@ class Base:
         if await loading_error_element.is_visible():
             raise exceptions.LoadingErrorException(f"Loading error with message: '{loading_error_text}'")
         
+    @traced('base.check_and_retry_on_loading_error')
     async def check_and_retry_on_loading_error(self, loading_error_text):
         """
         This function is used to check if the page is showing a loading error.
@@ -177,11 +548,9 @@ class Base:
         """
         page = self.parent._page
         max_attempts = 3
-        print("checking for loading error")
-        await asyncio.sleep(3)
         for attempt in range(max_attempts):
-            loading_error_element = get_loading_error_element(page)
-            if await loading_error_element.is_visible():
+            state = await self.probe_page_state(loading_error_text=loading_error_text)
+            if state.loading_error:
                 print(f"Loading error detected on attempt {attempt + 1}, retrying...")
                 await page.get_by_text('Refresh', exact=True).click()
                 await asyncio.sleep(1)
@@ -197,6 +566,92 @@ class Base:
         except Exception as e:
             raise exceptions.TimeoutException(str(e))
 
+    @traced('base.wait_for_response')
+    async def wait_for_response(self, api_path, query=None, predicate=None, timeout=TOK_DELAY,
+                                include_existing=False, exclude_urls=None, unavailable_text=None,
+                                solve_captchas=True):
+        """
+        Waits until the next response matching api_path has arrived and its body has been captured.
+        Captcha detection races alongside the wait, and a captcha is solved as soon as it appears.
+
+        - Parameters:
+            - api_path (str): A substring of the response URL, i.e. 'api/post/item_list'
+            - query (dict): Query parameters the response URL must have, i.e. {'secUid': sec_uid}
+            - predicate (callable): An additional check called with each candidate response.
+            - include_existing (bool): Return a matching response that has already been captured.
+            - exclude_urls (list): Response URLs to ignore, i.e. pages that were already processed.
+            - unavailable_text (str): Raise NotAvailableException if this text becomes visible first.
+            - solve_captchas (bool): Solve captchas that appear while waiting.
+
+        Example Usage
+        ```py
+        response = await user.wait_for_response('api/post/item_list', query={'secUid': user.sec_uid})
+        ```
+        """
+        page = self.parent._page
+        loop = asyncio.get_running_loop()
+        excluded = set(exclude_urls or [])
+
+        def matches(response):
+            if api_path not in response.url or response.url in excluded:
+                return False
+            if query:
+                params = url_parsers.parse_qs(url_parsers.urlparse(response.url).query)
+                for key, value in query.items():
+                    if params.get(key, [None])[0] != str(value):
+                        return False
+            return predicate is None or predicate(response)
+
+        if include_existing:
+            for response in self.get_responses(api_path):
+                if hasattr(response, '_body') and matches(response):
+                    return response
+
+        matched = loop.create_future()
+
+        def on_response(response):
+            if not matched.done() and matches(response):
+                matched.set_result(response)
+
+        def watch(locator):
+            return asyncio.ensure_future(locator.first.wait_for(state='visible', timeout=timeout * 1000))
+
+        self.parent._response_listeners.append(on_response)
+        watchers = {}
+        if solve_captchas:
+            watchers[watch(get_captcha_element(page))] = 'captcha'
+        if unavailable_text:
+            watchers[watch(page.get_by_text(unavailable_text, exact=True))] = 'unavailable'
+
+        deadline = loop.time() + timeout
+        try:
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise exceptions.TimeoutException(f"Timed out waiting for response from '{api_path}'")
+                done, _ = await asyncio.wait(
+                    [matched, *watchers], timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                if matched in done:
+                    return matched.result()
+                for task in done:
+                    kind = watchers.pop(task)
+                    if task.exception() is not None:
+                        # the locator never became visible within the timeout
+                        continue
+                    if kind == 'unavailable':
+                        raise exceptions.NotAvailableException(
+                            f"Content is not available with message: '{unavailable_text}'")
+                    await self.solve_captcha()
+                    await asyncio.sleep(1)
+                    if await get_captcha_element(page).is_visible():
+                        raise exceptions.CaptchaException("Captcha is still visible after solving")
+                    watchers[watch(get_captcha_element(page))] = 'captcha'
+        finally:
+            self.parent._response_listeners.remove(on_response)
+            for task in watchers:
+                task.cancel()
+            await asyncio.gather(*watchers, return_exceptions=True)
+
     def get_requests(self, api_path):
         """searches a list of all requests thus far issued by the Playwright browser instance"""
         return [request for request in self.parent._requests if api_path in request.url]
@@ -207,7 +662,57 @@ class Base:
     async def get_response_body(self, response):
         return await response.body()
 
-    async def scroll_to_bottom(self, speed=20):
+    @traced('base.scroll_in_page')
+    async def scroll_in_page(self, mode, target=0, speed=20, stop_on_path=None, interval=10,
+                             max_duration=TOK_DELAY, stall_timeout=1.5, pause_chance=0.02, pause_ms=250):
+        """
+        Runs the human-like scroll routine inside the page and reports back once it has finished.
+
+        - Parameters:
+            - mode (str): bottom | to | up
+            - target (int): The position to scroll to for 'to', or the distance to scroll for 'up'.
+            - speed (int): The mean number of pixels scrolled per step.
+            - stop_on_path (str): Stop scrolling as soon as a request containing this path has completed.
+            - max_duration (float): The maximum number of seconds to scroll for.
+            - stall_timeout (float): For 'bottom', how long the page height must stop growing for.
+
+        Returns a dictionary with the reason scrolling stopped, the final position and page height,
+        and the number of steps taken.
+        """
+        page = self.parent._page
+        return await page.evaluate(SCROLL_SCRIPT, {
+            'mode': mode,
+            'target': target,
+            'speed': speed,
+            'interval': interval,
+            'stopOnPath': stop_on_path,
+            'maxDuration': max_duration * 1000,
+            'stallTimeout': stall_timeout * 1000,
+            'pauseChance': pause_chance,
+            'pauseMs': pause_ms,
+        })
+
+    def _use_fine_grained_scroll(self, fine_grained):
+        if fine_grained is None:
+            return self.parent._fine_grained_scroll
+        return fine_grained
+
+    async def scroll_to_bottom(self, speed=20, stop_on_path=None, fine_grained=None):
+        if self._use_fine_grained_scroll(fine_grained):
+            return await self._scroll_to_bottom_stepwise(speed)
+        return await self.scroll_in_page('bottom', speed=speed, stop_on_path=stop_on_path)
+
+    async def scroll_to(self, position, speed=5, stop_on_path=None, fine_grained=None):
+        if self._use_fine_grained_scroll(fine_grained):
+            return await self._scroll_to_stepwise(position, speed)
+        return await self.scroll_in_page('to', target=position, speed=speed, stop_on_path=stop_on_path)
+
+    async def slight_scroll_up(self, speed=4, fine_grained=None):
+        if self._use_fine_grained_scroll(fine_grained):
+            return await self._slight_scroll_up_stepwise(speed)
+        return await self.scroll_in_page('up', target=500, speed=speed)
+
+    async def _scroll_to_bottom_stepwise(self, speed=20):
         page = self.parent._page
         current_scroll_position = await page.evaluate(
             "() => document.documentElement.scrollTop || document.body.scrollTop;")
@@ -217,7 +722,7 @@ class Base:
             await page.evaluate(f"() => window.scrollTo(0, {current_scroll_position});")
             new_height = await page.evaluate("() => document.body.scrollHeight;")
 
-    async def scroll_to(self, position, speed=5):
+    async def _scroll_to_stepwise(self, position, speed=5):
         page = self.parent._page
         current_scroll_position = await page.evaluate(
             "() => document.documentElement.scrollTop || document.body.scrollTop;")
@@ -229,7 +734,7 @@ class Base:
             if current_scroll_position > position:
                 break
 
-    async def slight_scroll_up(self, speed=4):
+    async def _slight_scroll_up_stepwise(self, speed=4):
         page = self.parent._page
         desired_scroll = -500
         current_scroll = 0
@@ -265,31 +770,82 @@ class Base:
         if signin_visible:
             await signin_element.click()
 
+    @traced('base.solve_captcha')
     async def solve_captcha(self):
-        if self.parent._manual_captcha_solves:
-            input("Press Enter to continue after solving CAPTCHA:")
-            await asyncio.sleep(1)
-            if self.parent._log_captcha_solves:
-                request = self.get_requests('/captcha/verify')[0]
-                body = request.post_data
-                with open(f"manual_captcha_{datetime.now().isoformat()}.json", "w") as f:
-                    f.write(body)
-            return
         """
-        this method not only calculates the CAPTCHA solution but also POSTs it to TikTok's server.
+        Solves the captcha currently shown on the page, recording whether it was accepted, or that it
+        couldn't be told.
         """
-        # get captcha data
-        request = self.get_requests('/captcha/get')[0]
-        captcha_response = await request.response()
-        if captcha_response is not None:
-            captcha_json = await captcha_response.json()
+        self.parent._throttle(governor.CAPTCHA)
+        if self.parent._manual_captcha_solves:
+            metrics.CAPTCHA_ENCOUNTERS.labels(mode='manual').inc()
+            return await self._solve_captcha_manually()
+
+        captcha_mode = 'unknown'
+        try:
+            captcha_mode = await self._get_captcha_mode()
+            metrics.CAPTCHA_ENCOUNTERS.labels(mode=captcha_mode).inc()
+            accepted = await self._solve_captcha_automatically()
+        except Exception:
+            metrics.CAPTCHA_FAILURES.labels(mode=captcha_mode).inc()
+            raise
+        if accepted is None:
+            # the verify result couldn't be read, so it is neither a solve nor a failure
+            metrics.CAPTCHA_UNCONFIRMED.labels(mode=captcha_mode).inc()
+        elif accepted:
+            metrics.CAPTCHA_SOLVES.labels(mode=captcha_mode).inc()
         else:
-            raise exceptions.EmptyResponseException
+            metrics.CAPTCHA_FAILURES.labels(mode=captcha_mode).inc()
 
+    async def _refresh_captcha(self, captcha_type):
+        page = self.parent._page
+        metrics.CAPTCHA_REFRESHES.labels(mode=captcha_type).inc()
+        previous_challenges = set(id(response) for response in self.get_responses('/captcha/get'))
+        await page.locator('css=.secsdk_captcha_refresh').or_(page.get_by_text('Refresh', exact=True)).first.click()
+        await self.wait_for_response('/captcha/get', predicate=lambda response: id(response) not in previous_challenges,
+                                     timeout=API_RESPONSE_DELAY, include_existing=True, solve_captchas=False)
+
+    async def _get_captcha_data(self):
+        # the latest challenge, as a refresh replaces the one shown before
+        request = self.get_requests('/captcha/get')[-1]
+        captcha_response = await request.response()
+        if captcha_response is None:
+            raise exceptions.EmptyResponseException
+        captcha_json = await captcha_response.json()
         if 'mode' in captcha_json['data']:
             captcha_data = captcha_json['data']
         elif 'challenges' in captcha_json['data']:
             captcha_data = captcha_json['data']['challenges'][0]
+        return captcha_response, captcha_data
+
+    async def _get_captcha_mode(self):
+        _, captcha_data = await self._get_captcha_data()
+        return captcha_data['mode']
+
+    async def _get_captcha_verify_result(self, previous_responses):
+        """Returns whether TikTok accepted the last captcha solve, or None if we couldn't tell."""
+        try:
+            response = await self.wait_for_response(
+                '/captcha/verify', timeout=5, include_existing=True, solve_captchas=False,
+                predicate=lambda response: id(response) not in previous_responses)
+            result = json.loads(response._body)
+        except Exception:
+            return None
+        return result.get('code', 500) < 500
+
+    async def _solve_captcha_manually(self):
+        input("Press Enter to continue after solving CAPTCHA:")
+        await asyncio.sleep(1)
+        if self.parent._log_captcha_solves:
+            request = self.get_requests('/captcha/verify')[0]
+            body = request.post_data
+            with open(f"manual_captcha_{datetime.now().isoformat()}.json", "w") as f:
+                f.write(body)
+
+    async def _get_captcha_solution(self):
+        """Returns the type of the captcha shown, and where to drag its piece to."""
+        # get captcha data
+        captcha_response, captcha_data = await self._get_captcha_data()
         captcha_type = captcha_data['mode']
         if captcha_type not in ['slide', 'whirl']:
             raise exceptions.CaptchaException(f"Unsupported captcha type: {captcha_type}")
@@ -299,7 +855,7 @@ class Base:
         web browser, you should GET the puzzle image. puzzle_response is the full response from the server, and
         puzzle is the image itself, returned as a sequence of bytes.
         """
-        puzzle_req = self.get_requests(captcha_data['question']['url1'])[0]
+        puzzle_req = self.get_requests(captcha_data['question']['url1'])[-1]
         puzzle_response = await puzzle_req.response()
         puzzle = await puzzle_response.body()
 
@@ -312,7 +868,7 @@ class Base:
         piece_response: the full Playwright/HTTP response object
         piece: the image of the puzzle piece, returned as a sequence of bytes
         """
-        piece_req = self.get_requests(captcha_data['question']['url2'])[0]
+        piece_req = self.get_requests(captcha_data['question']['url2'])[-1]
         piece_response = await piece_req.response()
         piece = await piece_response.body()
 
@@ -325,8 +881,25 @@ class Base:
         -finally, the solution will be POSTed to TikTok, and the server's response will be obtained
         """
         solve = await captcha_solver.CaptchaSolver(captcha_response, puzzle, piece).solve_captcha()
+        return captcha_type, solve
 
+    async def _solve_captcha_automatically(self):
+        """
+        this method not only calculates the CAPTCHA solution but also POSTs it to TikTok's server.
+        """
         page = self.parent._page
+        for refreshes in range(MAX_CAPTCHA_REFRESHES + 1):
+            captcha_type, solve = await self._get_captcha_solution()
+            if solve['confidence'] is None or solve['confidence'] >= captcha_solver.MIN_SLIDE_CONFIDENCE:
+                break
+            if refreshes == MAX_CAPTCHA_REFRESHES:
+                # the threshold is only a guess at what TikTok rejects, so rather than give up, drag to the best match
+                self.parent.logger.info(
+                    f"No confident captcha solution after {refreshes} refreshes, trying the best match")
+                break
+            # dragging to a poor match would be rejected and count against the session, so get a new puzzle
+            await self._refresh_captcha(captcha_type)
+
         drag = page.locator('css=button.secsdk-captcha-drag-icon').first
         bar = page.locator('css=div.cap-bg-UISheetGrouped3').first
         
@@ -341,29 +914,25 @@ class Base:
         bar_effective_width = bar_bounding_box['width'] - drag_bounding_box['width']
         distance_to_drag = bar_effective_width * solve['maxloc']
 
-        curve_kwargs = {
-            'knotsCount': 7, 
-            'distortionMean': 14.3, 
-            'distortionStdev': 22.7, 
-            'distortionFrequency': 0.8, 
-            'targetPoints': 500
-        }
-        points = HumanCurve(
-            [0, 0], 
-            [int(drag_centre['x']), int(drag_centre['y'])],
-            **curve_kwargs
-        ).points
-        for point in points:
-            await page.mouse.move(point[0], point[1])
-        await page.mouse.down()
-        points = HumanCurve(
-            [int(drag_centre['x']), int(drag_centre['y'])], 
-            [int(drag_centre['x'] + distance_to_drag), int(drag_centre['y'])],
-            **curve_kwargs
-        ).points
-        for point in points:
-            await page.mouse.move(point[0], point[1])
-        await page.mouse.up()
+        start = (drag_centre['x'], drag_centre['y'])
+        end = (drag_centre['x'] + distance_to_drag, drag_centre['y'])
+        # generating a trajectory the cache doesn't have yet is slow, so keep it off the event loop,
+        # and have both ready so that the drag doesn't pause once the mouse is down
+        # the mouse is moved to 0, 0 on startup
+        approach = await asyncio.to_thread(TRAJECTORIES.between, (0, 0), start)
+        drag_path = await asyncio.to_thread(TRAJECTORIES.between, start, end)
+        # whole trajectories are replayed in timed batches, rather than awaiting every point
+        dispatcher = MouseDispatcher(page)
+        try:
+            await dispatcher.move(approach)
+            previous_verify_responses = set(id(response) for response in self.get_responses('/captcha/verify'))
+            await dispatcher.down(*start)
+            await dispatcher.move(drag_path, buttons=1)
+            await dispatcher.up(*end)
+        finally:
+            await dispatcher.close()
+
+        accepted = await self._get_captcha_verify_result(previous_verify_responses)
 
         if self.parent._log_captcha_solves:
             await asyncio.sleep(1)
@@ -372,3 +941,4 @@ class Base:
             with open(f"automated_captcha_{datetime.now().isoformat()}.json", "w") as f:
                 f.write(body)
 
+        return accepted
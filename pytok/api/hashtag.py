@@ -1,18 +1,20 @@
 from __future__ import annotations
 
 import json
+from urllib import parse as url_parsers
 
 from typing import TYPE_CHECKING, ClassVar, Iterator, Optional
 
-import requests
 
 if TYPE_CHECKING:
     from ..tiktok import PyTok
     from .video import Video
 
 from .base import Base
-from ..helpers import edit_url, extract_tag_contents
+from ..helpers import extract_tag_contents
 from ..exceptions import *
+from ..tracing import traced
+from .. import metrics
 
 
 class Hashtag(Base):
@@ -75,6 +77,7 @@ class Hashtag(Base):
             return await self.info_full(**kwargs)
         return self.as_dict
 
+    @traced('hashtag.info_full', hashtag='name')
     async def info_full(self, **kwargs) -> dict:
         """
         Returns all information sent by TikTok related to this hashtag.
@@ -86,8 +89,10 @@ class Hashtag(Base):
         """
         page = self.parent._page
 
-        url = f"https://www.tiktok.com/tag/{self.name}"
-        await page.goto(url)
+        url = self._url(f"tag/{self.name}")
+        previous_responses = set(id(response) for response in self.get_responses('api/challenge/item_list'))
+        async with self._navigation(url, 'hashtag'):
+            await page.goto(url)
 
         await self.wait_for_content_or_unavailable_or_captcha('[data-e2e=challenge-item]', 'Not available')
         await self.check_and_close_signin()
@@ -97,12 +102,26 @@ class Hashtag(Base):
         all_d = json.loads(json_s)
         self.as_dict = all_d['__DEFAULT_SCOPE__']['webapp.app-context']
 
+        # the challenge id is needed to page the api for this hashtag
+        if self.id is None:
+            challenge_detail = all_d['__DEFAULT_SCOPE__'].get('webapp.challenge-detail', {})
+            self.id = challenge_detail.get('challengeInfo', {}).get('challenge', {}).get('id')
+        if self.id is None:
+            # otherwise from the video requests made by this page, not by pages loaded before it
+            video_responses = [response for response in self.get_responses('api/challenge/item_list')
+                               if id(response) not in previous_responses]
+            if video_responses:
+                query = url_parsers.parse_qs(url_parsers.urlparse(video_responses[-1].url).query)
+                self.id = query.get('challengeID', [None])[0]
+
+    @traced('hashtag.videos', hashtag='name')
     async def videos(self, count=30, offset=0, **kwargs) -> Iterator[Video]:
         """Returns a dictionary listing TikToks with a specific hashtag.
 
         - Parameters:
             - count (int): The amount of videos you want returned.
             - offset (int): The the offset of videos from 0 you want to get.
+            - prefetch (int): The number of result pages to fetch ahead while you process the current one.
 
         Example Usage
         ```py
@@ -112,15 +131,44 @@ class Hashtag(Base):
         """
         await self.info()
 
-        try:
-            async for video in self._get_videos_api(count, offset, **kwargs):
-                yield video
-        except ApiFailedException:
-            async for video in self._get_videos_scraping(count, offset, **kwargs):
-                yield video
+        async for video in self._get_videos(count, offset, **kwargs):
+            metrics.ITEMS_YIELDED.labels(kind='video').inc()
+            yield video
+
+    async def _get_videos(self, count=30, offset=0, **kwargs):
+        """Yields each video once, from whichever strategy is currently working."""
+        strategies = {
+            'scraping': lambda: self._get_videos_scraping(count - len(video_ids), offset, seen=video_ids, **kwargs),
+        }
+        if self.id is not None and self.parent._request_templates.get('api/challenge/item_list') is not None:
+            strategies = {'api': lambda: self._get_videos_api(count, offset, **kwargs), **strategies}
+
+        # a strategy taking over from a failed one starts from the first video again
+        video_ids = set()
+        async for video in self.parent._strategies.run('api/challenge/item_list', strategies):
+            if video.id in video_ids:
+                continue
+            video_ids.add(video.id)
+            yield video
+            if len(video_ids) >= count:
+                return
 
+    def _get_own_video_requests(self, processed_urls):
+        # other hashtags' pages may have been crawled in the same session, so only this challenge's requests count
+        requests = []
+        for request in self.get_requests("api/challenge/item_list"):
+            if request.url in processed_urls:
+                continue
+            query = url_parsers.parse_qs(url_parsers.urlparse(request.url).query)
+            if query.get('challengeID', [None])[0] == str(self.id):
+                requests.append(request)
+        return requests
+
+    async def _get_videos_scraping(self, count=30, offset=0, seen=None, **kwargs):
+        """Scrapes up to count videos that aren't in seen, the ids of videos already had."""
+        if self.id is None:
+            raise ApiFailedException("Failed to scrape videos without the challenge id")
 
-    async def _get_videos_scraping(self, count=30, offset=0, **kwargs):
         processed_urls = []
         amount_yielded = 0
         pull_method = 'browser'
@@ -128,72 +176,89 @@ class Hashtag(Base):
         MAX_TRIES = 5
         data_request_path = "api/challenge/item_list"
 
-        while amount_yielded < count:
-            await self.parent.request_delay()
-
-            search_requests = self.get_requests(data_request_path)
-            search_requests = [request for request in search_requests if request.url not in processed_urls]
-            for request in search_requests:
-                processed_urls.append(request.url)
-                response = await request.response()
-                try:
-                    body = await self.get_response_body(response)
-                    res = json.loads(body)
-                except:
-                    continue
-                if res.get('type') == 'verify':
-                    # this is the captcha denied response
-                    continue
-
-                videos = res.get("itemList", [])
-                amount_yielded += len(videos)
-                for video in videos:
-                    yield self.parent.video(data=video)
+        async with self.parent._page_lock:
+            page = self.parent._page
+            url = self._url(f"tag/{self.name}")
+            if url_parsers.urlparse(page.url).path.rstrip('/') != url_parsers.urlparse(url).path:
+                # another crawl has navigated away from this hashtag's page since it was loaded
+                async with self._navigation(url, 'hashtag'):
+                    await page.goto(url)
+                await self.wait_for_content_or_unavailable_or_captcha('[data-e2e=challenge-item]', 'Not available')
 
-                if not res.get("hasMore", False):
-                    self.parent.logger.info(
-                        "TikTok isn't sending more TikToks beyond this point."
-                    )
-                    return
-
-            for _ in range(tries):
-                await self.slight_scroll_up()
-                await self.scroll_to_bottom()
+            while amount_yielded < count:
                 await self.parent.request_delay()
-            
-                search_requests = self.get_requests(data_request_path)
-                search_requests = [request for request in search_requests if request.url not in processed_urls]
 
-            if len(search_requests) == 0:
-                tries += 1
-                if tries > MAX_TRIES:
-                    raise
-                continue
-                
+                search_requests = self._get_own_video_requests(processed_urls)
+                for request in search_requests:
+                    processed_urls.append(request.url)
+                    response = await request.response()
+                    try:
+                        body = await self.get_response_body(response)
+                        res = json.loads(body)
+                    except:
+                        continue
+                    if res.get('type') == 'verify':
+                        # this is the captcha denied response
+                        continue
+
+                    videos = res.get("itemList") or []
+                    amount_yielded += sum(1 for video in videos if not seen or video.get('id') not in seen)
+                    for video in videos:
+                        yield self.parent.video(data=video)
+
+                    if not res.get("hasMore", False):
+                        self.parent.logger.info(
+                            "TikTok isn't sending more TikToks beyond this point."
+                        )
+                        return
+
+                for _ in range(tries):
+                    await self.slight_scroll_up()
+                    await self.scroll_to_bottom(stop_on_path=data_request_path)
+                    await self.parent.request_delay()
+
+                    search_requests = self._get_own_video_requests(processed_urls)
+
+                if len(search_requests) == 0:
+                    tries += 1
+                    if tries > MAX_TRIES:
+                        raise ApiFailedException(f"Failed to scrape more videos of #{self.name} after {MAX_TRIES} tries")
+                    continue
+
+    @traced('hashtag.videos_api', hashtag='name')
+    async def _get_videos_api(self, count=30, offset=0, prefetch=0, **kwargs):
+        async for videos in self._read_ahead(self._get_video_pages_api(count), prefetch):
+            for video in videos:
+                yield self.parent.video(data=video)
 
-    async def _get_videos_api(self, count=30, offset=0, **kwargs):
-        responses = self.get_responses("api/challenge/item_list")
-        response = responses[-1]
+    async def _get_video_pages_api(self, count):
+        template = self.parent._request_templates.get('api/challenge/item_list')
+        if template is None:
+            raise ApiFailedException("Failed to get videos from API without a request template")
+        if self.id is None:
+            raise ApiFailedException("Failed to get videos from API without the challenge id")
 
-        amount_yielded = 0
+        amount_fetched = 0
         cursor = 0
-        while amount_yielded < count:
+        while amount_fetched < count:
             
-            next_url = edit_url(response.url, {"cursor": cursor})
-            cookies = await self.parent._context.cookies()
-            cookies = {cookie['name']: cookie['value'] for cookie in cookies}
-            r = requests.get(next_url, headers=response.headers, cookies=cookies)
+            params = {"cursor": cursor, "challengeID": self.id}
+            next_url = template.url_for(params)
+            r = await self._api_get('api/challenge/item_list', next_url, headers=template.headers, cursor=cursor)
+            if r.status_code != 200 or not r.content:
+                raise ApiFailedException(f"Failed to get videos from API with status code {r.status_code}")
             try:
                 res = r.json()
             except json.decoder.JSONDecodeError:
                 raise ApiFailedException("Failed to decode JSON from TikTok API response")
+            if res.get('type') == 'verify':
+                raise ApiFailedException("TikTok API is asking for verification")
 
-            cursor = res["cursor"]
             videos = res.get("itemList", [])
+            cursor = res.get("cursor", cursor + len(videos))
 
-            amount_yielded += len(videos)
-            for video in videos:
-                yield self.parent.video(data=video)
+            amount_fetched += len(videos)
+            yield videos
 
             if not res.get("hasMore", False):
                 self.parent.logger.info(
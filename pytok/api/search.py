@@ -1,23 +1,20 @@
 from __future__ import annotations
 
+import asyncio
 import json
-import time
 from typing import TYPE_CHECKING, Iterator, Type, Optional
-from urllib.parse import urlencode
-import re
+from urllib import parse as url_parsers
 
 from .user import User
 from .hashtag import Hashtag
 from .video import Video
 from .base import Base
 from ..exceptions import *
+from ..tracing import traced
 
 if TYPE_CHECKING:
     from ..tiktok import PyTok
 
-import requests
-from playwright.async_api import TimeoutError
-
 class Search(Base):
     """Contains static methods about searching."""
 
@@ -77,7 +74,8 @@ class Search(Base):
             "user", count=count, offset=offset, **kwargs
         )
 
-    async def search_type(self, obj_type, count=28, offset=0, **kwargs) -> Iterator:
+    @traced('search.search_type', search_term='search_term')
+    async def search_type(self, obj_type, count=28, offset=0, prefetch=0, **kwargs) -> Iterator:
         """
         Searches for users using an alternate endpoint than Search.users
 
@@ -85,98 +83,192 @@ class Search(Base):
             - search_term (str): The phrase you want to search for.
             - count (int): The amount of videos you want returned.
             - obj_type (str): user | item
+            - prefetch (int): The number of result pages to fetch ahead while you process the current one.
+
+        The first search of a session loads the search page to learn the shape of the API request,
+        later results and searches are paged directly from the API. If TikTok asks for verification,
+        the search carries on in the browser.
 
         Just use .video & .users
         ```
         """
+        if obj_type not in ("user", "item"):
+            raise TypeError("invalid obj_type")
+
+        endpoint = f"api/search/{obj_type}"
+
+        async def get_results_api():
+            pages = self._get_result_pages_api(obj_type, count, offset)
+            async for res in self._read_ahead(pages, prefetch):
+                for result in self._parse_results(obj_type, res):
+                    yield result
+
+        async def get_results_page():
+            # the search page loads the first page of results itself, and shows us the request shape
+            res = await self._load_search_page(obj_type)
+            cursor = offset
+            if offset == 0:
+                results = self._parse_results(obj_type, res)
+                for result in results:
+                    yield result
+                if res.get("has_more", 0) == 0:
+                    self.parent.logger.info(
+                        "TikTok is not sending videos beyond this point."
+                    )
+                    return
+                cursor = res.get("cursor", len(results))
+
+            pages = self._get_result_pages_api(obj_type, count, cursor)
+            async for res in self._read_ahead(pages, prefetch):
+                for result in self._parse_results(obj_type, res):
+                    yield result
+
+        strategies = {
+            'page': get_results_page,
+            # the browser solves the captcha shown alongside a verify response, and carries on past it
+            'browser': lambda: self._get_results_browser(obj_type, count - len(result_ids), offset, seen=result_ids),
+        }
+        if self.parent._request_templates.get(endpoint) is not None:
+            strategies = {'api': get_results_api, **strategies}
+
+        # a strategy taking over from a failed one starts from the first result again
+        result_ids = set()
+        async for result in self.parent._strategies.run(endpoint, strategies):
+            result_id = self._result_id(result)
+            if result_id in result_ids:
+                continue
+            result_ids.add(result_id)
+            yield result
+            if len(result_ids) >= count:
+                return
+
+    @staticmethod
+    def _result_id(result):
+        if isinstance(result, User):
+            return result.user_id or result.sec_uid or result.username
+        return result.id
+
+    def _parse_results(self, obj_type, res):
+        # When I move to 3.10+ support make this a match switch.
+        if obj_type == "user":
+            return [self.parent.user(data=result) for result in res.get("user_list", [])]
+        return [self.parent.video(data=result) for result in res.get("item_list", [])]
 
+    def _search_page_url(self, obj_type):
         if obj_type == "user":
             subdomain = "www"
             subpath = "user"
-        elif obj_type == "item":
+        else:
             subdomain = "us"
             subpath = "video"
-        else:
-            raise TypeError("invalid obj_type")
-
-        page = self.parent._page
-
-        url = f"https://{subdomain}.tiktok.com/search/{subpath}?q={self.search_term}"
-        await page.goto(url)
+        base_url = self.parent._base_url.replace("://www.", f"://{subdomain}.")
+        return f"{base_url}/search/{subpath}?q={url_parsers.quote(self.search_term)}"
 
-        await self.wait_for_content_or_captcha('search_video-item')
-
-        processed_urls = []
+    async def _get_page_results(self, obj_type, action):
+        """
+        Runs an action on the search page, i.e. loading it or clicking load more, and returns the
+        results it fetched for this search term. Responses for other search terms are ignored.
+        """
+        previous = set(id(response) for response in self.get_responses(f"api/search/{obj_type}"))
+        response_task = asyncio.create_task(self.wait_for_response(
+            f"api/search/{obj_type}", query={'keyword': self.search_term},
+            predicate=lambda response: id(response) not in previous))
+        try:
+            await action()
+        except BaseException:
+            # the response may never come, so don't wait out its timeout before raising
+            response_task.cancel()
+            raise
+        response = await response_task
+        try:
+            body = getattr(response, '_body', None) or await self.get_response_body(response)
+            return json.loads(body)
+        except Exception as e:
+            raise ApiFailedException(f"Failed to read the search results for '{self.search_term}'") from e
+
+    async def _open_search_page(self, obj_type):
+        # the caller holds the page lock
+        url = self._search_page_url(obj_type)
+        async with self._navigation(url, 'search'):
+            return await self._get_page_results(obj_type, lambda: self.parent._page.goto(url))
+
+    async def _load_search_page(self, obj_type):
+        """Loads the search page, returning its first page of results."""
+        async with self.parent._page_lock:
+            res = await self._open_search_page(obj_type)
+        if res.get('type') == 'verify':
+            raise ApiFailedException("TikTok search is asking for verification")
+        return res
+
+    async def _get_result_pages_api(self, obj_type, count, cursor):
+        endpoint = f"api/search/{obj_type}"
+        amount_fetched = 0
+        while amount_fetched < count:
+            template = self.parent._request_templates.get(endpoint)
+            if template is None:
+                raise ApiFailedException("Failed to search from API without a request template")
+
+            # video search pages by offset, user search by cursor
+            cursor_param = 'cursor' if 'cursor=' in template.url else 'offset'
+            next_url = template.url_for({'keyword': self.search_term, cursor_param: cursor})
+            r = await self._api_get(endpoint, next_url, headers=template.headers, cursor=cursor)
+
+            if r.status_code != 200 or not r.content:
+                raise ApiFailedException(f"Failed to search from API with status code {r.status_code}")
+            res = r.json()
+            if res.get('type') == 'verify':
+                raise ApiFailedException("TikTok search is asking for verification")
+
+            results = res.get("user_list" if obj_type == "user" else "item_list", [])
+            amount_fetched += len(results)
+            yield res
+
+            if res.get("has_more", 0) == 0:
+                self.parent.logger.info(
+                    "TikTok is not sending videos beyond this point."
+                )
+                return
+            cursor = res.get("cursor", cursor + len(results))
+
+    async def _get_results_browser(self, obj_type, count, skip=0, seen=None):
+        """
+        Searches in the browser, from this search term's own search page, skipping the first skip results,
+        until count results that aren't in seen, the ids of results already had, have been yielded.
+        Holds the page lock throughout, so that other crawls can't navigate away from the results.
+        """
         amount_yielded = 0
-        pull_method = 'browser'
-        
-        path = f"api/search/{obj_type}"
-
-        while amount_yielded < count:
-            await self.parent.request_delay()
-
-            if pull_method == 'browser':
-                search_requests = self.get_requests(path)
-                search_requests = [request for request in search_requests if request.url not in processed_urls]
-                for request in search_requests:
-                    processed_urls.append(request.url)
-                    body = await self.get_response_body(request)
-                    res = json.loads(body)
-                    if res.get('type') == 'verify':
-                        # this is the captcha denied response
-                        continue
-
-                    # When I move to 3.10+ support make this a match switch.
-                    if obj_type == "user":
-                        for result in res.get("user_list", []):
-                            yield User(data=result)
-                            amount_yielded += 1
-
-                    if obj_type == "item":
-                        for result in res.get("item_list", []):
-                            yield Video(data=result)
-                            amount_yielded += 1
-
-                    if res.get("has_more", 0) == 0:
-                        Search.parent.logger.info(
-                            "TikTok is not sending videos beyond this point."
-                        )
-                        return
-
-                try:
-                    load_more_button = self.wait_for_content_or_captcha('search-load-more')
-                except TimeoutError:
-                    return
-
-                load_more_button.click()
-
-                self.wait_until_not_skeleton_or_captcha('video-skeleton-container')
-
-            
-            elif pull_method == 'requests':
-                cursor = res["cursor"]
-                next_url = re.sub("offset=([0-9]+)", f"offset={cursor}", request.url)
-                cookies = self.parent._context.cookies()
-                cookies = {cookie['name']: cookie['value'] for cookie in cookies}
-                r = requests.get(next_url, headers=request.headers, cookies=cookies)
-                res = r.json()
-
+        MAX_VERIFY_TRIES = 3
+        verify_tries = 0
+        position = 0
+        async with self.parent._page_lock:
+            res = await self._open_search_page(obj_type)
+            while True:
                 if res.get('type') == 'verify':
-                    pull_method = 'browser'
+                    # this is the captcha denied response
+                    verify_tries += 1
+                    if verify_tries > MAX_VERIFY_TRIES:
+                        raise ApiFailedException("TikTok search is still asking for verification")
+                    await self.check_and_wait_for_captcha()
+                    res = await self._get_page_results(obj_type, self.parent._page.reload)
                     continue
 
-                if obj_type == "user":
-                    for result in res.get("user_list", []):
-                        yield User(data=result)
-                        amount_yielded += 1
-
-                if obj_type == "item":
-                    for result in res.get("item_list", []):
-                        yield Video(data=result)
-                        amount_yielded += 1
+                for result in self._parse_results(obj_type, res):
+                    position += 1
+                    if position > skip:
+                        if not seen or self._result_id(result) not in seen:
+                            amount_yielded += 1
+                        yield result
 
                 if res.get("has_more", 0) == 0:
                     self.parent.logger.info(
                         "TikTok is not sending videos beyond this point."
                     )
                     return
+                if amount_yielded >= count:
+                    return
+
+                try:
+                    load_more_button = await self.wait_for_content_or_captcha('[data-e2e=search-load-more]')
+                except TimeoutException:
+                    return
+                res = await self._get_page_results(obj_type, load_more_button.click)
@@ -1,9 +1,7 @@
 from __future__ import annotations
-from os import path
 
 import json
-
-from urllib.parse import quote, urlencode
+import re
 
 from ..helpers import extract_tag_contents
 from ..exceptions import *
@@ -15,8 +13,12 @@ if TYPE_CHECKING:
     from .user import User
     from .video import Video
 
+from .base import Base, API_RESPONSE_DELAY
+from ..tracing import traced
+from .. import metrics
+
 
-class Sound:
+class Sound(Base):
     """
     A TikTok Sound/Music/Song.
 
@@ -39,9 +41,12 @@ class Sound:
         """
         You must provide the id of the sound or it will not work.
         """
-        # Set parent directly as an instance attribute
-        self.parent = parent
-        
+        # Initialize Base class with parent
+        super().__init__(parent)
+
+        self.title = None
+        self.author = None
+
         if data is not None:
             self.as_dict = data
             self.__extract_from_data()
@@ -49,6 +54,7 @@ class Sound:
             raise TypeError("You must provide id parameter.")
         else:
             self.id = id
+            self.as_dict = None
             
         # Make sure parent is set
         if not hasattr(self, 'parent') or self.parent is None:
@@ -61,14 +67,13 @@ class Sound:
                     self.parent = caller.parent
             del frame  # Avoid reference cycles
 
-    def info(self, use_html=False, **kwargs) -> dict:
+    async def info(self, use_html=False, **kwargs) -> dict:
         """
         Returns a dictionary of TikTok's Sound/Music object.
 
         - Parameters:
-            - use_html (bool): If you want to perform an HTML request or not.
-                Defaults to False to use an API call, which shouldn't get detected
-                as often as an HTML request.
+            - use_html (bool): Unused, the music page is always loaded as TikTok has no
+                stable API endpoint for sound details.
 
 
         Example Usage
@@ -76,29 +81,63 @@ class Sound:
         sound_data = api.sound(id='7016547803243022337').info()
         ```
         """
-        raise NotImplementedError()
+        if self.as_dict is None:
+            await self.info_full(**kwargs)
+        return self.as_dict
 
-    def info_full(self, **kwargs) -> dict:
+    @traced('sound.info_full', sound_id='id')
+    async def info_full(self, **kwargs) -> dict:
         """
-        Returns all the data associated with a TikTok Sound.
+        Returns all the data associated with a TikTok Sound, including its author and stats.
 
-        This makes an API request, there is no HTML request option, as such
-        with Sound.info()
+        This loads the music page, which also starts loading the videos using the sound.
 
         Example Usage
         ```py
         sound_data = api.sound(id='7016547803243022337').info_full()
         ```
         """
-        raise NotImplementedError()
+        page = self.parent._page
+
+        url = self._get_url()
+        async with self._navigation(url, 'sound'):
+            await page.goto(url)
+
+        try:
+            await self.wait_for_response('api/music/item_list', query={'musicID': self.id},
+                                         timeout=API_RESPONSE_DELAY, include_existing=True,
+                                         unavailable_text="Couldn't find this sound")
+        except TimeoutException:
+            # sounds without videos never request their item list
+            pass
+        await self.check_and_close_signin()
+
+        content = await page.content()
+        all_d = json.loads(extract_tag_contents(content))
+        music_detail = all_d['__DEFAULT_SCOPE__']['webapp.music-detail']
+        if music_detail.get('statusCode', 0) != 0:
+            raise NotAvailableException(
+                f"Content is not available with status message: {music_detail.get('statusMsg')}")
 
-    def videos(self, count=30, offset=0, **kwargs) -> Iterator[Video]:
+        music_info = music_detail['musicInfo']
+        self.as_dict = music_info['music']
+        self.__extract_from_data()
+        return music_info
+
+    def _get_url(self) -> str:
+        # tiktok redirects to the right title as long as the url ends with the id
+        slug = re.sub(r'[^a-z0-9]+', '-', (self.title or 'sound').lower()).strip('-') or 'sound'
+        return self._url(f"music/{slug}-{self.id}")
+
+    @traced('sound.videos', sound_id='id')
+    async def videos(self, count=30, offset=0, prefetch=0, **kwargs) -> Iterator[Video]:
         """
         Returns Video objects of videos created with this sound.
 
         - Parameters:
             - count (int): The amount of videos you want returned.
             - offset (int): The offset of videos you want returned.
+            - prefetch (int): The number of result pages to fetch ahead while you process the current one.
 
         Example Usage
         ```py
@@ -106,7 +145,148 @@ class Sound:
             # do something
         ```
         """
-        raise NotImplementedError()
+        processed_urls = []
+
+        async def get_videos_api():
+            async for videos in self._read_ahead(self._get_video_pages_api(count, offset), prefetch):
+                for video in videos:
+                    yield video
+
+        async def get_videos_page():
+            # the music page loads the first page of videos itself, and shows us the request shape
+            async with self.parent._page_lock:
+                await self.info_full()
+                videos, finished, cursor = await self._get_initial_videos(processed_urls)
+            if offset == 0:
+                for video in videos[:count]:
+                    yield video
+                if finished or len(videos) >= count:
+                    return
+            else:
+                cursor = offset
+
+            async for videos in self._read_ahead(self._get_video_pages_api(count, cursor), prefetch):
+                for video in videos:
+                    yield video
+
+        strategies = {
+            'page': get_videos_page,
+            # scraping solves the captcha shown alongside a verify response, and carries on past it
+            'scraping': lambda: self._get_videos_scraping(count - len(video_ids), processed_urls, seen=video_ids),
+        }
+        if self.parent._request_templates.get('api/music/item_list') is not None:
+            strategies = {'api': get_videos_api, **strategies}
+
+        # a strategy taking over from a failed one starts from the first video again
+        video_ids = set()
+        async for video in self.parent._strategies.run('api/music/item_list', strategies):
+            if video.id in video_ids:
+                continue
+            video_ids.add(video.id)
+            metrics.ITEMS_YIELDED.labels(kind='video').inc()
+            yield video
+            if len(video_ids) >= count:
+                return
+
+    async def _get_initial_videos(self, processed_urls):
+        all_videos = []
+        finished = True
+        cursor = 0
+        asked_to_verify = False
+        for response in self.get_responses('api/music/item_list'):
+            if f"musicID={self.id}" not in response.url or not getattr(response, '_body', None):
+                continue
+            processed_urls.append(response.url)
+            res = json.loads(response._body)
+            if res.get('type') == 'verify':
+                asked_to_verify = True
+                continue
+            all_videos += [self.parent.video(data=video) for video in res.get('itemList', [])]
+            finished = not res.get('hasMore', False)
+            cursor = int(res.get('cursor', cursor))
+        if asked_to_verify and not all_videos:
+            raise ApiFailedException("TikTok is asking for verification on the music page")
+        return all_videos, finished, cursor
+
+    async def _get_video_pages_api(self, count, cursor):
+        template = self.parent._request_templates.get('api/music/item_list')
+        if template is None:
+            raise ApiFailedException("Failed to get videos from API without a request template")
+
+        amount_fetched = 0
+        while amount_fetched < count:
+            next_url = template.url_for({'musicID': self.id, 'cursor': cursor})
+            r = await self._api_get('api/music/item_list', next_url, headers=template.headers, cursor=cursor)
+
+            if r.status_code != 200:
+                raise ApiFailedException(f"Failed to get videos from API with status code {r.status_code}")
+            if not r.content:
+                raise ApiFailedException("Failed to get videos from API with empty response")
+
+            with self._span('json_parse', endpoint='api/music/item_list', bytes=len(r.content)):
+                res = r.json()
+
+            if res.get('type') == 'verify':
+                raise ApiFailedException("TikTok API is asking for verification")
+
+            videos = [self.parent.video(data=video) for video in res.get('itemList', [])]
+            amount_fetched += len(videos)
+            if videos:
+                yield videos
+
+            if not res.get('hasMore', False):
+                self.parent.logger.info(
+                    "TikTok isn't sending more TikToks beyond this point."
+                )
+                return
+            cursor = int(res['cursor'])
+
+    @traced('sound.videos_scraping', sound_id='id')
+    async def _get_videos_scraping(self, count, processed_urls, seen=None):
+        """Scrapes up to count videos that aren't in seen, the ids of videos already had."""
+        page = self.parent._page
+        data_request_path = 'api/music/item_list'
+
+        async with self.parent._page_lock:
+            url = self._get_url()
+            if f"-{self.id}" not in page.url:
+                async with self._navigation(url, 'sound'):
+                    await page.goto(url)
+
+            amount_yielded = 0
+            tries = 0
+            MAX_TRIES = 5
+            while amount_yielded < count:
+                await self.scroll_to_bottom(stop_on_path=data_request_path)
+                try:
+                    response = await self.wait_for_response(data_request_path, query={'musicID': self.id},
+                                                            timeout=API_RESPONSE_DELAY, include_existing=True,
+                                                            exclude_urls=processed_urls)
+                except TimeoutException:
+                    tries += 1
+                    if tries > MAX_TRIES:
+                        return
+                    await self.slight_scroll_up()
+                    continue
+                processed_urls.append(response.url)
+
+                if not getattr(response, '_body', None):
+                    continue
+                res = json.loads(response._body)
+                if res.get('type') == 'verify':
+                    # this is the captcha denied response
+                    continue
+
+                videos = res.get('itemList') or []
+                amount_yielded += sum(1 for video in videos if not seen or video.get('id') not in seen)
+                for video in videos:
+                    yield self.parent.video(data=video)
+
+                if not res.get('hasMore', False):
+                    self.parent.logger.info(
+                        "TikTok isn't sending more TikToks beyond this point."
+                    )
+                    return
 
     def __extract_from_data(self):
         data = self.as_dict
@@ -119,7 +299,7 @@ class Sound:
             self.author = self.parent.user(username=data["authorName"])
 
         if self.id is None:
-            Sound.parent.logger.error(
+            self.parent.logger.error(
                 f"Failed to create Sound with data: {data}\nwhich has keys {data.keys()}"
             )
 
@@ -1,26 +1,33 @@
 from __future__ import annotations
 
-import logging
-from urllib.parse import urlencode
+import functools
+import json
+from datetime import datetime, timezone
 from typing import TYPE_CHECKING, Iterator, Optional
+from urllib import parse as url_parsers
 
+from .base import Base, API_RESPONSE_DELAY
 from .video import Video
 from .sound import Sound
 from .user import User
 from .hashtag import Hashtag
+from ..concurrency import BoundedSeenSet, merge
+from ..exceptions import *
+from ..tracing import traced
+from .. import metrics
 
 if TYPE_CHECKING:
     from ..tiktok import PyTok
 
 
-class Trending:
-    """Contains static methods related to trending."""
+class Trending(Base):
+    """Contains methods related to trending."""
 
     parent: PyTok
     
     def __init__(self, parent: Optional['PyTok'] = None):
         """Initialize with parent instance"""
-        self.parent = parent
+        super().__init__(parent)
         
         # Make sure parent is set
         if not hasattr(self, 'parent') or self.parent is None:
@@ -33,13 +40,156 @@ class Trending:
                     self.parent = caller.parent
             del frame  # Avoid reference cycles
 
-    @staticmethod
-    def videos(count=30, **kwargs) -> Iterator[Video]:
+    @traced('trending.videos')
+    async def videos(self, count=30, sessions=None, max_seen=100_000, max_stale_pages=5, prefetch=0,
+                     **kwargs) -> Iterator[Video]:
         """
-        Returns Videos that are trending on TikTok.
+        Returns Videos that are trending on TikTok, sampled from the For You feed.
+
+        The first feed page of a session is loaded in the browser to learn the shape of the feed
+        request, after which feed pages are pulled directly from the API. Each video is yielded
+        only once, with an arrived_at datetime of when its feed page arrived.
 
         - Parameters:
             - count (int): The amount of videos you want returned.
+            - sessions (list): Other entered PyTok instances to sample the feed with in parallel, widening the sample.
+            - max_seen (int): The number of video ids to remember for deduplication.
+            - max_stale_pages (int): Stop after this many feed pages in a row without a new video.
+            - prefetch (int): The number of feed pages each session fetches ahead of the consumer.
+
+        Example Usage
+        ```py
+        async for video in api.trending().videos(count=1000):
+            print(video.arrived_at, video.id)
+        ```
+        """
+        samplers = [self] + [session.trending() for session in (sessions or [])]
+        seen = BoundedSeenSet(max_seen)
+        amount_yielded = 0
+        stale_pages = 0
+
+        def on_done(index, error):
+            if error is not None:
+                self.parent.logger.warning(f"Trending sampler {index} stopped: {error}")
+
+        sources = {index: functools.partial(sampler._sample_feed, prefetch) for index, sampler in enumerate(samplers)}
+        async for index, (arrived_at, items) in merge(sources, concurrency=len(samplers), on_done=on_done):
+            new_videos = 0
+            for item in items:
+                if 'id' not in item or item['id'] in seen:
+                    continue
+                seen.add(item['id'])
+                video = samplers[index].parent.video(data=item)
+                video.arrived_at = arrived_at
+                new_videos += 1
+                amount_yielded += 1
+                metrics.ITEMS_YIELDED.labels(kind='video').inc()
+                yield video
+                if amount_yielded >= count:
+                    return
+
+            stale_pages = 0 if new_videos else stale_pages + 1
+            if stale_pages >= max_stale_pages * len(samplers):
+                self.parent.logger.info("The For You feed isn't sending new videos anymore.")
+                return
+
+    async def _sample_feed(self, prefetch=0):
+        """
+        Yields (arrived_at, items) for each feed page, forever, as the feed has no end. A strategy
+        taking over from a failed one may repeat videos, which videos() deduplicates.
         """
+        async def get_feed_pages_page():
+            # the for you page loads the first feed page itself, and shows us the request shape
+            yield await self._load_feed()
+            async for page in self._read_ahead(self._get_feed_pages_api(), prefetch):
+                yield page
+
+        strategies = {
+            'page': get_feed_pages_page,
+            'browser': self._get_feed_pages_browser,
+        }
+        if self.parent._request_templates.get('api/recommend/item_list') is not None:
+            strategies = {'api': lambda: self._read_ahead(self._get_feed_pages_api(), prefetch), **strategies}
+
+        async for page in self.parent._strategies.run('api/recommend/item_list', strategies):
+            yield page
+
+    async def _load_feed(self):
+        page = self.parent._page
+        url = self._url('foryou')
+        async with self.parent._page_lock, self._navigation(url, 'trending'):
+            await page.goto(url)
+            response = await self.wait_for_response('api/recommend/item_list', timeout=API_RESPONSE_DELAY,
+                                                    include_existing=True)
+        return datetime.now(timezone.utc), self._parse_feed_page(response._body)
+
+    async def _get_feed_pages_api(self, max_repeated_pages=5):
+        # the same request is sent every time, so stop if the feed keeps answering it with videos already seen
+        seen = BoundedSeenSet(10_000)
+        repeated_pages = 0
+        while True:
+            # the feed has no cursor, every request for it returns a fresh batch
+            template = self.parent._request_templates.get('api/recommend/item_list')
+            if template is None:
+                raise ApiFailedException("Failed to get the feed from API without a request template")
+
+            r = await self._api_get('api/recommend/item_list', template.url, headers=template.headers)
+            arrived_at = datetime.now(timezone.utc)
+
+            if r.status_code != 200:
+                raise ApiFailedException(f"Failed to get the feed from API with status code {r.status_code}")
+            if not r.content:
+                raise ApiFailedException("Failed to get the feed from API with empty response")
+            items = self._parse_feed_page(r.content)
+            new_ids = [item['id'] for item in items if 'id' in item and item['id'] not in seen]
+            for item_id in new_ids:
+                seen.add(item_id)
+            repeated_pages = 0 if new_ids else repeated_pages + 1
+            if repeated_pages >= max_repeated_pages:
+                raise ApiFailedException(f"The feed API returned no new videos {repeated_pages} times in a row")
+            yield arrived_at, items
+
+    def _parse_feed_page(self, body):
+        with self._span('json_parse', endpoint='api/recommend/item_list', bytes=len(body or b'')):
+            res = json.loads(body)
+        if res.get('type') == 'verify':
+            raise ApiFailedException("TikTok API is asking for verification")
+        return res.get('itemList', [])
+
+    async def _get_feed_pages_browser(self):
+        data_request_path = 'api/recommend/item_list'
+        processed_urls = [response.url for response in self.get_responses(data_request_path)]
+        page = self.parent._page
+        url = self._url('foryou')
+        async with self.parent._page_lock:
+            if url_parsers.urlparse(page.url).path.rstrip('/') != url_parsers.urlparse(url).path:
+                # the feed only loads more pages while the for you page is open
+                async with self._navigation(url, 'trending'):
+                    await page.goto(url)
 
-        raise NotImplementedError()
+        # timeouts and verify or undecodable pages in a row
+        tries = 0
+        MAX_TRIES = 5
+        while True:
+            async with self.parent._page_lock:
+                await self.scroll_to_bottom(stop_on_path=data_request_path)
+                try:
+                    response = await self.wait_for_response(data_request_path, timeout=API_RESPONSE_DELAY,
+                                                            include_existing=True, exclude_urls=processed_urls)
+                except TimeoutException:
+                    response = None
+            items = None
+            if response is not None:
+                processed_urls.append(response.url)
+                try:
+                    items = self._parse_feed_page(response._body)
+                except (ApiFailedException, ValueError, TypeError):
+                    # this is the captcha denied response, or a body that never arrived
+                    pass
+            if items is None:
+                tries += 1
+                if tries > MAX_TRIES:
+                    raise ApiFailedException(f"Failed to get more feed pages after {MAX_TRIES} tries")
+                continue
+            tries = 0
+            yield datetime.now(timezone.utc), items
@@ -6,13 +6,12 @@ import re
 from urllib.parse import urlencode, urlparse
 
 import playwright.async_api
-import requests
 from TikTokApi import TikTokApi
 from TikTokApi.tiktok import TikTokPlaywrightSession
 import TikTokApi.exceptions as tiktokapi_exceptions
 
 from ..exceptions import *
-from ..helpers import extract_tag_contents, edit_url
+from ..helpers import extract_tag_contents
 
 from typing import TYPE_CHECKING, ClassVar, Iterator, Optional
 
@@ -20,7 +19,12 @@ if TYPE_CHECKING:
     from ..tiktok import PyTok
     from .video import Video
 
-from .base import Base
+from .base import Base, API_RESPONSE_DELAY
+from ..tracing import traced
+from .. import metrics
+
+# accounts with more videos than this aren't cached, rather than holding all their videos until the end
+MAX_CACHED_VIDEOS = 1000
 
 
 class User(Base):
@@ -81,10 +85,11 @@ class User(Base):
         """
         return self.info_full(**kwargs)
 
+    @traced('user.info_full', username='username')
     async def info_full(self, **kwargs) -> dict:
         """
         Returns a dictionary of information associated with this User.
-        Includes statistics about this user.
+        Includes statistics about this user. Served from the entity cache if PyTok has one.
 
         Example Usage
         ```py
@@ -98,28 +103,62 @@ class User(Base):
                 "You must provide the username when creating this class to use this method."
             )
 
-        url = f"https://www.tiktok.com/@{self.username}?lang=en"
+        user = await self.parent._cache_lookup('user', self.username, revalidate=self._get_info_api, keys=self._cache_keys)
+        if user is None:
+            user = await self._get_info_page()
+            await self.parent._cache_store('user', self._cache_keys(user), user)
+        self.as_dict = user
+        self.__extract_from_data()
+        return user
+
+    @staticmethod
+    def _cache_keys(user):
+        return [user.get('uniqueId'), user.get('secUid')]
+
+    async def _get_info_api(self, stale_user=None):
+        template = self.parent._request_templates.get('api/user/detail')
+        if template is None:
+            raise ApiFailedException("Failed to get user info from API without a request template")
+
+        url = template.url_for({'uniqueId': self.username, 'secUid': self.sec_uid or ''})
+        r = await self._api_get('api/user/detail', url, headers=template.headers)
+        if r.status_code != 200 or not r.content:
+            raise ApiFailedException(f"Failed to get user info from API with status code {r.status_code}")
+
+        res = r.json()
+        if res.get('type') == 'verify':
+            raise ApiFailedException("TikTok API is asking for verification")
+        user_info = res['userInfo']
+        return user_info['user'] | user_info['stats']
+
+    async def _get_info_page(self):
+        url = self._url(f"@{self.username}?lang=en")
 
         page = self.parent._page
         
         if page.url != url:
-            async with page.expect_request(url) as event:
-                await page.goto(url, timeout=60 * 1000)
-                request = await event.value
-                response = await request.response()
-                if response.status >= 300:
-                    raise NotAvailableException("Content is not available")
-
-        # try:
-        print("running checks")
-        await self.check_and_retry_on_loading_error('Something went wrong')
-        await self.wait_for_content_or_unavailable_or_captcha('[data-e2e=user-post-item]',
-                                                            "Couldn't find this account",
-                                                            no_content_text=["No content", "This account is private"])
-        await self.check_for_unavailable_or_captcha('User has no content')  # check for captcha
-        await page.wait_for_load_state('networkidle')
-        await self.check_for_unavailable_or_captcha('User has no content')  # check for login
-        await self.check_for_unavailable("Couldn't find this account")
+            async with self._navigation(url, 'user'):
+                async with page.expect_request(url) as event:
+                    await page.goto(url, timeout=60 * 1000)
+                    request = await event.value
+                    response = await request.response()
+                    if response.status >= 300:
+                        raise NotAvailableException("Content is not available")
+
+        # one watcher deals with loading errors, captchas and login prompts as they show up
+        await self.wait_for_page_state('[data-e2e=user-post-item]',
+                                       unavailable_text=["Couldn't find this account", 'User has no content'],
+                                       no_content_text=["No content", "This account is private"],
+                                       loading_error_text='Something went wrong')
+        try:
+            await self.wait_for_response('api/post/item_list',
+                                         query={'secUid': self.sec_uid} if self.sec_uid else None,
+                                         timeout=API_RESPONSE_DELAY, include_existing=True)
+        except TimeoutException:
+            # accounts without videos never request their item list
+            pass
+        # a login prompt or an unavailable message can still show up after the content did
+        await self.check_for_unavailable_or_captcha(["Couldn't find this account", 'User has no content'])
         data_responses = self.get_responses('api/user/detail')
 
         if len(data_responses) > 0:
@@ -133,7 +172,13 @@ class User(Base):
         else:
             # get initial html data
             html_body = await page.content()
-            
+
+        user = self._parse_info_html(html_body)
+        self.as_dict = user
+        self.__extract_from_data()
+        return user
+
+    def _parse_info_html(self, html_body):
         tag_contents = extract_tag_contents(html_body)
         self.initial_json = json.loads(tag_contents)
 
@@ -147,11 +192,48 @@ class User(Base):
             user = user_info['user'] | user_info['stats']
         else:
             raise InvalidJSONException("Failed to find user data in HTML")
+        return user
+
+    async def _get_info_document(self):
+        """Gets the user's info from the profile's HTML document alone, without loading the page in the browser."""
+        url = self._url(f"@{self.username}?lang=en")
+        template = self.parent._request_templates.get('api/user/detail')
+        headers = dict(template.headers) if template is not None else {'user-agent': self.parent._user_agent}
+        headers['accept'] = 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8'
+        r = await self._api_get('user_document', url, headers=headers)
+        if r.status_code != 200 or not r.content:
+            raise ApiFailedException(f"Failed to get profile document with status code {r.status_code}")
+        try:
+            return self._parse_info_html(r.content)
+        except (NotAvailableException, InvalidJSONException, KeyError) as ex:
+            # without a browser, a verification page comes back instead of the profile
+            raise ApiFailedException(f"Failed to find user data in profile document: {ex}")
+
+    async def _get_info_page_locked(self):
+        async with self.parent._page_lock:
+            return await self._get_info_page()
 
+    @traced('user.info_batched', username='username')
+    async def _get_info_batched(self) -> dict:
+        """
+        Returns the user's info for PyTok.users_info, from the entity cache, the user detail API or
+        the profile's HTML document where possible, and from a full profile page load otherwise.
+        """
+        user = await self.parent._cache_lookup('user', self.username, revalidate=self._get_info_api, keys=self._cache_keys)
+        if user is None:
+            strategies = {}
+            if self.parent._request_templates.get('api/user/detail') is not None:
+                strategies['api'] = _single(self._get_info_api)
+            strategies['document'] = _single(self._get_info_document)
+            strategies['page'] = _single(self._get_info_page_locked)
+            users = [user async for user in self.parent._strategies.run('api/user/detail', strategies)]
+            user = users[0]
+            await self.parent._cache_store('user', self._cache_keys(user), user)
         self.as_dict = user
         self.__extract_from_data()
         return user
 
+    @traced('user.videos', username='username')
     async def videos(self, get_bytes=False, count=None, batch_size=100, **kwargs) -> Iterator[Video]:
         """
         Returns an iterator yielding Video objects.
@@ -159,6 +241,7 @@ class User(Base):
         - Parameters:
             - count (int): The amount of videos you want returned.
             - cursor (int): The unix epoch to get uploaded videos since.
+            - prefetch (int): The number of result pages to fetch ahead while you process the current one.
 
         Example Usage
         ```py
@@ -169,8 +252,17 @@ class User(Base):
         """
         if self.as_dict and self.as_dict['videoCount'] == 0:
             return
-        
-        try:
+
+        cached = await self.parent._cache_lookup('user_videos', self.username or self.sec_uid,
+                                           revalidate=self._get_cacheable_videos_api,
+                                           keys=lambda _: [self.username, self.sec_uid])
+        if cached is not None and (cached['complete'] or count and count <= len(cached['items'])):
+            for video in cached['items'][:count]:
+                metrics.ITEMS_YIELDED.labels(kind='video').inc()
+                yield self.parent.video(data=video)
+            return
+
+        async def get_videos_profile():
             videos, finished, cursor = await self._get_initial_videos(count, get_bytes)
             for video in videos:
                 yield video
@@ -180,18 +272,78 @@ class User(Base):
 
             async for video in self._get_videos_api(count, cursor, get_bytes, **kwargs):
                 yield video
-        except ApiFailedException:
-            async for video in self._get_videos_scraping(count, get_bytes):
-                yield video
-        except Exception as ex:
-            raise
 
-    async def _get_videos_api(self, count, cursor, get_bytes, **kwargs) -> Iterator[Video]:
+        strategies = {
+            'profile': get_videos_profile,
+            'scraping': lambda: self._get_videos_scraping(count, get_bytes),
+        }
+        if self.sec_uid and self.parent._request_templates.get('api/post/item_list'):
+            # the request shape is already known, so the API can be paged without loading the profile
+            strategies = {'api': lambda: self._get_videos_api(count, 0, get_bytes, **kwargs), **strategies}
+
+        # a strategy taking over from a failed one starts from the first video again
+        video_ids = set()
+        # only kept if they will be cached
+        items = [] if self.parent._entity_cache is not None else None
+        async for video in self.parent._strategies.run('api/post/item_list', strategies):
+            if video.id in video_ids:
+                continue
+            video_ids.add(video.id)
+            if items is not None:
+                items.append(video.as_dict)
+                if len(items) > MAX_CACHED_VIDEOS:
+                    items = None
+            metrics.ITEMS_YIELDED.labels(kind='video').inc()
+            yield video
+            if count and len(video_ids) >= count:
+                if items is not None:
+                    await self.parent._cache_store('user_videos', [self.username, self.sec_uid],
+                                             {'items': items, 'complete': False})
+                return
+
+        if items is not None:
+            await self.parent._cache_store('user_videos', [self.username, self.sec_uid], {'items': items, 'complete': True})
+
+    async def _get_cacheable_videos_api(self, stale_videos):
+        """Fetches as many videos as were cached before, without the browser page."""
+        if not self.sec_uid:
+            raise ApiFailedException("Failed to get videos from API without a sec_uid")
+        count = None if stale_videos['complete'] else len(stale_videos['items'])
+        items = []
+        async for videos in self._get_video_pages_api(count, 0):
+            items += videos
+        return {'items': items[:count], 'complete': stale_videos['complete']}
+
+    @traced('user.videos_api', username='username')
+    async def _get_videos_api(self, count, cursor, get_bytes, prefetch=0, **kwargs) -> Iterator[Video]:
         # requesting videos via the api in the context of the browser session makes tiktok kill the session
         # using requests instead
-        amount_yielded = 0
+        async for videos in self._read_ahead(self._get_video_pages_api(count, cursor), prefetch):
+            # Fixed video object creation to use explicit id parameter
+            video_objs = []
+            for video in videos:
+                try:
+                    if 'id' in video:
+                        # Explicitly pass parent to ensure it's set
+                        video_obj = self.parent.video(id=video['id'], data=video, parent=self.parent)
+                        # Double-check parent is set
+                        if not hasattr(video_obj, 'parent') or video_obj.parent is None:
+                            video_obj.parent = self.parent
+                        video_objs.append(video_obj)
+                    else:
+                        self.parent.logger.warning(f"Skipping video without ID: {video.get('desc', 'No description')}")
+                except Exception as e:
+                    self.parent.logger.error(f"Error creating video object: {str(e)}")
+
+            for video in video_objs:
+                yield video
 
-        data_request = self.parent.request_cache['videos']
+    async def _get_video_pages_api(self, count, cursor):
+        amount_fetched = 0
+
+        template = self.parent._request_templates.get('api/post/item_list')
+        if template is None:
+            raise ApiFailedException("Failed to get videos from API without a request template")
 
         all_cookies = await self.parent._context.cookies()
         verify_cookies = [cookie for cookie in all_cookies if cookie['name'] == 's_v_web_id']
@@ -199,24 +351,23 @@ class User(Base):
             raise ApiFailedException("Failed to get videos from API without verify cookies")
         verify_fp = verify_cookies[0]['value']
 
-        while (count is None or amount_yielded < count):
-            next_url = edit_url(
-                data_request.url, 
-                {
-                    'cursor': cursor, 
-                    'id': self.user_id, 
-                    'secUid': self.sec_uid,
-                    'needPinnedItemIds': True,
-                    'post_item_list_request_type': 0,
-                    'verifyFp': verify_fp
-                }
-            )
+        while (count is None or amount_fetched < count):
+            params = {
+                'cursor': cursor, 
+                'secUid': self.sec_uid,
+                'needPinnedItemIds': True,
+                'post_item_list_request_type': 0,
+                'verifyFp': verify_fp
+            }
+            if self.user_id:
+                params['id'] = self.user_id
+            next_url = template.url_for(params)
             headers = {
                 'accept': '*/*',
                 'accept-encoding': 'gzip, deflate, br, zstd',
                 'accept-language': 'en-GB,en;q=0.9',
                 'priority': 'u=1, i',
-                'referer': f'https://www.tiktok.com/@{self.username}?lang=en',
+                'referer': self._url(f'@{self.username}?lang=en'),
                 'sec-ch-ua': '"Not;A=Brand";v="24", "Chromium";v="128"',
                 'sec-ch-ua-mobile': '?0',
                 'sec-ch-ua-platform': '"Windows"',
@@ -225,16 +376,15 @@ class User(Base):
                 'sec-fetch-site': 'same-origin',
                 'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/128.0.6613.18 Safari/537.36'
             }
-            cookies = await self.parent._context.cookies()
-            cookies = {cookie['name']: cookie['value'] for cookie in cookies}
-            r = requests.get(next_url, headers=headers, cookies=cookies)
+            r = await self._api_get('api/post/item_list', next_url, headers=headers, cursor=cursor)
 
             if r.status_code != 200:
                 raise ApiFailedException(f"Failed to get videos from API with status code {r.status_code}")
             if not r.content:
                 raise ApiFailedException(f"Failed to get videos from API with empty response")
 
-            res = r.json()
+            with self._span('json_parse', endpoint='api/post/item_list', bytes=len(r.content)):
+                res = r.json()
 
             if res.get('type') == 'verify':
                 raise ApiFailedException("TikTok API is asking for verification")
@@ -243,25 +393,8 @@ class User(Base):
             cursor = int(res['cursor'])
 
             if videos:
-                amount_yielded += len(videos)
-                # Fixed video object creation to use explicit id parameter
-                video_objs = []
-                for video in videos:
-                    try:
-                        if 'id' in video:
-                            # Explicitly pass parent to ensure it's set
-                            video_obj = self.parent.video(id=video['id'], data=video, parent=self.parent)
-                            # Double-check parent is set
-                            if not hasattr(video_obj, 'parent') or video_obj.parent is None:
-                                video_obj.parent = self.parent
-                            video_objs.append(video_obj)
-                        else:
-                            self.parent.logger.warning(f"Skipping video without ID: {video.get('desc', 'No description')}")
-                    except Exception as e:
-                        self.parent.logger.error(f"Error creating video object: {str(e)}")
-
-                for video in video_objs:
-                    yield video
+                amount_fetched += len(videos)
+                yield videos
 
             has_more = res.get("hasMore")
             if not has_more:
@@ -269,16 +402,16 @@ class User(Base):
                     "TikTok isn't sending more TikToks beyond this point."
                 )
                 return
-
-            self.parent.request_delay()
         
 
+    @traced('user.videos_scraping', username='username')
     async def _get_videos_scraping(self, count, get_bytes):
         page = self.parent._page
 
-        url = f"https://www.tiktok.com/@{self.username}"
+        url = self._url(f"@{self.username}")
         if url not in page.url:
-            await page.goto(url)
+            async with self._navigation(url, 'user'):
+                await page.goto(url)
             self.check_initial_call(url)
         await self.wait_for_content_or_unavailable_or_captcha('[data-e2e=user-post-item]', "This account is private")
 
@@ -358,6 +491,7 @@ class User(Base):
 
             await self.parent.request_delay()
 
+    @traced('user.initial_videos', username='username')
     async def _get_initial_videos(self, count, get_bytes):
         all_videos = []
         finished = False
@@ -397,7 +531,6 @@ class User(Base):
         if len(video_responses) == 0:
             raise ApiFailedException("Failed to get videos from API")
 
-        self.parent.request_cache['videos'] = video_responses[-1]
         return all_videos, finished, cursor
 
     async def _get_videos_scroll(self, count, get_bytes):
@@ -416,21 +549,15 @@ class User(Base):
             await self.parent.request_delay()
             
             # Scroll to bottom with a slower speed for more reliable loading
-            await self.scroll_to_bottom(speed=10)
-            
-            # Wait for network requests to complete
-            await self.parent._page.wait_for_load_state('networkidle')
-            
-            # Wait for new videos to load with increased delay
-            await asyncio.sleep(3)  # Increased delay to ensure content loads
-            
-            # Wait for skeleton to disappear and new content to be visible
+            await self.scroll_to_bottom(speed=10, stop_on_path=data_request_path)
+
+            # Wait only as long as it takes for the next page of videos to arrive
             try:
-                await self.wait_until_not_skeleton_or_captcha('video-skeleton-container')
-                # Additional wait to ensure content is fully rendered
-                await asyncio.sleep(1)
-            except exceptions.TimeoutException:
-                # If skeleton doesn't disappear, continue anyway as content might be loaded
+                await self.wait_for_response(data_request_path, query={'secUid': self.sec_uid},
+                                             timeout=API_RESPONSE_DELAY, include_existing=True,
+                                             exclude_urls=data_urls)
+            except TimeoutException:
+                # no new page arrived, fall through and count this as a failed try
                 pass
 
             data_requests = [req for req in self.get_requests(data_request_path) if req.url not in data_urls]
@@ -457,7 +584,6 @@ class User(Base):
                     continue
 
                 valid_data_request = True
-                self.parent.request_cache['videos'] = data_request
 
                 res = json.loads(res_body)
                 videos = res.get("itemList", [])
@@ -608,3 +734,9 @@ class User(Base):
     def __str__(self):
         return f"PyTok.user(username='{self.username}', user_id='{self.user_id}', sec_uid='{self.sec_uid}')"
 
+
+def _single(fetch):
+    """Wraps a coroutine function as a strategy yielding its one result."""
+    async def strategy():
+        yield await fetch()
+    return strategy
@@ -3,12 +3,13 @@ from __future__ import annotations
 import asyncio
 from datetime import datetime
 import json
+import time
 from urllib import parse as url_parsers
 from typing import TYPE_CHECKING, ClassVar, Optional
 
 import brotli
 import requests
-from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from playwright.async_api import Error as PlaywrightError, TimeoutError as PlaywrightTimeoutError
 
 if TYPE_CHECKING:
     from ..tiktok import PyTok
@@ -16,9 +17,18 @@ if TYPE_CHECKING:
     from .sound import Sound
     from .hashtag import Hashtag
 
-from .base import Base
-from ..helpers import extract_tag_contents, edit_url, extract_video_id_from_url, extract_user_id_from_url
-from .. import exceptions
+from .base import Base, API_RESPONSE_DELAY
+from ..helpers import extract_tag_contents, extract_video_id_from_url, extract_user_id_from_url
+from .. import exceptions, metrics
+from ..comment_state import KNOWN
+from ..variants import DEFAULT, VideoVariant, parse_variants, rank_variants
+from ..tracing import traced
+
+# seconds to connect to a CDN, and to wait for each read from it, before trying the next one
+CDN_TIMEOUT = (5, 15)
+# seconds a whole download may take, so that a CDN trickling bytes doesn't hold it up either
+DOWNLOAD_DEADLINE = 300
+DOWNLOAD_CHUNK_SIZE = 1 << 16
 
 
 class Video(Base):
@@ -63,6 +73,8 @@ class Video(Base):
         self.username = None
         self.as_dict = {}
         self.parent = parent  # Set parent directly
+        # the comment state of an incremental crawl in progress
+        self._comment_state = None
 
         # Then call super() which might need these attributes
         super().__init__(parent)
@@ -99,16 +111,21 @@ class Video(Base):
         if self.id is None and url is None and data is None:
             raise TypeError("You must provide id, url, or data parameter.")
             
+    @traced('video.info', video_id='id')
     async def info(self, **kwargs) -> dict:
         """
         Returns a dictionary of all data associated with a TikTok Video.
+        Served from the entity cache if PyTok has one.
 
         Example Usage
         ```py
         video_data = api.video(id='7041997751718137094').info()
         ```
         """
-        if not hasattr(self, 'as_dict'):
+        if not self.as_dict:
+            self.as_dict = await self.parent._cache_lookup('video', self.id, revalidate=self._get_info_api) or {}
+
+        if not self.as_dict:
             url = self._get_url()
             page = self.parent._page
             if page.url != url:
@@ -126,11 +143,28 @@ class Video(Base):
                     f"Content is not available with status message: {video_detail['statusMsg']}")
             video_data = video_detail['itemInfo']['itemStruct']
             self.as_dict = video_data
+            await self.parent._cache_store('video', [self.id], video_data)
         else:
             video_data = self.as_dict
 
         return video_data
 
+    async def _get_info_api(self, stale_video=None):
+        template = self.parent._request_templates.get('api/item/detail')
+        if template is None:
+            raise exceptions.ApiFailedException("Failed to get video info from API without a request template")
+
+        r = await self._api_get('api/item/detail', template.url_for({'itemId': self.id}), headers=template.headers)
+        if r.status_code != 200 or not r.content:
+            raise exceptions.ApiFailedException(f"Failed to get video info from API with status code {r.status_code}")
+
+        res = r.json()
+        if res.get('type') == 'verify':
+            raise exceptions.ApiFailedException("TikTok API is asking for verification")
+        if res.get('statusCode', 0) != 0:
+            raise exceptions.NotAvailableException(f"Content is not available with status code {res['statusCode']}")
+        return res['itemInfo']['itemStruct']
+
     async def network_info(self, **kwargs) -> dict:
         """
         Returns a dictionary of all network data associated with a TikTok Video.
@@ -181,11 +215,12 @@ class Video(Base):
             raise ValueError("Video ID is required to construct a URL")
             
         if self.username is not None:
-            return f"https://www.tiktok.com/@{self.username}/video/{self.id}"
+            return self._url(f"@{self.username}/video/{self.id}")
         else:
             # will autoresolve to correct username
-            return f"https://www.tiktok.com/@user/video/{self.id}"
+            return self._url(f"@user/video/{self.id}")
 
+    @traced('video.view', video_id='id')
     async def view(self, **kwargs) -> None:
         """
         Opens the TikTok Video in your default browser.
@@ -198,14 +233,20 @@ class Video(Base):
         page = self.parent._page
         url = self._get_url()
         try:
-            async with page.expect_request(url) as event:
-                await page.goto(url)
-                request = await event.value
-                response = await request.response()
-                if response.status >= 300:
-                    raise exceptions.NotAvailableException("Content is not available")
-            # TODO check with something else, sometimes no comments so this breaks
-            await page.wait_for_load_state('networkidle', timeout=60 * 1000)
+            async with self._navigation(url, 'video'):
+                async with page.expect_request(url) as event:
+                    await page.goto(url)
+                    request = await event.value
+                    response = await request.response()
+                    if response.status >= 300:
+                        raise exceptions.NotAvailableException("Content is not available")
+            try:
+                await self.wait_for_response('api/comment/list', query={'aweme_id': self.id},
+                                             timeout=API_RESPONSE_DELAY, include_existing=True,
+                                             unavailable_text='Video currently unavailable')
+            except exceptions.TimeoutException:
+                # videos with no or disabled comments never request the comment list
+                pass
             # no need to check for captcha, because video data is in the html regardless
             await self.check_for_unavailable('Video currently unavailable')
         except PlaywrightTimeoutError as e:
@@ -233,10 +274,84 @@ class Video(Base):
             if num_yielded >= count:
                 break
 
-    async def bytes(self, **kwargs) -> bytes:
+    def variants(self, policy=DEFAULT, target_bytes=None, codec=None) -> list[VideoVariant]:
+        """
+        Returns the renditions of the video, in the order that bytes() with the same arguments tries them.
+
+        - Parameters:
+            - policy (str): How to rank the renditions, one of pytok.variants.POLICIES.
+            - target_bytes (int): The size to stay under, for the target_bytes policy.
+            - codec (str): Only consider renditions whose codec starts with this, i.e. 'h264'.
+        """
+        if not self.as_dict.get('video'):
+            raise exceptions.NotAvailableException("Video info has to be fetched before its renditions are known")
+        return rank_variants(parse_variants(self.as_dict['video']), policy, target_bytes=target_bytes, codec=codec)
+
+    async def select_variant(self, policy=DEFAULT, target_bytes=None, codec=None) -> VideoVariant:
+        """
+        Returns the rendition that bytes() with the same arguments downloads first, with its size, so
+        that it can be reported or checked before downloading.
+        """
+        variant = self.variants(policy=policy, target_bytes=target_bytes, codec=codec)[0]
+        if variant.size is None:
+            variant.size = await self.variant_size(variant)
+        return variant
+
+    async def variant_size(self, variant) -> Optional[int]:
+        """Returns the size in bytes of a rendition, asking its CDN with a one byte range request if TikTok doesn't say."""
+        if variant.size is not None:
+            return variant.size
+        cookies = await self._get_cookies()
+        for url in variant.urls:
+            try:
+                size = await asyncio.to_thread(self._probe_size, url, cookies)
+            except Exception:
+                continue
+            if size is not None:
+                return size
+        return None
+
+    def _probe_size(self, url, cookies):
+        # runs in a worker thread
+        headers = {**self._bytes_headers(), 'range': 'bytes=0-0'}
+        with self.parent._http_get(url, headers=headers, cookies=cookies, timeout=CDN_TIMEOUT, stream=True) as r:
+            if r.status_code == 206 and '/' in r.headers.get('content-range', ''):
+                total = r.headers['content-range'].rsplit('/', 1)[1]
+                if total.isdigit():
+                    return int(total)
+            elif r.status_code == 200 and r.headers.get('content-length', '').isdigit():
+                # the CDN ignored the range, and would send everything
+                return int(r.headers['content-length'])
+        return None
+
+    def _download(self, url, cookies):
+        """Downloads a rendition in a worker thread, streaming it so that a stalled CDN times out. Returns (status, body)."""
+        deadline = time.monotonic() + DOWNLOAD_DEADLINE
+        with self.parent._http_get(url, headers=self._bytes_headers(), cookies=cookies, timeout=CDN_TIMEOUT,
+                                   stream=True) as r:
+            if r.status_code >= 400:
+                return r.status_code, b''
+            chunks = []
+            for chunk in r.iter_content(DOWNLOAD_CHUNK_SIZE):
+                chunks.append(chunk)
+                if time.monotonic() > deadline:
+                    raise exceptions.TimeoutException(f"Download took longer than {DOWNLOAD_DEADLINE} seconds")
+            return r.status_code, b''.join(chunks)
+
+    @traced('video.bytes', video_id='id')
+    async def bytes(self, policy=DEFAULT, target_bytes=None, codec=None, **kwargs) -> bytes:
         """
         Returns the bytes of a TikTok Video.
 
+        The renditions are tried in the order of the policy, and the CDN URLs of each in turn,
+        until one of them can be downloaded.
+
+        - Parameters:
+            - policy (str): How to pick the rendition, one of pytok.variants.POLICIES.
+                The default is TikTok's own choice, which is what the browser plays.
+            - target_bytes (int): The size to stay under, for the target_bytes policy.
+            - codec (str): Only download renditions whose codec starts with this, i.e. 'h264'.
+
         Example Usage
         ```py
         video_bytes = api.video(id='7041997751718137094').bytes()
@@ -246,37 +361,62 @@ class Video(Base):
             output.write(video_bytes)
         ```
         """
-        bytes_url = self.as_dict['video']['playAddr']
-        bytes_headers = {}
-        play_path = url_parsers.urlparse(bytes_url).path
-        reqs = self.get_requests(play_path)
-        if len(reqs) > 0:
-            for req in reqs:
+        tried_urls = set()
+        cookies = None
+        ranked = self.variants(policy=policy, target_bytes=target_bytes, codec=codec)
+        for index, variant in enumerate(ranked):
+            for url in variant.urls:
+                if url in tried_urls:
+                    continue
+                tried_urls.add(url)
+
+                # the browser may have loaded it already, while playing the video
+                for req in self.get_requests(url_parsers.urlparse(url).path):
+                    try:
+                        res = await req.response()
+                        body = await res.body()
+                    except Exception:
+                        continue
+                    if res.ok and body:
+                        metrics.VIDEO_DOWNLOADS.labels(policy=policy, outcome='first' if index == 0 else 'fallback').inc()
+                        return body
+
+                # send the request ourselves
+                if cookies is None:
+                    cookies = await self._get_cookies()
+                self.parent.logger.info(
+                    f"Downloading video {self.id} rendition {variant.name} "
+                    f"({variant.estimated_size if variant.estimated_size is not None else 'unknown'} bytes)")
                 try:
-                    res = await req.response()
-                    body = await res.body()
-                except Exception:
-                    bytes_url = req.url
-                    bytes_headers = req.headers
+                    # off the event loop, as a stalled CDN would otherwise freeze every other crawl
+                    status, body = await asyncio.to_thread(self._download, url, cookies)
+                except Exception as ex:
+                    self.parent.logger.debug(f"Failed to download video {self.id} from {url}: {ex}")
+                    continue
+                if status >= 400 or not body:
+                    self.parent.logger.debug(f"Failed to download video {self.id} from {url}: status {status}")
                     continue
+                metrics.BYTES_DOWNLOADED.labels(kind='video').inc(len(body))
+                metrics.VIDEO_DOWNLOADS.labels(policy=policy, outcome='first' if index == 0 else 'fallback').inc()
                 return body
 
-        # send the request ourselves
-        bytes_headers = {
+        metrics.VIDEO_DOWNLOADS.labels(policy=policy, outcome='failed').inc()
+        raise exceptions.EmptyResponseException(f"Failed to get video bytes from any of {len(ranked)} renditions")
+
+    async def _get_cookies(self):
+        cookies = await self.parent._context.cookies()
+        return {cookie['name']: cookie['value'] for cookie in cookies}
+
+    def _bytes_headers(self):
+        return {
             'sec-ch-ua': '"HeadlessChrome";v="123", "Not:A-Brand";v="8", "Chromium";v="123"', 
-            'referer': 'https://www.tiktok.com/', 
+            'referer': self._url(''), 
             'accept-encoding': 'identity;q=1, *;q=0', 
             'sec-ch-ua-mobile': '?0', 
             'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.6312.4 Safari/537.36', 
             'range': 'bytes=0-', 
             'sec-ch-ua-platform': '"Windows"'
         }
-        cookies = await self.parent._context.cookies()
-        cookies = {cookie['name']: cookie['value'] for cookie in cookies}
-        r = requests.get(bytes_url, headers=bytes_headers, cookies=cookies)
-        if r.content is not None or len(r.content) > 0:
-            return r.content
-        raise Exception("Failed to get video bytes")
 
     async def _get_comments_and_req(self, count):
         # get request
@@ -292,8 +432,6 @@ class Video(Base):
             try:
                 res = await data_response.json()
 
-                self.parent.request_cache['comments'] = data_response.request
-
                 processed_urls.append(data_response.url)
 
                 comments = res.get("comments", [])
@@ -316,15 +454,21 @@ class Video(Base):
         return all_comments, processed_urls, False
 
     async def _get_comment_replies(self, comment, batch_size):
-        if 'comments' not in self.parent.request_cache:
+        template = self.parent._request_templates.get('api/comment/list')
+        if template is None:
+            return
+        if self._comment_state is not None and self._comment_state.classify(comment) == KNOWN:
+            # no replies since the last crawl, which yielded the thread in full
+            metrics.COMMENT_REPLY_THREADS.labels(result='skipped').inc()
             return
-        data_request = self.parent.request_cache['comments']
         num_already_fetched = len(
             comment.get('reply_comment', []) if comment.get('reply_comment', []) is not None else [])
         num_comments_to_fetch = comment['reply_comment_total'] - num_already_fetched
+        if num_comments_to_fetch > 0:
+            metrics.COMMENT_REPLY_THREADS.labels(result='expanded').inc()
         while num_comments_to_fetch > 0:
 
-            url_parsed = url_parsers.urlparse(data_request.url)
+            url_parsed = url_parsers.urlparse(template.url)
             params = url_parsers.parse_qs(url_parsed.query)
             params['cursor'] = num_already_fetched
             del params['aweme_id']
@@ -334,9 +478,8 @@ class Video(Base):
             params['focus_state'] = 'true'
             url_path = url_parsed.path.replace("api/comment/list", "api/comment/list/reply")
             next_url = f"{url_parsed.scheme}://{url_parsed.netloc}{url_path}?{url_parsers.urlencode(params, doseq=True)}"
-            cookies = await self.parent._context.cookies()
-            cookies = {cookie['name']: cookie['value'] for cookie in cookies}
-            r = requests.get(next_url, headers=data_request.headers, cookies=cookies)
+            r = await self._api_get('api/comment/list/reply', next_url, headers=template.headers,
+                                    cursor=num_already_fetched)
             res = r.json()
 
             reply_comments = res.get("comments", [])
@@ -357,38 +500,92 @@ class Video(Base):
             num_already_fetched = len(comment['reply_comment'])
             num_comments_to_fetch = comment['reply_comment_total'] - num_already_fetched
 
-    async def comments(self, count=200, batch_size=100):
-        if self.id and self.username:
+    @traced('video.comments', video_id='id')
+    async def comments(self, count=200, batch_size=100, prefetch=0, incremental=False, stop_after_known=20):
+        """
+        Yields the comments of the video, with their replies.
+
+        - Parameters:
+            - count (int): The maximum number of comments to yield.
+            - batch_size (int): The number of replies to fetch per request.
+            - prefetch (int): The number of comment pages to fetch ahead of the consumer.
+            - incremental (bool): Only yield comments that are new since the last incremental crawl of this
+                video, or whose reply total has changed, and only expand the reply threads of those. The
+                state of the crawl is kept in the PyTok instance's comment state store.
+            - stop_after_known (int): In incremental mode, stop paging after this many known comments in a row.
+        """
+        state = None
+        if incremental:
+            state = await asyncio.to_thread(self.parent._comment_states.get, self.id)
+            self._comment_state = state
+        comments = self._get_comments(count, batch_size, prefetch, incremental)
+        try:
+            known_in_a_row = 0
+            async for comment in comments:
+                if state is not None:
+                    if state.classify(comment) == KNOWN:
+                        known_in_a_row += 1
+                        if known_in_a_row >= stop_after_known:
+                            # the rest was seen by the last crawl
+                            return
+                        continue
+                    known_in_a_row = 0
+                    state.record(comment)
+                metrics.ITEMS_YIELDED.labels(kind='comment').inc()
+                yield comment
+        finally:
+            await comments.aclose()
+            self._comment_state = None
+            if state is not None:
+                # saved however the crawl ended, as everything recorded has been yielded
+                await asyncio.to_thread(self.parent._comment_states.set, state)
+
+    async def _get_comments(self, count, batch_size, prefetch, incremental):
+        # so that we don't re-yield any comments previously yielded, including by a failed strategy
+        comment_ids = set()
+        processed_urls = []
+        if self.id and self.username and not self.parent._request_templates.get('api/comment/list'):
             await self.view()
             await self.wait_for_content_or_unavailable_or_captcha('css=[data-e2e=comment-level-1]',
                                                                   'Be the first to comment!')
             # TODO allow multi layer comment fetch
 
-            amount_yielded = 0
             all_comments, processed_urls, finished = await self._get_comments_and_req(count)
 
             for comment in all_comments:
                 await self._get_comment_replies(comment, batch_size)
 
-            amount_yielded += len(all_comments)
             for comment in all_comments:
+                comment_ids.add(comment['cid'])
                 yield comment
 
             if finished:
                 return
 
-            # so that we don't re-yield any comments previously yielded
-            comment_ids = set(comment['cid'] for comment in all_comments)
-            try:
-                async for comment in self._get_api_comments(count, batch_size, comment_ids):
-                    yield comment
-            except exceptions.ApiFailedException as e:
-                async for comment in self._get_scroll_comments(count, amount_yielded, processed_urls):
-                    yield comment
-        else:
-            # if we only have the video id, we need to entirely rely on the api
-            async for comment in self._get_api_comments(count, batch_size, set()):
-                yield comment
+        # the request shape is known by now, or we only have the video id, so rely on the api where we can
+        strategies = {}
+        template = self.parent._request_templates.get('api/comment/list')
+        if template is not None:
+            strategies['browser'] = lambda: self._get_api_comments_browser(count, batch_size, template, prefetch)
+            if not incremental:
+                # fetching everything at once defeats stopping at known comments
+                strategies['requests_all'] = lambda: self._get_all_comments_via_requests(count, batch_size, template)
+            strategies['requests'] = lambda: self._get_api_comments_via_requests(
+                count, batch_size, len(comment_ids), template, prefetch)
+        if self.username:
+            strategies['scroll'] = lambda: self._get_scroll_comments(count, len(comment_ids), processed_urls)
+        if not strategies:
+            raise exceptions.ApiFailedException("Failed to get comments from API without a request template")
+
+        # only transport and verification failures move on to the next strategy, so that a dead video
+        # doesn't count against the strategies' breakers
+        async for comment in self.parent._strategies.run('api/comment/list', strategies):
+            if comment['cid'] in comment_ids:
+                continue
+            comment_ids.add(comment['cid'])
+            yield comment
+            if len(comment_ids) >= count:
+                return
 
     async def _get_scroll_comments(self, count, amount_yielded, processed_urls):
         page = self.parent._page
@@ -399,7 +596,7 @@ class Video(Base):
         data_request_path = "api/comment/list"
         while amount_yielded < count:
             # scroll down to induce request
-            await self.scroll_to(10000)
+            await self.scroll_to(10000, stop_on_path=data_request_path)
             await self.slight_scroll_up()
             await self.check_and_wait_for_captcha()
             await self.check_and_close_signin()
@@ -441,18 +638,18 @@ class Video(Base):
                 except Exception as e:
                     processed_urls.append(data_response.url)
 
-    async def _get_comments_via_requests(self, count, cursor, data_request):
+    async def _get_comments_via_requests(self, count, cursor, template):
         ms_tokens = await self.parent.get_ms_tokens()
-        next_url = edit_url(data_request.url, {'count': count, 'cursor': cursor, 'aweme_id': self.id})
-        cookies = await self.parent._context.cookies()
-        cookies = {cookie['name']: cookie['value'] for cookie in cookies}
-        headers = await data_request.all_headers()
-        headers = {k: v for k, v in headers.items() if not k.startswith(':')}
+        next_url = template.url_for({'count': count, 'cursor': cursor, 'aweme_id': self.id})
+        headers = dict(template.headers)
         headers['referer'] = None
-        r = requests.get(next_url, headers=headers, cookies=cookies)
+        try:
+            r = await self._api_get('api/comment/list', next_url, headers=headers, cursor=cursor)
+        except requests.RequestException as ex:
+            raise exceptions.ApiFailedException(f"Failed to get comments: {ex}") from ex
 
         if r.status_code != 200:
-            raise Exception(f"Failed to get comments with status code {r.status_code}")
+            raise exceptions.ApiFailedException(f"Failed to get comments with status code {r.status_code}")
 
         if len(r.content) == 0:
             print("Failed to comments from API, switching to scroll")
@@ -461,103 +658,114 @@ class Video(Base):
         try:
             res = r.json()
         except Exception:
-            res = json.loads(brotli.decompress(r.content).decode())
+            try:
+                res = json.loads(brotli.decompress(r.content).decode())
+            except Exception as ex:
+                raise exceptions.ApiFailedException("Failed to decode comments response") from ex
 
+        if res.get('type') == 'verify':
+            raise exceptions.ApiFailedException("TikTok API is asking for verification")
         return res
 
-    async def _get_api_comments(self, count, batch_size, comment_ids):
-
-        data_request = self.parent.request_cache['comments']
-
-        try:
-            amount_yielded = 0
-            cursor = 0
-            while amount_yielded < count:
-                # try directly requesting through browser
-                url = edit_url(data_request.url,
-                               {'count': 20, 'cursor': cursor, 'aweme_id': self.id})  # , 'msToken': ms_tokens[-1]})
-                page = self.parent._page
-                async with page.expect_request(url) as event:
-                    await page.goto(url)
-                    request = await event.value
-                    response = await request.response()
-                    if response.status >= 300:
-                        raise exceptions.NotAvailableException("Content is not available")
+    @traced('video.comments_api', video_id='id')
+    async def _get_api_comments_browser(self, count, batch_size, template, prefetch=0):
+        async for comments in self._read_ahead(self._get_comment_pages_browser(count, template), prefetch):
+            for comment in comments:
+                try:
+                    await self._get_comment_replies(comment, batch_size)
+                except Exception:
+                    pass
+                yield comment
 
-                if response.status != 200:
-                    raise Exception(f"Failed to get comments with status code {response.status}")
+    @traced('video.comments_requests_all', video_id='id')
+    async def _get_all_comments_via_requests(self, count, batch_size, template):
+        # try getting all at once
+        res = await self._get_comments_via_requests(count, '0', template)
+        comments = res.get("comments")
+        if not comments:
+            raise exceptions.ApiFailedException("Failed to get all comments at once")
 
-                content = await response.body()
-                if len(content) == 0:
-                    raise Exception("No content in response")
+        for comment in comments:
+            try:
+                await self._get_comment_replies(comment, batch_size)
+            except Exception:
+                pass
+            yield comment
 
-                res = await response.json()
-                cursor = res.get("cursor", 0)
+    @traced('video.comments_requests', video_id='id')
+    async def _get_api_comments_via_requests(self, count, batch_size, amount_fetched, template, prefetch=0):
+        pages = self._get_comment_pages_via_requests(count, amount_fetched, template)
+        async for comments in self._read_ahead(pages, prefetch):
+            for comment in comments:
+                await self._get_comment_replies(comment, batch_size)
 
-                comments = res.get("comments", [])
-                amount_yielded += len(comments)
-                for comment in comments:
-                    if comment['cid'] not in comment_ids:
-                        try:
-                            await self._get_comment_replies(comment, batch_size)
-                        except Exception:
-                            pass
-                        yield comment
-        except Exception as e:
-            try:
-                # try getting all at once
-                retries = 5
-                for _ in range(retries):
-                    try:
-                        cursor = '0'
-                        res = await self._get_comments_via_requests(count, cursor, data_request)
-
-                        comments = res.get("comments", [])
-                        for comment in comments:
-                            if comment['cid'] not in comment_ids:
-                                try:
-                                    await self._get_comment_replies(comment, batch_size)
-                                except Exception:
-                                    pass
-                                yield comment
+            for comment in comments:
+                yield comment
 
-                        return
-                    except Exception as e:
-                        pass
-                else:
-                    print("Failed to get all comments at once")
-                    print("Trying batched...")
-                    raise Exception("Failed to get comments")
-            except Exception as e:
+    async def _get_comment_pages_browser(self, count, template):
+        amount_fetched = 0
+        cursor = 0
+        while amount_fetched < count:
+            # try directly requesting through browser
+            url = template.url_for({'count': 20, 'cursor': cursor, 'aweme_id': self.id})  # , 'msToken': ms_tokens[-1]})
+            page = self.parent._page
+            await self.parent.request_delay()
+            with self._span('api_page', endpoint='api/comment/list', cursor=cursor):
+                try:
+                    async with page.expect_request(url) as event:
+                        await page.goto(url)
+                        request = await event.value
+                        response = await request.response()
+                except PlaywrightError as ex:
+                    raise exceptions.ApiFailedException(f"Failed to get comments in the browser: {ex}") from ex
+            metrics.API_PAGES_FETCHED.labels(endpoint='api/comment/list').inc()
 
-                amount_yielded = len(comment_ids)
-                cursor = 0
-                while amount_yielded < count:
-                    res = await self._get_comments_via_requests(20, cursor, data_request)
+            if response.status != 200:
+                raise exceptions.ApiFailedException(f"Failed to get comments with status code {response.status}")
 
-                    if res.get('type') == 'verify':
-                        # force new request for cache
-                        self._get_comments_and_req()
+            content = await response.body()
+            if len(content) == 0:
+                raise exceptions.ApiFailedException("No content in response")
 
-                    cursor = res.get("cursor", 0)
-                    comments = res.get("comments", [])
+            try:
+                res = json.loads(content)
+            except ValueError as ex:
+                raise exceptions.ApiFailedException("Failed to decode comments response") from ex
+            if res.get('type') == 'verify':
+                raise exceptions.ApiFailedException("TikTok API is asking for verification")
+            cursor = res.get("cursor", 0)
+
+            # videos without comments have null comments
+            comments = res.get("comments") or []
+            amount_fetched += len(comments)
+            if comments:
+                yield comments
+
+            if not comments or res.get("has_more") != 1:
+                self.parent.logger.info(
+                    "TikTok isn't sending more TikToks beyond this point."
+                )
+                return
 
-                    if comments:
-                        for comment in comments:
-                            await self._get_comment_replies(comment, batch_size)
+    async def _get_comment_pages_via_requests(self, count, amount_fetched, template):
+        cursor = 0
+        while amount_fetched < count:
+            # a verify response drops the template, and raises so that the next strategy takes over
+            res = await self._get_comments_via_requests(20, cursor, template)
 
-                        amount_yielded += len(comments)
-                        for comment in comments:
-                            yield comment
+            cursor = res.get("cursor", 0)
+            comments = res.get("comments") or []
 
-                    has_more = res.get("has_more")
-                    if has_more != 1:
-                        self.parent.logger.info(
-                            "TikTok isn't sending more TikToks beyond this point."
-                        )
-                        return
+            if comments:
+                amount_fetched += len(comments)
+                yield comments
 
-                    await self.parent.request_delay()
+            has_more = res.get("has_more")
+            if has_more != 1:
+                self.parent.logger.info(
+                    "TikTok isn't sending more TikToks beyond this point."
+                )
+                return
 
     def __extract_from_data(self) -> None:
         data = self.as_dict
@@ -0,0 +1,136 @@
+"""
+An opt-in cache of entity data, so that repeat lookups of the same user or video cost no network.
+
+Entries are kept in an in-memory LRU tier, and optionally in a SQLite file that outlives the
+process. Values are kept serialized, so every lookup returns a copy that callers are free to change.
+Both tiers block, so PyTok uses the cache from a worker thread. Each entity kind has its own TTL. Once an entry's TTL has passed it is stale but still
+served for a while longer, while PyTok refreshes it in the background where it can do so without
+the browser page, i.e. through a captured API request template. After that, it is dropped.
+
+Example Usage
+```py
+cache = EntityCache('entities.sqlite3')
+async with PyTok(entity_cache=cache) as api:
+    # only the first lookup of a user in six hours loads their profile
+    user_data = await api.user(username='therock').info()
+```
+"""
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, NamedTuple, Optional
+
+# seconds that entries of each kind are fresh for
+DEFAULT_TTLS = {
+    'user': 6 * 60 * 60,
+    'user_videos': 6 * 60 * 60,
+    'video': 60 * 60,
+}
+
+
+class CacheEntry(NamedTuple):
+    value: Any
+    stored_at: float
+    fresh: bool
+
+
+class EntityCache:
+    """Entity data by kind and key, in memory and optionally in a SQLite file."""
+
+    def __init__(self, path: Optional[str] = None, maxsize: int = 10_000, ttls: Optional[Dict[str, float]] = None,
+                 stale_for: Optional[float] = None):
+        """
+        ##### Parameters
+        * path: Path of a SQLite file to keep entries in between runs, optional
+            Entries are only kept in memory if not given.
+
+        * maxsize: The number of entries to keep in memory
+
+        * ttls: Seconds that entries of each kind are fresh for, overriding DEFAULT_TTLS, optional
+
+        * stale_for: Seconds after its TTL during which a stale entry is still served, optional
+            Defaults to the entry's TTL again.
+        """
+        self.maxsize = maxsize
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.stale_for = stale_for
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._db = None
+        if path is not None:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            # a crash can lose the last commits, which are only a cache, but commits don't wait on fsync
+            self._db.execute('PRAGMA synchronous=NORMAL')
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS entities '
+                '(kind TEXT NOT NULL, key TEXT NOT NULL, stored_at REAL NOT NULL, value BLOB NOT NULL, '
+                'PRIMARY KEY (kind, key))'
+            )
+            self._db.commit()
+
+    def _ages(self, kind):
+        ttl = self.ttls.get(kind, 60 * 60)
+        return ttl, ttl + (ttl if self.stale_for is None else self.stale_for)
+
+    def get(self, kind: str, key: str, now: Optional[float] = None) -> Optional[CacheEntry]:
+        """Returns the entry for a key, or None if there is none that can still be served."""
+        now = now or time.time()
+        ttl, max_age = self._ages(kind)
+        with self._lock:
+            item = self._memory.get((kind, key))
+            if item is not None:
+                self._memory.move_to_end((kind, key))
+            elif self._db is not None:
+                row = self._db.execute(
+                    'SELECT stored_at, value FROM entities WHERE kind = ? AND key = ?', (kind, key)).fetchone()
+                if row is not None:
+                    item = (row[0], zlib.decompress(row[1]).decode())
+                    self._remember(kind, key, item)
+            if item is None:
+                return None
+            stored_at, serialized = item
+            if now - stored_at > max_age:
+                self._forget(kind, key)
+                return None
+        return CacheEntry(json.loads(serialized), stored_at, now - stored_at <= ttl)
+
+    def set(self, kind: str, keys: Iterable[str], value, now: Optional[float] = None):
+        """Stores a value under each of its keys, i.e. a user's username and secUid."""
+        # serialized now, so that changes the caller makes to value afterwards aren't cached
+        item = (now or time.time(), json.dumps(value))
+        keys = [key for key in keys if key]
+        blob = zlib.compress(item[1].encode()) if self._db is not None else None
+        with self._lock:
+            for key in keys:
+                self._remember(kind, key, item)
+            if self._db is not None:
+                self._db.executemany(
+                    'INSERT OR REPLACE INTO entities (kind, key, stored_at, value) VALUES (?, ?, ?, ?)',
+                    [(kind, key, item[0], blob) for key in keys])
+                self._db.commit()
+
+    def invalidate(self, kind: str, key: str):
+        with self._lock:
+            self._forget(kind, key)
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _remember(self, kind, key, item):
+        self._memory[(kind, key)] = item
+        self._memory.move_to_end((kind, key))
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+    def _forget(self, kind, key):
+        self._memory.pop((kind, key), None)
+        if self._db is not None:
+            self._db.execute('DELETE FROM entities WHERE kind = ? AND key = ?', (kind, key))
+            self._db.commit()
@@ -1,5 +1,6 @@
 import asyncio
 import random
+from typing import NamedTuple
 from urllib.parse import urlparse
 
 import cv2
@@ -7,14 +8,21 @@ import base64
 import numpy as np
 import requests
 
+from .exceptions import CaptchaException
+
+# slide matches less confident than this are refreshed rather than dragged to, a few times at most, as the
+# threshold comes from generated captchas (tests/test_puzzle_solver.py) rather than recorded ones
+MIN_SLIDE_CONFIDENCE = 0.2
+
 
 class CaptchaSolver:
     def __init__(self, response, puzzle, piece):
         self._request = response.request
         self._response = response
         self._client = requests.Session()
-        self._puzzle = base64.b64encode(puzzle)
-        self._piece = base64.b64encode(piece)
+        # raw encoded image bytes, decoded straight from their buffers
+        self._puzzle = puzzle
+        self._piece = piece
 
     def _host(self):
         return urlparse(self._request.url).netloc
@@ -28,10 +36,11 @@ class CaptchaSolver:
     async def _get_challenge(self) -> dict:
         return await self._response.json()
 
-    async def _solve_captcha(self) -> dict:
+    async def _solve_captcha(self, challenge) -> dict:
+        confidence = None
         if self._mode == "slide":
-            solver = PuzzleSolver(self._puzzle, self._piece)
-            maxloc = solver.get_position()
+            match = PuzzleSolver(self._puzzle, self._piece, tip_y=challenge["question"].get("tip_y")).match()
+            maxloc, confidence = match.x, match.confidence
         elif self._mode == "whirl":
             maxloc = whirl_solver(self._puzzle, self._piece)
         randlength = round(
@@ -40,7 +49,8 @@ class CaptchaSolver:
         await asyncio.sleep(1)  # don't remove delay or it will fail
         return {
             "maxloc": maxloc,
-            "randlenght": randlength
+            "randlenght": randlength,
+            "confidence": confidence
         }
 
     def _post_captcha(self, solve: dict) -> dict:
@@ -122,7 +132,7 @@ class CaptchaSolver:
         captcha_id = captcha_challenge["id"]
         self._mode = captcha_challenge["mode"]
 
-        solve = await self._solve_captcha()
+        solve = await self._solve_captcha(captcha_challenge)
 
         solve['id'] = captcha_id
         if captcha_challenge["mode"] == "slide":
@@ -133,39 +143,84 @@ class CaptchaSolver:
         return solve
 
 
-class PuzzleSolver:
-    def __init__(self, base64puzzle, base64piece):
-        self.puzzle = base64puzzle
-        self.piece = base64piece
+class PuzzleMatch(NamedTuple):
+    x: int
+    """Horizontal position of the piece in the background."""
+    y: int
+    """Vertical position of the piece in the background."""
+    confidence: float
+    """Normalised correlation of the match, from -1 to 1."""
 
-    def get_position(self):
-        puzzle = self._background_preprocessing()
-        piece = self._piece_preprocessing()
+
+def _decode_image(image, flags=cv2.IMREAD_COLOR):
+    """Decodes an image from its raw encoded bytes without copying them, or from base64 text as in recorded examples."""
+    if isinstance(image, str):
+        image = base64.b64decode(image)
+    decoded = cv2.imdecode(np.frombuffer(image, dtype=np.uint8), flags)
+    if decoded is None:
+        raise CaptchaException("Failed to decode captcha image")
+    return decoded
+
+
+class PuzzleSolver:
+    """
+    Finds where the piece of a slide captcha fits in its background, by matching the edges of the
+    piece against those of the background.
+
+    Example Usage
+    ```py
+    match = PuzzleSolver(background_bytes, piece_bytes, tip_y=challenge['question']['tip_y']).match()
+    if match.confidence < MIN_SLIDE_CONFIDENCE:
+        # refresh the captcha rather than drag to a poor match
+    ```
+    """
+
+    def __init__(self, puzzle, piece, tip_y=None, band_margin=10):
+        """
+        - Parameters:
+            - puzzle (bytes): The encoded background image, the larger of the two is searched either way.
+            - piece (bytes): The encoded piece image.
+            - tip_y (int): The vertical position of the piece in the background, given by the challenge.
+            - band_margin (int): Pixels above and below the piece's band to search as well.
+        """
+        self.puzzle = _decode_image(puzzle, cv2.IMREAD_GRAYSCALE)
+        self.piece = _decode_image(piece, cv2.IMREAD_GRAYSCALE)
+        if self.piece.size > self.puzzle.size:
+            self.puzzle, self.piece = self.piece, self.puzzle
+        self.tip_y = tip_y
+        self.band_margin = band_margin
+
+    def match(self) -> PuzzleMatch:
+        background, top = self._background_band()
         matched = cv2.matchTemplate(
-            puzzle,
-            piece,
+            self._sobel_operator(background),
+            self._sobel_operator(self.piece),
             cv2.TM_CCOEFF_NORMED
         )
         min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(matched)
-        return max_loc[0]
+        return PuzzleMatch(max_loc[0], top + max_loc[1], float(max_val))
 
-    def _background_preprocessing(self):
-        img = self._img_to_grayscale(self.piece)
-        background = self._sobel_operator(img)
-        return background
-
-    def _piece_preprocessing(self):
-        img = self._img_to_grayscale(self.puzzle)
-        template = self._sobel_operator(img)
-        return template
-
-    def _sobel_operator(self, img):
+    def get_position(self):
+        return self.match().x
+
+    def _background_band(self):
+        """Returns the rows of the background the piece can be in, and the index of the first of them."""
+        height = self.piece.shape[0]
+        if self.tip_y is None:
+            return self.puzzle, 0
+        top = max(0, int(self.tip_y) - self.band_margin)
+        bottom = min(self.puzzle.shape[0], int(self.tip_y) + height + self.band_margin)
+        if bottom - top < height:
+            # tip_y doesn't fit this background, i.e. it is on a different scale
+            return self.puzzle, 0
+        return self.puzzle[top:bottom], top
+
+    def _sobel_operator(self, gray):
         scale = 1
         delta = 0
         ddepth = cv2.CV_16S
 
-        img = cv2.GaussianBlur(img, (3, 3), 0)
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        gray = cv2.GaussianBlur(gray, (3, 3), 0)
         grad_x = cv2.Sobel(
             gray,
             ddepth,
@@ -192,22 +247,10 @@ class PuzzleSolver:
 
         return grad
 
-    def _img_to_grayscale(self, img):
-        return cv2.imdecode(
-            self._string_to_image(img),
-            cv2.IMREAD_COLOR
-        )
-
-    def _string_to_image(self, base64_string):
-        return np.frombuffer(
-            base64.b64decode(base64_string),
-            dtype="uint8"
-        )
-
 
-def _get_images_and_edges(b64_puzzle, b64_piece, resolution=300):
-    puzzle = cv2.imdecode(np.frombuffer(base64.b64decode(b64_puzzle), dtype="uint8"), cv2.IMREAD_COLOR)
-    piece = cv2.imdecode(np.frombuffer(base64.b64decode(b64_piece), dtype="uint8"), cv2.IMREAD_COLOR)
+def _get_images_and_edges(puzzle, piece, resolution=300):
+    puzzle = _decode_image(puzzle)
+    piece = _decode_image(piece)
 
     # get inner edge of puzzle
     r = (piece.shape[0] / 2) + 1
@@ -228,9 +271,9 @@ def _get_images_and_edges(b64_puzzle, b64_piece, resolution=300):
     return puzzle, piece, puzzle_edge, piece_edge
 
 
-def whirl_solver(b64_puzzle, b64_piece):
+def whirl_solver(puzzle, piece):
     resolution = 300
-    _, _, puzzle_edge, piece_edge = _get_images_and_edges(b64_puzzle, b64_piece, resolution=resolution)
+    _, _, puzzle_edge, piece_edge = _get_images_and_edges(puzzle, piece, resolution=resolution)
 
     # find the best match
     best_match = 0
@@ -0,0 +1,135 @@
+"""
+Persisted per-video comment state, so that re-crawling a video's comments costs about as much as
+the activity on it since the last crawl.
+
+For each video the state keeps the reply total of every comment yielded so far, and the newest
+comment seen. An incremental crawl yields only comments that are new, or whose reply total has
+changed since, and re-expands only the reply threads of those. It stops paging once it has run
+into a page's worth of known comments in a row.
+
+Example Usage
+```py
+store = CommentStateStore('comment_state.sqlite3')
+async with PyTok(comment_state_store=store) as api:
+    # the first crawl yields every comment, later ones only what changed
+    async for comment in api.video(id='7041997751718137094').comments(incremental=True):
+        ...
+```
+"""
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, Optional
+
+# how a comment compares to a video's state
+NEW = 'new'
+CHANGED = 'changed'
+KNOWN = 'known'
+
+
+class CommentState:
+    """The comments of a video seen by previous crawls."""
+
+    def __init__(self, video_id: str, reply_totals: Optional[Dict[str, int]] = None,
+                 newest_cid: Optional[str] = None, newest_create_time: Optional[int] = None,
+                 updated_at: Optional[float] = None):
+        self.video_id = video_id
+        self.reply_totals = reply_totals or {}
+        self.newest_cid = newest_cid
+        self.newest_create_time = newest_create_time
+        self.updated_at = updated_at
+
+    def classify(self, comment: dict) -> str:
+        """Returns whether a top level comment is NEW, has CHANGED replies, or is already KNOWN."""
+        known_total = self.reply_totals.get(comment['cid'])
+        if known_total is None:
+            return NEW
+        if comment.get('reply_comment_total', 0) != known_total:
+            return CHANGED
+        return KNOWN
+
+    def record(self, comment: dict):
+        """Marks a comment as seen, with its current reply total."""
+        self.reply_totals[comment['cid']] = comment.get('reply_comment_total', 0)
+        create_time = comment.get('create_time')
+        if create_time is not None and (self.newest_create_time is None or create_time > self.newest_create_time):
+            self.newest_create_time = create_time
+            self.newest_cid = comment['cid']
+
+    def to_dict(self) -> dict:
+        return {
+            'video_id': self.video_id,
+            'reply_totals': self.reply_totals,
+            'newest_cid': self.newest_cid,
+            'newest_create_time': self.newest_create_time,
+            'updated_at': self.updated_at,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'CommentState':
+        return cls(**data)
+
+
+class CommentStateStore:
+    """Comment states by video id, in memory and optionally in a SQLite file. Its methods block, so PyTok calls them from a worker thread."""
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        ##### Parameters
+        * path: Path of a SQLite file to keep states in, optional
+            States are kept in memory instead, for the life of the process, if not given.
+        """
+        self._lock = threading.Lock()
+        self._memory = {}
+        self._db = None
+        if path is not None:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            # commits don't wait on fsync, at the risk of losing the last states in a crash
+            self._db.execute('PRAGMA synchronous=NORMAL')
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS comment_states '
+                '(video_id TEXT PRIMARY KEY, updated_at REAL NOT NULL, state BLOB NOT NULL)'
+            )
+            self._db.commit()
+
+    def get(self, video_id: str) -> CommentState:
+        """Returns the state of a video, which is empty if it hasn't been crawled before."""
+        with self._lock:
+            serialized = self._memory.get(video_id)
+            if self._db is not None:
+                row = self._db.execute(
+                    'SELECT state FROM comment_states WHERE video_id = ?', (video_id,)).fetchone()
+                if row is not None:
+                    serialized = zlib.decompress(row[0]).decode()
+        if serialized is None:
+            return CommentState(video_id)
+        # kept serialized, so that an unfinished crawl doesn't change the stored state
+        return CommentState.from_dict(json.loads(serialized))
+
+    def set(self, state: CommentState, now: Optional[float] = None):
+        state.updated_at = now or time.time()
+        serialized = json.dumps(state.to_dict())
+        with self._lock:
+            if self._db is None:
+                self._memory[state.video_id] = serialized
+            else:
+                self._db.execute(
+                    'INSERT OR REPLACE INTO comment_states (video_id, updated_at, state) VALUES (?, ?, ?)',
+                    (state.video_id, state.updated_at, zlib.compress(serialized.encode())))
+                self._db.commit()
+
+    def delete(self, video_id: str):
+        with self._lock:
+            self._memory.pop(video_id, None)
+            if self._db is not None:
+                self._db.execute('DELETE FROM comment_states WHERE video_id = ?', (video_id,))
+                self._db.commit()
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
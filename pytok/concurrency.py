@@ -0,0 +1,93 @@
+"""
+Helpers for crawling many entities at once: merging concurrent async iterators, deduplicating
+what they yield with bounded memory, and reporting per-entity progress.
+"""
+import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Dict, Hashable, Optional
+
+
+@dataclass
+class CrawlProgress:
+    """Progress of crawling one entity, i.e. one hashtag of PyTok.hashtags_videos."""
+    name: str
+    items: int = 0
+    """Items found, including ones already yielded for another entity."""
+    new_items: int = 0
+    """Items yielded for the first time."""
+    done: bool = False
+    error: Optional[BaseException] = None
+
+
+class BoundedSeenSet:
+    """Remembers up to maxsize keys and a value for each, forgetting the least recently seen first."""
+
+    def __init__(self, maxsize: int = 100_000):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+
+    def get(self, key: Hashable):
+        value = self._items.get(key)
+        if value is not None:
+            self._items.move_to_end(key)
+        return value
+
+    def add(self, key: Hashable, value=True):
+        self._items[key] = value
+        self._items.move_to_end(key)
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._items
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+_FINISHED = object()
+
+
+async def merge(
+        sources: Dict[Hashable, Callable[[], AsyncIterator]],
+        concurrency: int = 4,
+        buffer: int = 100,
+        on_done: Optional[Callable[[Hashable, Optional[BaseException]], None]] = None,
+) -> AsyncIterator:
+    """
+    Iterates up to concurrency sources at once, yielding (key, item) pairs in the order items arrive.
+
+    Each source is a zero-argument function returning an async iterator, so that sources waiting
+    for their turn have not started. A source that raises stops on its own: on_done is called with
+    its key and the error, and the other sources carry on. Sources block once buffer items are
+    waiting to be consumed, and are cancelled if the consumer stops early.
+    """
+    queue = asyncio.Queue(maxsize=buffer)
+    slots = asyncio.Semaphore(concurrency)
+
+    async def run(key, source):
+        async with slots:
+            try:
+                async for item in source():
+                    await queue.put((key, item, None))
+            except Exception as ex:
+                await queue.put((key, _FINISHED, ex))
+                return
+            await queue.put((key, _FINISHED, None))
+
+    tasks = [asyncio.create_task(run(key, source)) for key, source in sources.items()]
+    try:
+        remaining = len(tasks)
+        while remaining:
+            key, item, error = await queue.get()
+            if item is _FINISHED:
+                remaining -= 1
+                if on_done:
+                    on_done(key, error)
+                continue
+            yield key, item
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
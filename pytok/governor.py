@@ -0,0 +1,161 @@
+"""
+Adaptive request rate limiting for PyTok.
+
+Each PyTok instance paces its browser navigations and direct API requests through a RateGovernor.
+The governor's rate grows additively while TikTok responds normally, and is cut multiplicatively
+when TikTok pushes back with a `type: verify` response, an empty body, a 429 or 5xx status, or a
+captcha. Instances that leave through the same egress IP also share an egress governor, so that
+running several browsers from one machine doesn't multiply the rate TikTok sees from that IP.
+
+Example Usage
+```py
+# all instances created with egress='proxy-1' share one rate limit
+async with PyTok(egress='proxy-1') as api:
+    ...
+```
+"""
+import asyncio
+import json
+import threading
+import time
+from typing import Optional
+
+from . import metrics
+
+DEFAULT_EGRESS = 'default'
+
+# throttling reasons
+VERIFY = 'verify'
+EMPTY = 'empty'
+STATUS = 'status'
+CAPTCHA = 'captcha'
+
+
+def is_throttled(status: int, body: Optional[bytes], expect_body: bool = True) -> Optional[str]:
+    """
+    Returns the reason a response shows TikTok pushing back, or None if it is clean.
+    An empty body only counts when a 200 response was expected to carry data.
+    """
+    if status == 429 or status >= 500:
+        return STATUS
+    if not body:
+        return EMPTY if expect_body and status == 200 else None
+    # verify responses are small, so only parse bodies that could be one
+    if len(body) < 4096 and body.lstrip()[:1] == b'{':
+        try:
+            if json.loads(body).get('type') == 'verify':
+                return VERIFY
+        except (ValueError, UnicodeDecodeError, AttributeError):
+            pass
+    return None
+
+
+class TokenBucket:
+    """
+    A token bucket, implemented as the equivalent generic cell rate algorithm: rather than storing
+    tokens, it stores the theoretical arrival time of the next request.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._lock = threading.Lock()
+        self._next_arrival = time.monotonic()
+
+    def reserve(self) -> float:
+        """Takes a token, returning the number of seconds to wait before it may be used."""
+        with self._lock:
+            now = time.monotonic()
+            interval = 1 / self.rate
+            arrival = max(self._next_arrival, now)
+            self._next_arrival = arrival + interval
+            return max(0.0, arrival - now - (self.burst - 1) * interval)
+
+
+class RateGovernor:
+    """An additive-increase, multiplicative-decrease rate limit, optionally nested in a shared parent limit."""
+
+    def __init__(
+            self,
+            name: str,
+            scope: str = 'instance',
+            initial_rate: float = 1.0,
+            min_rate: float = 0.05,
+            max_rate: float = 5.0,
+            increase: float = 0.05,
+            decrease: float = 0.5,
+            burst: int = 1,
+            parent: Optional['RateGovernor'] = None,
+    ):
+        """
+        ##### Parameters
+        * name: The name of this governor in the pytok_governor_rate metric
+        * initial_rate, min_rate, max_rate: Requests per second
+        * increase: Requests per second added after every clean response
+        * decrease: Factor the rate is multiplied by after TikTok pushes back
+        * burst: Number of requests that may be made back to back after an idle period
+        * parent: A governor whose limit also applies, i.e. one shared by all instances on an egress IP
+        """
+        self.name = name
+        self.scope = scope
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.parent = parent
+        self._bucket = TokenBucket(min(max(initial_rate, min_rate), max_rate), burst)
+        self._gauge = metrics.GOVERNOR_RATE.labels(scope=scope, name=name)
+        self._gauge.set(self.rate)
+
+    @property
+    def rate(self) -> float:
+        return self._bucket.rate
+
+    def _set_rate(self, rate):
+        self._bucket.rate = min(max(rate, self.min_rate), self.max_rate)
+        self._gauge.set(self._bucket.rate)
+
+    async def acquire(self):
+        """Waits until a request may be made."""
+        if self.parent is not None:
+            await self.parent.acquire()
+        wait = self._bucket.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def success(self):
+        self._set_rate(self.rate + self.increase)
+        if self.parent is not None:
+            self.parent.success()
+
+    def throttle(self, reason: str):
+        metrics.GOVERNOR_THROTTLES.labels(reason=reason).inc()
+        self._set_rate(self.rate * self.decrease)
+        if self.parent is not None:
+            self.parent.throttle(reason)
+
+    def observe(self, status: int, body: Optional[bytes]):
+        """Feeds back the outcome of an API response."""
+        reason = is_throttled(status, body)
+        if reason is None:
+            self.success()
+        else:
+            self.throttle(reason)
+
+    def close(self):
+        """Stops reporting this governor's rate."""
+        metrics.GOVERNOR_RATE.remove(scope=self.scope, name=self.name)
+
+
+_egress_governors = {}
+_egress_lock = threading.Lock()
+
+
+def egress_governor(egress: str = DEFAULT_EGRESS, **kwargs) -> RateGovernor:
+    """Returns the process-wide governor of an egress IP, creating it with kwargs if needed."""
+    with _egress_lock:
+        governor = _egress_governors.get(egress)
+        if governor is None:
+            governor = RateGovernor(egress, scope='egress', **kwargs)
+            _egress_governors[egress] = governor
+        return governor
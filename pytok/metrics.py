@@ -0,0 +1,336 @@
+"""
+Prometheus-format metrics for PyTok scrapers.
+
+Metrics are collected in a process-wide registry and can be served over a small local HTTP
+endpoint for Prometheus to scrape.
+
+Example Usage
+```py
+from pytok import metrics
+
+metrics.start_http_server(9100)
+async with PyTok() as api:
+    ...
+```
+"""
+import bisect
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Sequence
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if value == -math.inf:
+        return '-Inf'
+    if isinstance(value, float) and value.is_integer():
+        return repr(value)
+    return str(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels: dict):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+
+class _Metric:
+    type_name = None
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children = {}
+        if registry is None:
+            registry = REGISTRY
+        if registry is not False:
+            registry.register(self)
+
+    def labels(self, **labels):
+        """Returns the child metric for a set of label values."""
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Metric {self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            child = self._children.get(key)
+            if child is None:
+                child = self._new_child()
+                self._children[key] = child
+            return child
+
+    def remove(self, **labels):
+        """Stops exporting the child metric for a set of label values."""
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._children.pop(key, None)
+
+    def _default_child(self):
+        if self.labelnames:
+            raise ValueError(f"Metric {self.name} has labels, use .labels() first")
+        return self.labels()
+
+    def _new_child(self):
+        raise NotImplementedError()
+
+    def _samples(self):
+        with self._lock:
+            children = list(self._children.items())
+        for key, child in children:
+            labels = dict(zip(self.labelnames, key))
+            yield from child._samples(self.name, labels)
+
+    def expose(self) -> str:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type_name}']
+        for name, labels, value in self._samples():
+            lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines)
+
+
+class _CounterChild:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount=1):
+        if amount < 0:
+            raise ValueError("Counters can only be incremented by non-negative amounts")
+        with self._lock:
+            self.value += amount
+
+    def _samples(self, name, labels):
+        yield f'{name}_total' if not name.endswith('_total') else name, labels, self.value
+
+
+class Counter(_Metric):
+    """A monotonically increasing count, i.e. pages loaded."""
+
+    type_name = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self._default_child().inc(amount)
+
+
+class _GaugeChild:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def set(self, value):
+        with self._lock:
+            self.value = value
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def _samples(self, name, labels):
+        yield name, labels, self.value
+
+
+class Gauge(_Metric):
+    """A value that can go up and down, i.e. the current request rate."""
+
+    type_name = 'gauge'
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value):
+        self._default_child().set(value)
+
+    def inc(self, amount=1):
+        self._default_child().inc(amount)
+
+    def dec(self, amount=1):
+        self._default_child().dec(amount)
+
+
+class _Timer:
+    def __init__(self, child):
+        self._child = child
+        self._start = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._child.observe(time.perf_counter() - self._start)
+        return False
+
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self._lock = threading.Lock()
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        with self._lock:
+            self.sum += value
+            self.count += 1
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                self.counts[index] += 1
+
+    def time(self):
+        """Returns a context manager that observes the time spent inside it."""
+        return _Timer(self)
+
+    def _samples(self, name, labels):
+        with self._lock:
+            counts = list(self.counts)
+            total, count = self.sum, self.count
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            yield f'{name}_bucket', {**labels, 'le': _format_value(float(bound))}, cumulative
+        yield f'{name}_bucket', {**labels, 'le': '+Inf'}, count
+        yield f'{name}_sum', labels, total
+        yield f'{name}_count', labels, count
+
+
+class Histogram(_Metric):
+    """Observations sorted into buckets, i.e. flush latencies."""
+
+    type_name = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(float(bound) for bound in buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self._default_child().observe(value)
+
+    def time(self):
+        return self._default_child().time()
+
+
+class Registry:
+    """A collection of metrics that can be rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def register(self, metric: _Metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def expose(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return '\n'.join(metric.expose() for metric in metrics) + '\n'
+
+
+REGISTRY = Registry()
+
+
+def start_http_server(port: int, addr: str = '127.0.0.1', registry: Registry = REGISTRY) -> ThreadingHTTPServer:
+    """
+    Serves the registry at http://addr:port/metrics from a daemon thread.
+    Returns the server, call .shutdown() on it to stop serving.
+    """
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] not in ('/', '/metrics'):
+                self.send_error(404)
+                return
+            body = registry.expose().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((addr, port), MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever, name='pytok-metrics', daemon=True)
+    thread.start()
+    return server
+
+
+PAGES_LOADED = Counter(
+    'pytok_pages_loaded', "Browser page navigations.", ['kind'])
+API_PAGES_FETCHED = Counter(
+    'pytok_api_pages_fetched', "API result pages fetched.", ['endpoint'])
+API_PAGE_SECONDS = Histogram(
+    'pytok_api_page_seconds', "Time taken to fetch an API result page.", ['endpoint'])
+CAPTCHA_ENCOUNTERS = Counter(
+    'pytok_captcha_encounters', "Captchas shown by TikTok.", ['mode'])
+CAPTCHA_SOLVES = Counter(
+    'pytok_captcha_solves', "Captchas solved successfully.", ['mode'])
+CAPTCHA_FAILURES = Counter(
+    'pytok_captcha_failures', "Captcha solves that failed or were rejected.", ['mode'])
+CAPTCHA_UNCONFIRMED = Counter(
+    'pytok_captcha_unconfirmed', "Captcha solves whose verify result couldn't be read.", ['mode'])
+BYTES_DOWNLOADED = Counter(
+    'pytok_bytes_downloaded', "Bytes downloaded outside of page loads.", ['kind'])
+ITEMS_YIELDED = Counter(
+    'pytok_items_yielded', "Entities yielded by PyTok iterators.", ['kind'])
+BROWSER_RESTARTS = Counter(
+    'pytok_browser_restarts', "Browser instances closed and replaced.", ['reason'])
+ACCOUNTS_PROCESSED = Counter(
+    'pytok_accounts_processed', "Accounts processed by the scraper.", ['status'])
+MONGO_FLUSH_SECONDS = Histogram(
+    'pytok_mongo_flush_seconds', "Time taken by MongoDB writes.", ['operation'])
+GOVERNOR_RATE = Gauge(
+    'pytok_governor_rate', "Requests per second currently allowed by a rate governor.", ['scope', 'name'])
+GOVERNOR_THROTTLES = Counter(
+    'pytok_governor_throttles', "Times a rate governor backed off, by what TikTok pushed back with.", ['reason'])
+STRATEGY_RUNS = Counter(
+    'pytok_strategy_runs', "Fetch strategy runs, by whether they got through.", ['endpoint', 'strategy', 'outcome'])
+STRATEGY_SECONDS = Histogram(
+    'pytok_strategy_seconds', "Time taken by a fetch strategy to produce its first item.", ['endpoint', 'strategy'])
+CIRCUIT_BREAKER_OPEN = Gauge(
+    'pytok_circuit_breaker_open', "Whether a fetch strategy's circuit breaker is open.", ['endpoint', 'strategy'])
+CACHE_LOOKUPS = Counter(
+    'pytok_cache_lookups', "Entity cache lookups, by whether the entry was fresh, stale or missing.", ['kind', 'result'])
+CAPTCHA_REFRESHES = Counter(
+    'pytok_captcha_refreshes', "Captchas refreshed instead of solved, as no confident solution was found.", ['mode'])
+COMMENT_REPLY_THREADS = Counter(
+    'pytok_comment_reply_threads', "Comment reply threads, by whether they were expanded or skipped as unchanged.", ['result'])
+VIDEO_DOWNLOADS = Counter(
+    'pytok_video_downloads', "Video downloads, by rendition policy and whether the first rendition tried worked.", ['policy', 'outcome'])
+MONGO_WRITES = Counter(
+    'pytok_mongo_writes', "MongoDB write requests sent by the writer thread, by whether they were written.", ['collection', 'outcome'])
+MONGO_WRITE_SECONDS = Histogram(
+    'pytok_mongo_write_seconds', "Time from queueing a MongoDB write to it being acknowledged.", ['collection'])
+MONGO_PENDING_WRITES = Gauge(
+    'pytok_mongo_pending_writes', "MongoDB writes queued for the writer thread.")
+SINK_ITEMS = Counter(
+    'pytok_sink_items', "Items written to output sinks.", ['sink'])
+SINK_FLUSH_SECONDS = Histogram(
+    'pytok_sink_flush_seconds', "Time taken to write a batch to an output sink.", ['sink'])
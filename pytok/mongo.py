@@ -0,0 +1,221 @@
+"""
+MongoDB persistence that doesn't block the event loop.
+
+pymongo is synchronous, so every call made from a coroutine freezes all the browsers sharing the
+loop until the database answers. The MongoWriter instead hands writes to a dedicated thread
+through a bounded queue. The thread groups consecutive writes to a collection into one ordered
+bulk write, so that a delete followed by an insert of the same document still happen in that
+order. Reads go through asyncio.to_thread on the same pooled client. Each collection can have
+its own write concern, and closing the writer waits for the queued writes to be flushed.
+
+pymongo is only imported when a writer is created, as the library itself doesn't need it.
+
+Example Usage
+```py
+writer = MongoWriter('mongodb://localhost:27017/', 'tiktok_data', write_concerns={'posts': {'w': 1}})
+writer.start()
+await writer.write('posts', [DeleteMany({'postId': post_id}), InsertOne(post)])
+teams = await writer.aggregate('Creator', pipeline)
+await writer.close()
+```
+"""
+import asyncio
+import logging
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# marks the end of the queue, after which the writer thread stops
+_CLOSE = object()
+
+
+class _Write:
+    __slots__ = ('collection', 'requests', 'submitted_at', 'future', 'loop')
+
+    def __init__(self, collection, requests, future=None, loop=None):
+        self.collection = collection
+        self.requests = requests
+        self.submitted_at = time.perf_counter()
+        self.future = future
+        self.loop = loop
+
+
+class MongoWriter:
+    """Writes to MongoDB from a dedicated thread, in ordered bulk writes per collection."""
+
+    def __init__(self, uri: str, db_name: str, write_concerns: Optional[Dict[str, dict]] = None,
+                 max_pool_size: int = 10, batch_size: int = 500, max_pending: int = 10_000, client=None):
+        """
+        ##### Parameters
+        * uri: The MongoDB connection URI
+
+        * db_name: The database to read and write
+
+        * write_concerns: pymongo WriteConcern arguments by collection name, optional
+            i.e. {'posts': {'w': 1}, 'Creator': {'w': 'majority'}}. Collections not
+            given use the client's write concern.
+
+        * max_pool_size: The most connections the client keeps open, shared by the writer and reads
+
+        * batch_size: The most write requests sent in one bulk write
+
+        * max_pending: The most writes queued before callers have to wait, optional
+
+        * client: A pymongo MongoClient to use instead of connecting to uri, optional
+        """
+        if client is None:
+            from pymongo import MongoClient
+            client = MongoClient(uri, maxPoolSize=max_pool_size)
+        self.client = client
+        self.db = client[db_name]
+        self.write_concerns = write_concerns or {}
+        self.batch_size = batch_size
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._collections = {}
+        self._thread = None
+        self._closed = False
+
+    def collection(self, name: str):
+        """Returns a collection with its write concern applied."""
+        if name not in self._collections:
+            write_concern = None
+            if name in self.write_concerns:
+                from pymongo import WriteConcern
+                write_concern = WriteConcern(**self.write_concerns[name])
+            self._collections[name] = self.db.get_collection(name, write_concern=write_concern)
+        return self._collections[name]
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='mongo-writer', daemon=True)
+            self._thread.start()
+        return self
+
+    async def write(self, collection: str, requests: List[Any], wait: bool = False):
+        """
+        Queues pymongo write requests, i.e. InsertOne or DeleteMany, to be sent in order.
+
+        - Parameters:
+            - collection (str): The name of the collection to write to.
+            - requests (list): The pymongo write requests.
+            - wait (bool): Wait until the writes are acknowledged, and return the BulkWriteResult
+                of the batch they were sent in, which is None if a later write in the batch failed.
+                Otherwise errors are only logged.
+        """
+        if self._closed:
+            raise RuntimeError("MongoWriter is closed")
+        future = loop = None
+        if wait:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+        item = _Write(collection, list(requests), future, loop)
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            # back-pressure, without blocking the event loop while the writer catches up
+            await asyncio.to_thread(self._queue.put, item)
+        metrics.MONGO_PENDING_WRITES.set(self._queue.qsize())
+        if future is not None:
+            return await future
+
+    async def aggregate(self, collection: str, pipeline: List[dict]) -> List[dict]:
+        return await asyncio.to_thread(lambda: list(self.collection(collection).aggregate(pipeline)))
+
+    async def find(self, collection: str, filter: Optional[dict] = None, **kwargs) -> List[dict]:
+        return await asyncio.to_thread(lambda: list(self.collection(collection).find(filter, **kwargs)))
+
+    async def close(self, timeout: Optional[float] = None):
+        """Waits for the queued writes to be sent, then closes the client."""
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is not None:
+            await asyncio.to_thread(self._queue.put, _CLOSE)
+            await asyncio.to_thread(self._thread.join, timeout)
+            if self._thread.is_alive():
+                logger.error(f"MongoDB writer didn't drain {self._queue.qsize()} queued writes in {timeout} seconds")
+        self.client.close()
+
+    def _run(self):
+        pending = None
+        while True:
+            item = pending if pending is not None else self._queue.get()
+            pending = None
+            if item is _CLOSE:
+                return
+            batch = [item]
+            requests = len(item.requests)
+            # gather the consecutive writes to the same collection that queued up while the last batch
+            # was being sent, which can go in one ordered bulk write
+            while requests < self.batch_size:
+                try:
+                    next_item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if next_item is _CLOSE or next_item.collection != item.collection:
+                    pending = next_item
+                    break
+                batch.append(next_item)
+                requests += len(next_item.requests)
+            metrics.MONGO_PENDING_WRITES.set(self._queue.qsize())
+            self._flush(item.collection, batch)
+
+    def _flush(self, collection, batch):
+        while batch:
+            requests = [request for item in batch for request in item.requests]
+            try:
+                with metrics.MONGO_FLUSH_SECONDS.labels(operation='bulk_write').time():
+                    result = self.collection(collection).bulk_write(requests, ordered=True)
+            except Exception as ex:
+                logger.error(f"Failed to write {len(requests)} requests to {collection}: {ex}")
+                failed_index = _failed_index(ex)
+                if failed_index is None:
+                    self._done(collection, batch, None, ex)
+                    return
+                # an ordered bulk write stops at the first error, so the writes queued after it are sent again
+                offset = 0
+                for index, item in enumerate(batch):
+                    if offset + len(item.requests) > failed_index:
+                        break
+                    offset += len(item.requests)
+                self._done(collection, batch[:index], None, None)
+                self._done(collection, [batch[index]], None, ex)
+                batch = batch[index + 1:]
+                continue
+            self._done(collection, batch, result, None)
+            return
+
+    def _done(self, collection, batch, result, error):
+        metrics.MONGO_WRITES.labels(collection=collection, outcome='failed' if error is not None else 'written').inc(
+            sum(len(item.requests) for item in batch))
+        now = time.perf_counter()
+        for item in batch:
+            metrics.MONGO_WRITE_SECONDS.labels(collection=collection).observe(now - item.submitted_at)
+            if item.future is not None:
+                try:
+                    item.loop.call_soon_threadsafe(_resolve, item.future, result, error)
+                except RuntimeError:
+                    # the caller's loop has closed, so nobody is waiting any more
+                    pass
+
+
+def _failed_index(error):
+    """Returns the index of the request a pymongo BulkWriteError failed at, or None for other errors."""
+    details = getattr(error, 'details', None)
+    if not isinstance(details, dict) or not details.get('writeErrors'):
+        return None
+    return details['writeErrors'][0]['index']
+
+
+def _resolve(future, result, error):
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
@@ -0,0 +1,330 @@
+"""
+Record-and-replay of PyTok network traffic.
+
+A recording session saves every request/response pair seen by the browser, and every direct API
+request made outside of it, to a HAR-like JSON archive. A replay session serves those responses
+back: browser traffic through `context.route`, and direct requests through a local stand-in HTTP
+server, so full scrape flows run deterministically offline. Media and other large bodies are written
+to a directory next to the archive as they arrive, rather than kept in memory until it is saved.
+
+Example Usage
+```py
+async with PyTok(record_path='fixtures/therock.har.json') as api:
+    async for video in api.user(username='therock').videos(count=100):
+        ...
+
+async with PyTok(replay_path='fixtures/therock.har.json') as api:
+    # the same calls now run without touching TikTok
+    ...
+```
+"""
+import base64
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib import parse as url_parsers
+
+# query parameters that change on every request (signatures, tokens, fingerprints) and so are
+# ignored when matching a replayed request to a recorded one
+VOLATILE_PARAMS = {
+    'msToken', 'X-Bogus', 'X-Gnarly', '_signature', 'verifyFp', 'fp', 'device_id', 'odinId',
+    'history_len', 'screen_height', 'screen_width', 'browser_version', 'WebIdLastTime', 'tz_name',
+}
+
+# response headers that no longer apply once the body has been decoded and stored
+_DROPPED_RESPONSE_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding'}
+
+ORIGINAL_URL_HEADER = 'X-Pytok-Original-Url'
+
+_TEXT_MIME_TYPES = ('text/', 'application/json', 'application/javascript', 'application/xml')
+_MEDIA_MIME_TYPES = ('video/', 'audio/', 'image/')
+
+# bytes, above which a body is written to its own file rather than into the archive
+MAX_INLINE_BODY = 1024 * 1024
+
+
+def _headers_to_list(headers: Optional[dict]) -> list:
+    return [{'name': name, 'value': value} for name, value in (headers or {}).items() if value is not None]
+
+
+def _headers_to_dict(headers: list) -> dict:
+    return {header['name']: header['value'] for header in headers}
+
+
+def _encode_body(body: Optional[bytes], mime_type: str) -> dict:
+    body = body or b''
+    content = {'size': len(body), 'mimeType': mime_type}
+    if mime_type.startswith(_TEXT_MIME_TYPES):
+        try:
+            content['text'] = body.decode('utf-8')
+            return content
+        except UnicodeDecodeError:
+            pass
+    content['text'] = base64.b64encode(body).decode('ascii')
+    content['encoding'] = 'base64'
+    return content
+
+
+def decode_body(content: dict, directory: Optional[str] = None) -> bytes:
+    """Returns the body of a response's content, reading it from directory if it was stored in a file of its own."""
+    if '_file' in content:
+        with open(os.path.join(directory or '', content['_file']), 'rb') as f:
+            return f.read()
+    text = content.get('text', '')
+    if content.get('encoding') == 'base64':
+        return base64.b64decode(text)
+    return text.encode('utf-8')
+
+
+def _split_url(url: str):
+    parsed = url_parsers.urlparse(url)
+    params = url_parsers.parse_qs(parsed.query, keep_blank_values=True)
+    stable = {key: value for key, value in params.items() if key not in VOLATILE_PARAMS}
+    return parsed.netloc, parsed.path, stable
+
+
+def make_entry(method: str, url: str, request_headers: dict, post_data: Optional[str], status: int,
+               response_headers: dict, body: Optional[bytes], source: str) -> dict:
+    mime_type = (response_headers or {}).get('content-type', '').split(';')[0]
+    request = {
+        'method': method,
+        'url': url,
+        'headers': _headers_to_list(request_headers),
+    }
+    if post_data:
+        request['postData'] = {'text': post_data}
+    return {
+        'startedDateTime': datetime.now(timezone.utc).isoformat(),
+        'request': request,
+        'response': {
+            'status': status,
+            'headers': _headers_to_list(response_headers),
+            'content': _encode_body(body, mime_type),
+        },
+        '_source': source,
+    }
+
+
+class NetworkArchive:
+    """A HAR-like list of request/response entries that can be matched against new requests."""
+
+    def __init__(self, entries: Optional[list] = None):
+        self.entries = entries or []
+        self._lock = threading.Lock()
+        self._served = {}
+
+    @classmethod
+    def load(cls, path: str) -> 'NetworkArchive':
+        with open(path, 'r', encoding='utf-8') as f:
+            har = json.load(f)
+        return cls(har['log']['entries'])
+
+    def save(self, path: str):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            har = {'log': {'version': '1.2', 'creator': {'name': 'pytok', 'version': '0.0.1'}, 'entries': self.entries}}
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(har, f)
+
+    def add(self, entry: dict):
+        with self._lock:
+            self.entries.append(entry)
+
+    def match(self, method: str, url: str) -> Optional[dict]:
+        """
+        Finds the recorded entry that best matches a request.
+
+        Entries must share the method, host and path. Among those, the entry sharing the most
+        non-volatile query parameters wins, and entries that have been served fewer times are
+        preferred, so paginated requests to the same URL replay in recorded order.
+        """
+        host, path, params = _split_url(url)
+        best_index, best_score = None, None
+        with self._lock:
+            for index, entry in enumerate(self.entries):
+                request = entry['request']
+                if request['method'] != method:
+                    continue
+                entry_host, entry_path, entry_params = _split_url(request['url'])
+                if entry_path != path or entry_host != host:
+                    continue
+                shared = sum(1 for key, value in params.items() if entry_params.get(key) == value)
+                differing = len(set(params) ^ set(entry_params)) + sum(
+                    1 for key, value in params.items() if key in entry_params and entry_params[key] != value)
+                score = (shared - differing, -self._served.get(index, 0))
+                if best_score is None or score > best_score:
+                    best_index, best_score = index, score
+            if best_index is None:
+                return None
+            self._served[best_index] = self._served.get(best_index, 0) + 1
+            return self.entries[best_index]
+
+
+class Recorder:
+    """Collects browser and direct traffic of a PyTok session into an archive saved on shutdown."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.archive = NetworkArchive()
+        # bodies too big to keep in the archive, relative to its directory
+        self._bodies_directory = os.path.basename(path) + '.bodies'
+        self._body_count = 0
+        self._lock = threading.Lock()
+
+    def _body_file(self):
+        """Returns the archive-relative name and the path of a new body file."""
+        with self._lock:
+            self._body_count += 1
+            name = os.path.join(self._bodies_directory, f'{self._body_count:06d}')
+        path = os.path.join(os.path.dirname(os.path.abspath(self.path)), name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return name, path
+
+    def _add(self, method, url, request_headers, post_data, status, response_headers, body, source):
+        entry = make_entry(method, url, request_headers, post_data, status, response_headers, None, source)
+        mime_type = entry['response']['content']['mimeType']
+        if body and (len(body) > MAX_INLINE_BODY or mime_type.startswith(_MEDIA_MIME_TYPES)):
+            name, path = self._body_file()
+            with open(path, 'wb') as f:
+                f.write(body)
+            entry['response']['content'] = {'size': len(body), 'mimeType': mime_type, '_file': name}
+        else:
+            entry['response']['content'] = _encode_body(body, mime_type)
+        self.archive.add(entry)
+
+    def on_response(self, response):
+        """Response listener for PyTok, called once the response body has been captured."""
+        request = response.request
+        try:
+            self._add(request.method, response.url, request.headers, request.post_data,
+                      response.status, response.headers, getattr(response, '_body', None), 'browser')
+        except Exception:
+            # never let recording break a scrape
+            pass
+
+    def record_direct(self, url: str, r, stream: bool = False):
+        """
+        Records a requests.Response from a direct API request. A streamed response is recorded once it
+        is closed, with as much of its body as was read through iter_content, which is written to a
+        file as it is read, so that recording neither reads the body early nor keeps it in memory.
+        """
+        if not stream:
+            self._add(r.request.method, url, dict(r.request.headers), None,
+                      r.status_code, dict(r.headers), r.content, 'direct')
+            return
+
+        entry = make_entry(r.request.method, url, dict(r.request.headers), None,
+                           r.status_code, dict(r.headers), None, 'direct')
+
+        body_file = None
+        size = 0
+        iter_content, close = r.iter_content, r.close
+
+        def recording_iter_content(*args, **kwargs):
+            nonlocal body_file, size
+            for chunk in iter_content(*args, **kwargs):
+                if chunk:
+                    if body_file is None:
+                        name, path = self._body_file()
+                        entry['response']['content'] = {
+                            'size': 0, 'mimeType': entry['response']['content']['mimeType'], '_file': name}
+                        body_file = open(path, 'wb')
+                    body_file.write(chunk)
+                    size += len(chunk)
+                yield chunk
+
+        def recording_close():
+            try:
+                close()
+            finally:
+                if r.iter_content is recording_iter_content:
+                    r.iter_content, r.close = iter_content, close
+                    if body_file is not None:
+                        body_file.close()
+                        entry['response']['content']['size'] = size
+                    self.archive.add(entry)
+
+        r.iter_content, r.close = recording_iter_content, recording_close
+
+    def save(self):
+        self.archive.save(self.path)
+
+
+class Replayer:
+    """Serves a recorded archive to the browser through context.route and to direct requests through a local server."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.archive = NetworkArchive.load(path)
+        self.directory = os.path.dirname(os.path.abspath(path))
+        self._server = None
+
+    def response_for(self, method: str, url: str):
+        """Returns (status, headers, body) for a request, or None if nothing was recorded for it."""
+        entry = self.archive.match(method, url)
+        if entry is None:
+            return None
+        response = entry['response']
+        headers = {name: value for name, value in _headers_to_dict(response['headers']).items()
+                   if name.lower() not in _DROPPED_RESPONSE_HEADERS}
+        return response['status'], headers, decode_body(response['content'], self.directory)
+
+    async def route(self, route):
+        """Route handler for context.route('**/*', ...), aborting requests that were never recorded."""
+        request = route.request
+        recorded = self.response_for(request.method, request.url)
+        if recorded is None:
+            await route.abort()
+            return
+        status, headers, body = recorded
+        await route.fulfill(status=status, headers=headers, body=body)
+
+    def start_server(self, addr: str = '127.0.0.1', port: int = 0) -> ThreadingHTTPServer:
+        replayer = self
+
+        class ReplayHandler(BaseHTTPRequestHandler):
+            def _serve(self, method):
+                original_url = self.headers.get(ORIGINAL_URL_HEADER)
+                recorded = replayer.response_for(method, original_url) if original_url else None
+                if recorded is None:
+                    self.send_error(404, "No recorded response for this request")
+                    return
+                status, headers, body = recorded
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self._serve('GET')
+
+            def do_POST(self):
+                self._serve('POST')
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((addr, port), ReplayHandler)
+        thread = threading.Thread(target=self._server.serve_forever, name='pytok-replay', daemon=True)
+        thread.start()
+        return self._server
+
+    def rewrite(self, url: str, headers: Optional[dict]):
+        """Points a direct request at the local stand-in server, keeping the original URL for matching."""
+        host, port = self._server.server_address[:2]
+        parsed = url_parsers.urlparse(url)
+        local_url = f"http://{host}:{port}{parsed.path}" + (f"?{parsed.query}" if parsed.query else '')
+        headers = dict(headers or {})
+        headers[ORIGINAL_URL_HEADER] = url
+        return local_url, headers
+
+    def shutdown(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server = None
@@ -0,0 +1,166 @@
+"""
+A local store of warmed-up browser sessions.
+
+A fresh browser context has to earn TikTok's `msToken`, `s_v_web_id`, `ttwid` and related cookies
+on its first page load, often by solving a captcha. The session store saves a context's Playwright
+`storage_state` together with the fingerprint it was created with, so that a new PyTok instance
+can start from a session that TikTok already trusts. Sessions expire after a maximum age or when
+their essential cookies do, and are scored on how TikTok treated them: ones that keep running
+into captchas and verify responses are dropped.
+
+Example Usage
+```py
+store = SessionStore('sessions')
+async with PyTok(session_store=store) as api:
+    # starts with the healthiest saved session, and saves its state back on shutdown
+    ...
+```
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Optional
+
+from . import governor
+
+# cookies that a session is useless without once they have expired
+ESSENTIAL_COOKIES = ('msToken', 's_v_web_id', 'ttwid')
+
+# how much each outcome moves a session's health score, which is kept between 0 and 1
+SCORE_CHANGES = {
+    None: 0.01,
+    governor.STATUS: -0.05,
+    governor.EMPTY: -0.1,
+    governor.VERIFY: -0.1,
+    governor.CAPTCHA: -0.25,
+}
+
+
+class Session:
+    """A browser session's saved state, the fingerprint it belongs to, and its health."""
+
+    def __init__(self, id: str, fingerprint: dict, storage_state: Optional[dict] = None, score: float = 1.0,
+                 created_at: Optional[float] = None, last_used_at: Optional[float] = None, uses: int = 0):
+        self.id = id
+        self.fingerprint = fingerprint
+        self.storage_state = storage_state
+        self.score = score
+        self.created_at = created_at or time.time()
+        self.last_used_at = last_used_at or self.created_at
+        self.uses = uses
+
+    def record(self, reason: Optional[str]):
+        """Updates the health score with the outcome of a response, None meaning it was clean."""
+        self.score = min(1.0, max(0.0, self.score + SCORE_CHANGES.get(reason, 0)))
+
+    def is_expired(self, max_age: float, now: Optional[float] = None) -> bool:
+        now = now or time.time()
+        if now - self.created_at > max_age:
+            return True
+        for cookie in (self.storage_state or {}).get('cookies', []):
+            # an expiry of -1 marks a session cookie
+            if cookie['name'] in ESSENTIAL_COOKIES and 0 < cookie.get('expires', -1) < now:
+                return True
+        return False
+
+    def to_dict(self) -> dict:
+        return {
+            'id': self.id,
+            'fingerprint': self.fingerprint,
+            'storage_state': self.storage_state,
+            'score': self.score,
+            'created_at': self.created_at,
+            'last_used_at': self.last_used_at,
+            'uses': self.uses,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Session':
+        return cls(**data)
+
+
+class SessionStore:
+    """Saved sessions kept as one JSON file each in a directory."""
+
+    def __init__(self, directory: str, max_age: float = 24 * 60 * 60, min_score: float = 0.3):
+        """
+        ##### Parameters
+        * directory: Where to keep sessions, created if it doesn't exist
+        * max_age: Seconds after which a session is discarded
+        * min_score: Health score below which a session is discarded
+        """
+        self.directory = directory
+        self.max_age = max_age
+        self.min_score = min_score
+        self._lock = threading.Lock()
+        self._checked_out = set()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, session_id):
+        return os.path.join(self.directory, f"{session_id}.json")
+
+    def _load_all(self):
+        sessions = []
+        for file_name in os.listdir(self.directory):
+            if not file_name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.directory, file_name), 'r', encoding='utf-8') as f:
+                    sessions.append(Session.from_dict(json.load(f)))
+            except (OSError, ValueError, TypeError):
+                # a half written or corrupt session is no use to anyone
+                self._remove(file_name[:-len('.json')])
+        return sessions
+
+    def _remove(self, session_id):
+        try:
+            os.remove(self._path(session_id))
+        except FileNotFoundError:
+            pass
+
+    def _is_usable(self, session):
+        return session.score >= self.min_score and not session.is_expired(self.max_age)
+
+    def checkout(self, browser_type: str) -> Optional[Session]:
+        """
+        Returns the healthiest usable saved session for a browser type, or None if there is none.
+        A session is only handed to one instance at a time, until it is checked back in.
+        """
+        with self._lock:
+            candidates = []
+            for session in self._load_all():
+                if not self._is_usable(session):
+                    self._remove(session.id)
+                elif session.id not in self._checked_out and session.fingerprint.get('browser_type') == browser_type:
+                    candidates.append(session)
+            if not candidates:
+                return None
+            session = max(candidates, key=lambda candidate: (candidate.score, candidate.last_used_at))
+            self._checked_out.add(session.id)
+            session.uses += 1
+            session.last_used_at = time.time()
+            return session
+
+    def new(self, fingerprint: dict) -> Session:
+        """Creates a session for a fresh context, saved once it is checked in."""
+        session = Session(str(uuid.uuid4()), fingerprint)
+        with self._lock:
+            self._checked_out.add(session.id)
+        return session
+
+    def checkin(self, session: Session, storage_state: Optional[dict] = None):
+        """Saves a session's latest state, or discards it if it is no longer usable."""
+        if storage_state is not None:
+            session.storage_state = storage_state
+        with self._lock:
+            self._checked_out.discard(session.id)
+            if session.storage_state is None or not self._is_usable(session):
+                self._remove(session.id)
+                return
+            path = self._path(session.id)
+            temp_path = f"{path}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(session.to_dict(), f)
+            os.replace(temp_path, path)
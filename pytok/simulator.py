@@ -0,0 +1,605 @@
+"""
+A local stand-in for the parts of TikTok that PyTok scrapes, for offline end-to-end load testing.
+
+The simulator serves profile and video pages carrying `__UNIVERSAL_DATA_FOR_REHYDRATION__`, the
+`api/post/item_list`, `api/user/detail`, `api/comment/list` and `api/comment/list/reply` endpoints,
+and a slide captcha with its get/verify endpoints. Latency, error rates, verify rates, captcha rates
+and account sizes are all tunable. Accounts and their videos are generated deterministically from
+their usernames, so any username exists.
+
+Example Usage
+```py
+simulator = Simulator(SimulatorConfig(latency=0.2, verify_rate=0.05, videos_per_account=(50, 500)))
+simulator.start(port=8080)
+async with PyTok(base_url=simulator.base_url) as api:
+    async for video in api.user(username='anyone').videos():
+        ...
+print(simulator.stats())
+```
+
+Or from the command line:
+```
+python -m pytok.simulator --port 8080 --latency 0.2 --verify-rate 0.05 --videos 50-500
+```
+"""
+import argparse
+import base64
+import hashlib
+import html
+import json
+import random
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Tuple
+from urllib import parse as url_parsers
+
+SEC_UID_PREFIX = 'MS4wLjABAAAA'
+PAGE_SIZE = 35
+
+
+@dataclass
+class SimulatorConfig:
+    latency: float = 0.05
+    """Mean seconds added to every response."""
+    latency_jitter: float = 0.5
+    """Fraction of the latency that is randomised, 0.5 means latency +/- 50%."""
+    error_rate: float = 0.0
+    """Probability an API request fails with a 500 or an empty body."""
+    verify_rate: float = 0.0
+    """Probability an API request gets a `type: verify` response."""
+    captcha_rate: float = 0.0
+    """Probability a page load shows a slide captcha."""
+    missing_rate: float = 0.0
+    """Probability an account doesn't exist."""
+    videos_per_account: Tuple[int, int] = (0, 200)
+    """Inclusive range of the number of videos an account has."""
+    comments_per_video: Tuple[int, int] = (0, 60)
+    """Inclusive range of the number of top level comments a video has."""
+    replies_per_comment: Tuple[int, int] = (0, 5)
+    """Inclusive range of the number of replies a comment has."""
+    seed: int = 0
+
+
+def encode_sec_uid(username: str) -> str:
+    return SEC_UID_PREFIX + base64.urlsafe_b64encode(username.encode()).decode().rstrip('=')
+
+
+def decode_sec_uid(sec_uid: str) -> Optional[str]:
+    if not sec_uid.startswith(SEC_UID_PREFIX):
+        return None
+    encoded = sec_uid[len(SEC_UID_PREFIX):]
+    try:
+        return base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4)).decode()
+    except Exception:
+        return None
+
+
+def _numeric_id(*parts) -> str:
+    digest = hashlib.sha1('/'.join(str(part) for part in parts).encode()).hexdigest()
+    return str(7 * 10 ** 18 + int(digest[:15], 16) % 10 ** 18)
+
+
+class _World:
+    """Deterministically generated accounts, videos and comments."""
+
+    def __init__(self, config: SimulatorConfig):
+        self.config = config
+        self._videos = {}
+        self._lock = threading.Lock()
+
+    def _rng(self, *parts):
+        return random.Random(f"{self.config.seed}/" + '/'.join(str(part) for part in parts))
+
+    def account_exists(self, username):
+        return self._rng('exists', username).random() >= self.config.missing_rate
+
+    def user(self, username):
+        rng = self._rng('user', username)
+        user = {
+            'id': _numeric_id('user', username),
+            'uniqueId': username,
+            'nickname': username.title(),
+            'secUid': encode_sec_uid(username),
+            'signature': f"simulated account {username}",
+            'verified': rng.random() < 0.05,
+            'privateAccount': False,
+        }
+        stats = {
+            'followingCount': rng.randrange(2000),
+            'followerCount': rng.randrange(10 ** 6),
+            'heartCount': rng.randrange(10 ** 7),
+            'videoCount': self.video_count(username),
+            'diggCount': rng.randrange(10 ** 4),
+        }
+        return user, stats
+
+    def video_count(self, username):
+        return self._rng('video_count', username).randint(*self.config.videos_per_account)
+
+    def video(self, username, index, base_url):
+        video_id = _numeric_id('video', username, index)
+        with self._lock:
+            self._videos[video_id] = (username, index)
+        rng = self._rng('video', username, index)
+        user, stats = self.user(username)
+        tag = f"tag{rng.randrange(50)}"
+        return {
+            'id': video_id,
+            'desc': f"simulated video {index} #{tag}",
+            # newest first, an hour apart
+            'createTime': str(1_700_000_000 - index * 3600),
+            'author': user,
+            'authorStats': stats,
+            'music': {'id': _numeric_id('music', username), 'title': f"original sound - {username}",
+                      'authorName': username, 'original': True},
+            'challenges': [{'id': _numeric_id('tag', tag), 'title': tag}],
+            'textExtra': [{'hashtagName': tag, 'type': 1}],
+            'stats': {
+                'diggCount': rng.randrange(10 ** 5),
+                'shareCount': rng.randrange(10 ** 3),
+                'commentCount': self.comment_count(video_id),
+                'playCount': rng.randrange(10 ** 6),
+            },
+            'video': {
+                'id': video_id,
+                'duration': rng.randrange(5, 60),
+                'playAddr': f"{base_url}/video/tos/{video_id}.mp4",
+                'downloadAddr': f"{base_url}/video/tos/{video_id}.mp4?download=1",
+                'bitrate': 1_000_000,
+                'width': 576,
+                'height': 1024,
+                'codecType': 'h264',
+                'bitrateInfo': [
+                    {'GearName': f"{gear}_{height}_0", 'Bitrate': bitrate, 'CodecType': codec,
+                     'PlayAddr': {'Width': height * 9 // 16, 'Height': height,
+                                  'UrlList': [f"{base_url}/video/tos/{video_id}_{gear}_{height}.mp4"]}}
+                    for gear, height, bitrate, codec in (('normal', 1080, 2_000_000, 'h265_hvc1'),
+                                                         ('normal', 720, 1_000_000, 'h264'),
+                                                         ('lower', 540, 500_000, 'h264'))
+                ],
+            },
+        }
+
+    def find_video(self, video_id, base_url):
+        with self._lock:
+            owner = self._videos.get(video_id)
+        if owner is None:
+            return None
+        return self.video(owner[0], owner[1], base_url)
+
+    def comment_count(self, video_id):
+        return self._rng('comment_count', video_id).randint(*self.config.comments_per_video)
+
+    def reply_count(self, comment_id):
+        return self._rng('reply_count', comment_id).randint(*self.config.replies_per_comment)
+
+    def comment(self, video_id, index, parent_id=None):
+        comment_id = _numeric_id('comment', video_id, parent_id, index)
+        commenter = f"commenter{self._rng('commenter', comment_id).randrange(10 ** 6)}"
+        comment = {
+            'cid': comment_id,
+            'aweme_id': video_id,
+            'create_time': 1_700_000_000 - index * 60,
+            'text': f"simulated comment {index}",
+            'text_extra': [],
+            'comment_language': 'en',
+            'digg_count': self._rng('digg', comment_id).randrange(1000),
+            'user': {'uid': _numeric_id('user', commenter), 'unique_id': commenter, 'nickname': commenter},
+            'reply_id': parent_id or '0',
+        }
+        if parent_id is None:
+            comment['reply_comment_total'] = self.reply_count(comment_id)
+            comment['reply_comment'] = None
+        return comment
+
+
+_CAPTCHA_OVERLAY = """
+<div id="captcha-container" style="position:fixed;top:20%;left:30%;width:380px;padding:20px;background:#fff;z-index:10">
+  <div>Drag the slider to fit the puzzle</div>
+  <img id="captcha-bg" width="340"><img id="captcha-piece" width="68">
+  <div class="cap-bg-UISheetGrouped3" style="position:relative;width:340px;height:40px;background:#eee">
+    <button class="secsdk-captcha-drag-icon" style="position:absolute;left:0;width:60px;height:40px">&gt;</button>
+  </div>
+</div>
+<script>
+(async () => {
+  const challenge = await (await fetch('/captcha/get?aid=1988')).json();
+  const question = challenge.data.question;
+  document.getElementById('captcha-bg').src = question.url1;
+  document.getElementById('captcha-piece').src = question.url2;
+  let dragging = false;
+  document.querySelector('.secsdk-captcha-drag-icon').addEventListener('mousedown', () => { dragging = true; });
+  document.addEventListener('mouseup', async () => {
+    if (!dragging) return;
+    dragging = false;
+    await fetch('/captcha/verify?aid=1988', {method: 'POST', body: JSON.stringify({id: challenge.data.id})});
+    document.getElementById('captcha-container').remove();
+  });
+})();
+</script>
+"""
+
+_PROFILE_SCRIPT = """
+<script>
+(() => {
+  const secUid = %(sec_uid)s;
+  const list = document.getElementById('post-list');
+  let cursor = 0, hasMore = true, loading = false;
+  async function load() {
+    if (loading || !hasMore) return;
+    loading = true;
+    try {
+      const r = await fetch('/api/post/item_list/?aid=1988&count=35&secUid=' + encodeURIComponent(secUid)
+                            + '&cursor=' + cursor + '&msToken=simulated');
+      const data = await r.json();
+      if (data.type === 'verify') return;
+      for (const item of data.itemList || []) {
+        const div = document.createElement('div');
+        div.setAttribute('data-e2e', 'user-post-item');
+        div.style.height = '320px';
+        div.innerHTML = '<div data-e2e="user-post-item-desc"><a href="/@' + item.author.uniqueId
+                        + '/video/' + item.id + '">' + item.desc + '</a></div>';
+        list.appendChild(div);
+      }
+      cursor = data.cursor;
+      hasMore = data.hasMore;
+    } finally {
+      loading = false;
+    }
+  }
+  fetch('/api/user/detail/?aid=1988&uniqueId=' + %(username)s + '&secUid=' + encodeURIComponent(secUid));
+  load();
+  window.addEventListener('scroll', () => {
+    if (window.innerHeight + window.scrollY >= document.body.scrollHeight - 400) load();
+  });
+})();
+</script>
+"""
+
+_VIDEO_SCRIPT = """
+<script>
+(() => {
+  const awemeId = %(video_id)s;
+  const list = document.getElementById('comment-list');
+  let cursor = 0, hasMore = true, loading = false;
+  async function load() {
+    if (loading || !hasMore) return;
+    loading = true;
+    try {
+      const r = await fetch('/api/comment/list/?aid=1988&count=20&aweme_id=' + awemeId + '&cursor=' + cursor
+                            + '&msToken=simulated');
+      const data = await r.json();
+      if (data.type === 'verify') return;
+      for (const comment of data.comments || []) {
+        const div = document.createElement('div');
+        div.setAttribute('data-e2e', 'comment-level-1');
+        div.style.height = '80px';
+        div.textContent = comment.text;
+        list.appendChild(div);
+      }
+      cursor = data.cursor;
+      hasMore = data.has_more === 1;
+    } finally {
+      loading = false;
+    }
+  }
+  load();
+  window.addEventListener('scroll', () => {
+    if (window.innerHeight + window.scrollY >= document.body.scrollHeight - 400) load();
+  });
+})();
+</script>
+"""
+
+
+def _page(title, data, body):
+    return (
+        f'<!DOCTYPE html><html lang="en"><head><meta charset="utf-8"><title>{html.escape(title)}</title></head><body>'
+        f'<script id="__UNIVERSAL_DATA_FOR_REHYDRATION__" type="application/json">{json.dumps(data)}</script>'
+        f'{body}</body></html>'
+    )
+
+
+class Simulator:
+    """Serves simulated TikTok pages and API endpoints from a background thread."""
+
+    def __init__(self, config: Optional[SimulatorConfig] = None):
+        self.config = config or SimulatorConfig()
+        self._world = _World(self.config)
+        self._rng = random.Random(self.config.seed)
+        self._rng_lock = threading.Lock()
+        self._stats = Counter()
+        self._stats_lock = threading.Lock()
+        self._captcha_images = None
+        self._server = None
+        self.base_url = None
+
+    def _chance(self, probability):
+        if probability <= 0:
+            return False
+        with self._rng_lock:
+            return self._rng.random() < probability
+
+    def _count(self, key, amount=1):
+        with self._stats_lock:
+            self._stats[key] += amount
+
+    def stats(self) -> dict:
+        """Returns counts of requests served per endpoint, injected failures and bytes sent."""
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def _delay(self):
+        if self.config.latency <= 0:
+            return
+        with self._rng_lock:
+            jitter = self._rng.uniform(-self.config.latency_jitter, self.config.latency_jitter)
+        time.sleep(max(0.0, self.config.latency * (1 + jitter)))
+
+    def _captcha_image(self, kind):
+        if self._captcha_images is None:
+            import cv2
+            import numpy as np
+            rng = np.random.default_rng(self.config.seed)
+            noise = rng.integers(0, 255, size=(43, 69, 3), dtype=np.uint8)
+            background = cv2.GaussianBlur(cv2.resize(noise, (552, 344), interpolation=cv2.INTER_CUBIC), (5, 5), 0)
+            piece = background[100:210, 300:410].copy()
+            background[100:210, 300:410] = (background[100:210, 300:410] * 0.4).astype(np.uint8)
+            self._captcha_images = {
+                'bg': cv2.imencode('.jpg', background)[1].tobytes(),
+                'piece': cv2.imencode('.png', piece)[1].tobytes(),
+            }
+        return self._captcha_images[kind]
+
+    def _api_failure(self):
+        """Returns a (status, body) failure to inject into an API response, or None."""
+        if self._chance(self.config.error_rate):
+            self._count('injected_errors')
+            return (500, b'') if self._chance(0.5) else (200, b'')
+        if self._chance(self.config.verify_rate):
+            self._count('injected_verify')
+            return 200, json.dumps({'type': 'verify', 'verify_event': '', 'fixed': True}).encode()
+        return None
+
+    def handle(self, method, path, query, body):
+        """Returns (status, content type, body, extra headers) for a request."""
+        base_url = self.base_url
+        params = {key: values[0] for key, values in url_parsers.parse_qs(query).items()}
+
+        if path.startswith('/api/'):
+            endpoint = path.strip('/')
+            self._count(endpoint)
+            failure = self._api_failure()
+            if failure is not None:
+                status, failure_body = failure
+                return status, 'application/json', failure_body, {}
+            return 200, 'application/json', json.dumps(self._api(endpoint, params)).encode(), {}
+
+        if path.startswith('/captcha/'):
+            self._count(path.strip('/'))
+            if path == '/captcha/get':
+                challenge = {'data': {'mode': 'slide', 'id': 'simulated', 'question': {
+                    'url1': f"{base_url}/captcha/img/bg.jpg", 'url2': f"{base_url}/captcha/img/piece.png",
+                    'tip_y': 100}}}
+                return 200, 'application/json', json.dumps(challenge).encode(), {}
+            if path == '/captcha/verify':
+                return 200, 'application/json', json.dumps({'code': 200, 'message': 'Verification complete'}).encode(), {}
+            if path == '/captcha/img/bg.jpg':
+                return 200, 'image/jpeg', self._captcha_image('bg'), {}
+            if path == '/captcha/img/piece.png':
+                return 200, 'image/png', self._captcha_image('piece'), {}
+            return 404, 'text/plain', b'', {}
+
+        if path.startswith('/video/tos/'):
+            self._count('video_bytes')
+            return 200, 'video/mp4', b'\x00\x00\x00\x18ftypmp42' + b'\x00' * 4096, {}
+
+        if path.startswith('/@'):
+            parts = path[2:].split('/')
+            username = url_parsers.unquote(parts[0])
+            if len(parts) >= 3 and parts[1] == 'video':
+                self._count('video_page')
+                return self._video_page(parts[2])
+            self._count('profile_page')
+            return self._profile_page(username)
+
+        if path == '/__stats':
+            return 200, 'application/json', json.dumps(self.stats()).encode(), {}
+
+        return 404, 'text/plain', b'Not found', {}
+
+    def _session_cookies(self):
+        # the cookies PyTok needs to page the API directly
+        return {'Set-Cookie': ['s_v_web_id=verify_simulated; Path=/', 'ttwid=simulated; Path=/',
+                               'msToken=simulated; Path=/']}
+
+    def _maybe_captcha(self):
+        if self._chance(self.config.captcha_rate):
+            self._count('injected_captcha')
+            return _CAPTCHA_OVERLAY
+        return ''
+
+    def _profile_page(self, username):
+        if not self._world.account_exists(username):
+            data = {'__DEFAULT_SCOPE__': {'webapp.user-detail': {'statusCode': 10221, 'userInfo': {}}}}
+            body = "<div><p>Couldn't find this account</p></div>"
+            return 200, 'text/html', _page(username, data, body).encode(), self._session_cookies()
+
+        user, stats = self._world.user(username)
+        data = {'__DEFAULT_SCOPE__': {
+            'webapp.app-context': {'language': 'en', 'region': 'US'},
+            'webapp.user-detail': {'statusCode': 0, 'userInfo': {'user': user, 'stats': stats}},
+        }}
+        if stats['videoCount'] == 0:
+            body = '<div><p>No content</p></div>'
+        else:
+            body = '<div id="post-list" data-e2e="user-post-item-list"></div>' + _PROFILE_SCRIPT % {
+                'sec_uid': json.dumps(user['secUid']), 'username': json.dumps(username)}
+        body += self._maybe_captcha()
+        return 200, 'text/html', _page(username, data, body).encode(), self._session_cookies()
+
+    def _video_page(self, video_id):
+        video = self._world.find_video(video_id, self.base_url)
+        if video is None:
+            data = {'__DEFAULT_SCOPE__': {'webapp.video-detail': {'statusCode': 10204, 'statusMsg': 'item doesn\'t exist'}}}
+            body = '<div><p>Video currently unavailable</p></div>'
+            return 200, 'text/html', _page(video_id, data, body).encode(), self._session_cookies()
+
+        data = {'__DEFAULT_SCOPE__': {
+            'webapp.video-detail': {'statusCode': 0, 'statusMsg': '', 'itemInfo': {'itemStruct': video}},
+        }}
+        if video['stats']['commentCount'] == 0:
+            body = '<div><p>Be the first to comment!</p></div>'
+        else:
+            body = '<div id="comment-list"></div>' + _VIDEO_SCRIPT % {'video_id': json.dumps(video_id)}
+        body += self._maybe_captcha()
+        return 200, 'text/html', _page(video_id, data, body).encode(), self._session_cookies()
+
+    def _api(self, endpoint, params):
+        if endpoint == 'api/post/item_list':
+            username = decode_sec_uid(params.get('secUid', '')) or ''
+            total = self._world.video_count(username) if username and self._world.account_exists(username) else 0
+            cursor = int(params.get('cursor', 0) or 0)
+            count = int(params.get('count', PAGE_SIZE) or PAGE_SIZE)
+            end = min(total, cursor + count)
+            self._count('items_served', end - cursor if end > cursor else 0)
+            return {
+                'itemList': [self._world.video(username, index, self.base_url) for index in range(cursor, end)],
+                'cursor': str(end),
+                'hasMore': end < total,
+                'statusCode': 0,
+            }
+
+        if endpoint == 'api/user/detail':
+            username = params.get('uniqueId') or decode_sec_uid(params.get('secUid', '')) or ''
+            if not self._world.account_exists(username):
+                return {'statusCode': 10221, 'userInfo': {}}
+            user, stats = self._world.user(username)
+            return {'statusCode': 0, 'userInfo': {'user': user, 'stats': stats}}
+
+        if endpoint == 'api/comment/list':
+            video_id = params.get('aweme_id', '')
+            total = self._world.comment_count(video_id)
+            cursor = int(params.get('cursor', 0) or 0)
+            count = int(params.get('count', 20) or 20)
+            end = min(total, cursor + count)
+            return {
+                'comments': [self._world.comment(video_id, index) for index in range(cursor, end)],
+                'cursor': end,
+                'has_more': 1 if end < total else 0,
+                'total': total,
+                'status_code': 0,
+            }
+
+        if endpoint == 'api/comment/list/reply':
+            video_id = params.get('item_id', '')
+            comment_id = params.get('comment_id', '')
+            total = self._world.reply_count(comment_id)
+            cursor = int(params.get('cursor', 0) or 0)
+            count = int(params.get('count', 20) or 20)
+            end = min(total, cursor + count)
+            return {
+                'comments': [self._world.comment(video_id, index, parent_id=comment_id) for index in range(cursor, end)],
+                'cursor': end,
+                'has_more': 1 if end < total else 0,
+                'total': total,
+                'status_code': 0,
+            }
+
+        return {'statusCode': 10000, 'statusMsg': f"unknown endpoint {endpoint}"}
+
+    def start(self, addr: str = '127.0.0.1', port: int = 0) -> str:
+        """Starts serving from a daemon thread and returns the base URL to give PyTok."""
+        simulator = self
+
+        class SimulatorHandler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _serve(self, method):
+                parsed = url_parsers.urlparse(self.path)
+                length = int(self.headers.get('Content-Length', 0) or 0)
+                request_body = self.rfile.read(length) if length else b''
+                simulator._delay()
+                status, content_type, body, headers = simulator.handle(method, parsed.path, parsed.query, request_body)
+                simulator._count('bytes_sent', len(body))
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                for name, values in headers.items():
+                    for value in (values if isinstance(values, list) else [values]):
+                        self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self._serve('GET')
+
+            def do_POST(self):
+                self._serve('POST')
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((addr, port), SimulatorHandler)
+        self._server.daemon_threads = True
+        host, port = self._server.server_address[:2]
+        self.base_url = f"http://{host}:{port}"
+        thread = threading.Thread(target=self._server.serve_forever, name='pytok-simulator', daemon=True)
+        thread.start()
+        return self.base_url
+
+    def shutdown(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+def _parse_range(value):
+    if '-' in value:
+        low, high = value.split('-', 1)
+        return int(low), int(high)
+    return int(value), int(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local TikTok simulator for load testing PyTok")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.05, help="Mean seconds added to every response")
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--verify-rate', type=float, default=0.0)
+    parser.add_argument('--captcha-rate', type=float, default=0.0)
+    parser.add_argument('--missing-rate', type=float, default=0.0)
+    parser.add_argument('--videos', default='0-200', help="Videos per account, i.e. 50-500")
+    parser.add_argument('--comments', default='0-60', help="Top level comments per video")
+    parser.add_argument('--replies', default='0-5', help="Replies per comment")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    simulator = Simulator(SimulatorConfig(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        verify_rate=args.verify_rate,
+        captcha_rate=args.captcha_rate,
+        missing_rate=args.missing_rate,
+        videos_per_account=_parse_range(args.videos),
+        comments_per_video=_parse_range(args.comments),
+        replies_per_comment=_parse_range(args.replies),
+        seed=args.seed,
+    ))
+    base_url = simulator.start(args.host, args.port)
+    print(f"Simulating TikTok at {base_url}, stats at {base_url}/__stats")
+    try:
+        while True:
+            time.sleep(60)
+            print(json.dumps(simulator.stats()))
+    except KeyboardInterrupt:
+        simulator.shutdown()
+
+
+if __name__ == '__main__':
+    main()
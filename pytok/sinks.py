@@ -0,0 +1,317 @@
+"""
+Sinks that scraped entities can be streamed into, so that a crawl never holds its results in memory.
+
+A sink buffers items and writes them out in batches, once batch_size items are buffered or
+flush_interval seconds have passed since the first of them. Batches are written in the background
+while the crawl carries on, one at a time: if the next batch fills up before the last one has been
+written, writing to the sink waits for it, which keeps a slow sink from buffering without bound.
+Items can be entities such as Videos and Users, whose raw data is written, or plain dicts such as
+comments.
+
+pyarrow, zstandard and pymongo are only needed by the sinks that use them.
+
+Example Usage
+```py
+async with JsonLinesSink('videos.jsonl.zst', compression='zstd') as sink:
+    await pipe(api.user(username='therock').videos(count=1000), sink)
+
+async with SQLiteSink('comments.sqlite3', table='comments', key='cid') as sink:
+    await pipe(api.video(id='7041997751718137094').comments(), sink)
+```
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import time
+import uuid
+from typing import Any, AsyncIterable, Callable, Dict, List, Optional, Sequence, Union
+
+from . import metrics
+
+
+def _to_dict(item) -> dict:
+    # entities keep their raw data in as_dict
+    return item.as_dict if hasattr(item, 'as_dict') else item
+
+
+def _key_func(key: Union[str, Callable[[dict], Any]]) -> Callable[[dict], Any]:
+    return key if callable(key) else (lambda data: data.get(key))
+
+
+class Sink:
+    """
+    Buffers items and writes them in batches. Subclasses implement _write_batch.
+
+    Use a sink as an async context manager, or call close() when done, so that the last batch is written.
+    """
+
+    name = 'sink'
+
+    def __init__(self, batch_size: int = 1000, flush_interval: Optional[float] = 5.0):
+        """
+        ##### Parameters
+        * batch_size: The number of items to write at once
+
+        * flush_interval: Seconds after which buffered items are written even if the batch isn't full, optional
+            Checked as items arrive, so a stalled crawl keeps its items buffered until close().
+        """
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._buffer = []
+        self._buffered_at = None
+        self._flushing: Optional[asyncio.Task] = None
+        self._closed = False
+
+    async def write(self, item):
+        """Adds an item to the current batch, waiting only if the previous batch is still being written."""
+        if self._closed:
+            raise RuntimeError(f"{type(self).__name__} is closed")
+        if not self._buffer:
+            self._buffered_at = time.monotonic()
+        self._buffer.append(_to_dict(item))
+        if len(self._buffer) >= self.batch_size or (
+                self.flush_interval is not None and time.monotonic() - self._buffered_at >= self.flush_interval):
+            await self._start_flush()
+
+    async def flush(self):
+        """Writes everything buffered, and waits until it has been written."""
+        await self._start_flush()
+        await self._wait_for_flush()
+
+    async def close(self):
+        if self._closed:
+            return
+        try:
+            await self.flush()
+        finally:
+            self._closed = True
+            await self._close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def _start_flush(self):
+        # back-pressure: at most one batch is being written while the next one fills up
+        await self._wait_for_flush()
+        if not self._buffer:
+            return
+        batch, self._buffer = self._buffer, []
+        self._flushing = asyncio.create_task(self._timed_write(batch))
+
+    async def _wait_for_flush(self):
+        if self._flushing is not None:
+            flushing, self._flushing = self._flushing, None
+            # re-raises the error of a failed write
+            await flushing
+
+    async def _timed_write(self, batch):
+        with metrics.SINK_FLUSH_SECONDS.labels(sink=self.name).time():
+            await self._write_batch(batch)
+        metrics.SINK_ITEMS.labels(sink=self.name).inc(len(batch))
+
+    async def _write_batch(self, batch: List[dict]):
+        raise NotImplementedError
+
+    async def _close(self):
+        pass
+
+
+async def pipe(source: AsyncIterable, sink: Sink, close: bool = True) -> int:
+    """
+    Writes every item of a scrape iterator, i.e. User.videos or Video.comments, to a sink, and
+    returns the number of items written. The sink is closed at the end unless close is False.
+    """
+    count = 0
+    try:
+        async for item in source:
+            await sink.write(item)
+            count += 1
+    finally:
+        if close:
+            await sink.close()
+        else:
+            await sink.flush()
+    return count
+
+
+class JsonLinesSink(Sink):
+    """Appends items to a JSON-lines file, optionally compressed with zstd."""
+
+    name = 'jsonl'
+
+    def __init__(self, path: str, compression: Optional[str] = None, level: int = 3, **kwargs):
+        """
+        ##### Parameters
+        * path: The file to append to
+
+        * compression: 'zstd' to compress the file, optional
+            Each batch is a separate zstd frame, so everything flushed can be read back even if
+            the process dies. Needs the zstandard package.
+
+        * level: The zstd compression level
+
+        * **kwargs: Passed on to Sink, i.e. batch_size and flush_interval
+        """
+        super().__init__(**kwargs)
+        if compression not in (None, 'zstd'):
+            raise ValueError(f"Unsupported compression {compression!r}")
+        self.path = path
+        self._file = open(path, 'ab')
+        self._compressor = None
+        if compression == 'zstd':
+            import zstandard
+            self._compressor = zstandard.ZstdCompressor(level=level)
+
+    async def _write_batch(self, batch):
+        await asyncio.to_thread(self._write_lines, batch)
+
+    def _write_lines(self, batch):
+        data = ''.join(json.dumps(item, ensure_ascii=False) + '\n' for item in batch).encode()
+        if self._compressor is not None:
+            data = self._compressor.compress(data)
+        self._file.write(data)
+        self._file.flush()
+
+    async def _close(self):
+        self._file.close()
+
+
+def _flatten(item: dict) -> dict:
+    # nested values are kept as JSON, so that files written from different payloads share a schema
+    return {key: json.dumps(value, ensure_ascii=False) if isinstance(value, (dict, list)) else value
+            for key, value in item.items()}
+
+
+class ParquetSink(Sink):
+    """Writes each batch as Parquet files under a directory, partitioned Hive-style, i.e. author=therock/."""
+
+    name = 'parquet'
+
+    def __init__(self, directory: str, partition_by: Union[Sequence[str], Callable[[dict], Dict[str, Any]], None] = None,
+                 compression: str = 'zstd', **kwargs):
+        """
+        ##### Parameters
+        * directory: The root directory of the dataset
+
+        * partition_by: Field names, or a function returning a dict of partition names and values for an item, optional
+
+        * compression: The Parquet compression codec
+
+        * **kwargs: Passed on to Sink, i.e. batch_size and flush_interval
+
+        Top level fields become columns, and nested ones are stored as JSON strings. Needs the pyarrow package.
+        """
+        super().__init__(**kwargs)
+        import pyarrow
+        import pyarrow.parquet
+        self._pyarrow = pyarrow
+        self._parquet = pyarrow.parquet
+        self.directory = directory
+        if partition_by is None or callable(partition_by):
+            self.partition_by = partition_by
+        else:
+            fields = list(partition_by)
+            self.partition_by = lambda item: {field: item.get(field) for field in fields}
+        self.compression = compression
+        self._files = 0
+
+    async def _write_batch(self, batch):
+        await asyncio.to_thread(self._write_files, batch)
+
+    def _write_files(self, batch):
+        partitions = {}
+        for item in batch:
+            values = self.partition_by(item) if self.partition_by else {}
+            path = os.path.join(self.directory, *(f"{name}={value}" for name, value in values.items()))
+            partitions.setdefault(path, []).append(_flatten(item))
+        for path, rows in partitions.items():
+            os.makedirs(path, exist_ok=True)
+            self._files += 1
+            # every field of the batch, as the first row may not have them all
+            columns = list(dict.fromkeys(column for row in rows for column in row))
+            table = self._pyarrow.Table.from_pydict({column: [row.get(column) for row in rows] for column in columns})
+            self._parquet.write_table(table, os.path.join(path, f"part-{self._files:05d}-{uuid.uuid4().hex[:8]}.parquet"),
+                                      compression=self.compression)
+
+
+class SQLiteSink(Sink):
+    """Upserts items into a SQLite table of keys and JSON data."""
+
+    name = 'sqlite'
+
+    def __init__(self, path: str, table: str = 'entities', key: Union[str, Callable[[dict], Any]] = 'id', **kwargs):
+        """
+        ##### Parameters
+        * path: The SQLite file to write to
+
+        * table: The table to upsert into, created if it doesn't exist
+
+        * key: The field, or a function of an item, that identifies it, i.e. 'cid' for comments
+
+        * **kwargs: Passed on to Sink, i.e. batch_size and flush_interval
+        """
+        super().__init__(**kwargs)
+        if not table.isidentifier():
+            raise ValueError(f"Invalid table name {table!r}")
+        self.table = table
+        self._key = _key_func(key)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute(
+            f'CREATE TABLE IF NOT EXISTS {table} '
+            '(key TEXT PRIMARY KEY, written_at REAL NOT NULL, data TEXT NOT NULL)'
+        )
+        self._db.commit()
+
+    async def _write_batch(self, batch):
+        await asyncio.to_thread(self._upsert, batch)
+
+    def _upsert(self, batch):
+        now = time.time()
+        self._db.executemany(
+            f'INSERT OR REPLACE INTO {self.table} (key, written_at, data) VALUES (?, ?, ?)',
+            [(str(self._key(item)), now, json.dumps(item, ensure_ascii=False)) for item in batch])
+        self._db.commit()
+
+    async def _close(self):
+        self._db.close()
+
+
+class MongoSink(Sink):
+    """Upserts items into a MongoDB collection in bulk, through a pytok.mongo.MongoWriter."""
+
+    name = 'mongo'
+
+    def __init__(self, writer, collection: str, key: Union[str, Callable[[dict], Any]] = 'id',
+                 close_writer: bool = False, **kwargs):
+        """
+        ##### Parameters
+        * writer: The pytok.mongo.MongoWriter to write with, which has to have been started
+
+        * collection: The collection to upsert into
+
+        * key: The field, or a function of an item, that identifies it, stored as the document's _id
+
+        * close_writer: Close the writer when the sink is closed, draining its queue
+
+        * **kwargs: Passed on to Sink, i.e. batch_size and flush_interval
+        """
+        super().__init__(**kwargs)
+        self.writer = writer
+        self.collection = collection
+        self._key = _key_func(key)
+        self.close_writer = close_writer
+
+    async def _write_batch(self, batch):
+        from pymongo import ReplaceOne
+        requests = [ReplaceOne({'_id': self._key(item)}, item, upsert=True) for item in batch]
+        # waits for the writer, so that back-pressure reaches the crawl
+        await self.writer.write(self.collection, requests, wait=True)
+
+    async def _close(self):
+        if self.close_writer:
+            await self.writer.close()
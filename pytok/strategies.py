@@ -0,0 +1,179 @@
+"""
+Adaptive selection between the ways PyTok can fetch the same data.
+
+Most iterators can get their results more than one way, i.e. a user's videos can be paged from
+the API directly, read from the profile page's own API calls, or scraped by scrolling the page.
+Rather than trying these in a fixed order for every entity, iterators run them through a
+StrategySelector, which tracks the success rate and latency of each (endpoint, strategy) pair. A
+strategy that fails repeatedly, i.e. on `type: verify` or empty responses, has its circuit breaker
+opened, and new work goes straight to the strategies that are currently working. Once a cooldown
+has passed, the next run probes the failed strategy again, and closes its breaker if it works.
+
+Example Usage
+```py
+strategies = {'api': lambda: user._get_videos_api(count, 0, False), 'scraping': lambda: user._get_videos_scraping(count, False)}
+async for video in api._strategies.run('api/post/item_list', strategies):
+    ...
+```
+"""
+import threading
+import time
+from typing import AsyncIterator, Callable, Dict, List, Optional, Sequence, Tuple, Type
+
+from . import metrics
+from .exceptions import ApiFailedException
+
+# circuit breaker states
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """Opens after failure_threshold consecutive failures, and lets a probe through once cooldown seconds have passed."""
+
+    def __init__(self, failure_threshold: int = 3, cooldown: float = 120.0, clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._clock = clock
+        self.failures = 0
+        self._opened_at = None
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return CLOSED
+        if self._clock() - self._opened_at >= self.cooldown:
+            return HALF_OPEN
+        return OPEN
+
+    def allow(self) -> bool:
+        return self.state != OPEN
+
+    def record_success(self):
+        self.failures = 0
+        self._opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        # a failed probe opens the breaker again straight away
+        if self.failures >= self.failure_threshold or self._opened_at is not None:
+            self._opened_at = self._clock()
+
+
+class StrategyStats:
+    """Moving averages of how a strategy has been doing on an endpoint."""
+
+    def __init__(self, breaker: CircuitBreaker, smoothing: float = 0.2):
+        self.breaker = breaker
+        self.smoothing = smoothing
+        self.attempts = 0
+        # optimistic, so that a strategy isn't written off before it has been tried
+        self.success_rate = 1.0
+        self.latency: Optional[float] = None
+
+    def record(self, success: bool, latency: float):
+        self.attempts += 1
+        self.success_rate += self.smoothing * (float(success) - self.success_rate)
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += self.smoothing * (latency - self.latency)
+        if success:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+
+
+class StrategySelector:
+    """Tracks strategies per endpoint, and runs whichever is currently working best."""
+
+    def __init__(self, failure_threshold: int = 3, cooldown: float = 120.0, clock: Callable[[], float] = time.monotonic):
+        """
+        ##### Parameters
+        * failure_threshold: Consecutive failures after which a strategy's circuit breaker opens
+        * cooldown: Seconds after which a strategy with an open circuit breaker is probed again
+        """
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._stats: Dict[Tuple[str, str], StrategyStats] = {}
+
+    def stats(self, endpoint: str, strategy: str) -> StrategyStats:
+        with self._lock:
+            key = (endpoint, strategy)
+            if key not in self._stats:
+                breaker = CircuitBreaker(self.failure_threshold, self.cooldown, clock=self._clock)
+                self._stats[key] = StrategyStats(breaker)
+            return self._stats[key]
+
+    def order(self, endpoint: str, strategies: Sequence[str]) -> List[str]:
+        """
+        Returns the strategies in the order they should be tried. Strategies due a probe come first,
+        then working strategies by success rate, keeping the given order between similar ones.
+        Strategies with an open circuit breaker are left out, unless every breaker is open.
+        """
+        def rank(strategy):
+            stats = self.stats(endpoint, strategy)
+            # rounded so that a near-perfect strategy doesn't lose its place to noise
+            return -round(stats.success_rate, 1), strategies.index(strategy)
+
+        ranked = sorted(strategies, key=rank)
+        states = {strategy: self.stats(endpoint, strategy).breaker.state for strategy in ranked}
+        probes = [strategy for strategy in ranked if states[strategy] == HALF_OPEN]
+        closed = [strategy for strategy in ranked if states[strategy] == CLOSED]
+        return (probes + closed) or ranked
+
+    def record(self, endpoint: str, strategy: str, success: bool, latency: float):
+        stats = self.stats(endpoint, strategy)
+        state = stats.breaker.state
+        stats.record(success, latency)
+        metrics.STRATEGY_RUNS.labels(endpoint=endpoint, strategy=strategy,
+                                     outcome='success' if success else 'failure').inc()
+        metrics.STRATEGY_SECONDS.labels(endpoint=endpoint, strategy=strategy).observe(latency)
+        if stats.breaker.state != state:
+            metrics.CIRCUIT_BREAKER_OPEN.labels(endpoint=endpoint, strategy=strategy).set(
+                int(stats.breaker.state != CLOSED))
+
+    async def run(
+            self,
+            endpoint: str,
+            strategies: Dict[str, Callable[[], AsyncIterator]],
+            fallback_on: Tuple[Type[BaseException], ...] = (ApiFailedException,),
+    ) -> AsyncIterator:
+        """
+        Yields the items of the first strategy to finish without raising one of fallback_on, trying
+        the strategies in the order given by order(). Each strategy is a zero-argument function
+        returning an async iterator, so that strategies that aren't needed are never started. A
+        strategy that fails part way through is followed by the next one, which may yield items
+        the failed strategy already had, so callers deduplicate.
+
+        A strategy's latency is the time until its first item, or until it finished or failed.
+        """
+        error = None
+        for strategy in self.order(endpoint, list(strategies)):
+            source = strategies[strategy]()
+            start = self._clock()
+            latency = None
+            try:
+                async for item in source:
+                    if latency is None:
+                        latency = self._clock() - start
+                    yield item
+            except fallback_on as ex:
+                self.record(endpoint, strategy, False, self._clock() - start if latency is None else latency)
+                error = ex
+                continue
+            except GeneratorExit:
+                # the consumer has what it needs
+                self.record(endpoint, strategy, True, self._clock() - start if latency is None else latency)
+                raise
+            finally:
+                if hasattr(source, 'aclose'):
+                    await source.aclose()
+            self.record(endpoint, strategy, True, self._clock() - start if latency is None else latency)
+            return
+        if error is not None:
+            raise error
+        raise ApiFailedException(f"No strategy left to fetch {endpoint} with")
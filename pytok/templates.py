@@ -0,0 +1,81 @@
+"""
+Per-endpoint request templates for direct API pagination.
+
+Paging a TikTok API endpoint directly needs a request that the browser made to that endpoint, for
+its query parameters (device, locale and token fields) and headers. The template cache captures
+the latest clean browser request to each endpoint, so that any entity can be paged by rewriting
+only its entity-specific parameters, i.e. `secUid` or `aweme_id`, instead of loading a page for
+that entity first. A template is dropped as soon as the endpoint answers with a `type: verify`.
+"""
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+from .governor import is_throttled, VERIFY
+from .helpers import edit_url
+
+# endpoints whose requests are captured as templates
+TEMPLATE_ENDPOINTS = ('api/post/item_list', 'api/comment/list', 'api/challenge/item_list', 'api/music/item_list',
+                      'api/search/item', 'api/search/user', 'api/recommend/item_list', 'api/user/detail',
+                      'api/item/detail')
+
+
+@dataclass
+class RequestTemplate:
+    endpoint: str
+    url: str
+    headers: dict = field(default_factory=dict)
+    captured_at: float = field(default_factory=time.time)
+
+    def url_for(self, params: dict) -> str:
+        """Returns the template URL with the given parameters rewritten."""
+        return edit_url(self.url, params)
+
+
+def endpoint_for(url: str) -> Optional[str]:
+    """Returns the templated endpoint a URL requests, or None if it isn't one of TEMPLATE_ENDPOINTS."""
+    path = url.split('?', 1)[0].rstrip('/')
+    # i.e. api/search/item/full
+    if path.endswith('/full'):
+        path = path[:-len('/full')]
+    for endpoint in TEMPLATE_ENDPOINTS:
+        if path.endswith(endpoint):
+            return endpoint
+    return None
+
+
+class RequestTemplateCache:
+    """The latest clean request seen for each templated endpoint of a PyTok session."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._templates = {}
+
+    def get(self, endpoint: str) -> Optional[RequestTemplate]:
+        with self._lock:
+            return self._templates.get(endpoint)
+
+    def capture(self, endpoint: str, url: str, headers: Optional[dict] = None):
+        # pseudo-headers, i.e. :authority, can't be sent by requests
+        headers = {name: value for name, value in (headers or {}).items() if not name.startswith(':')}
+        with self._lock:
+            self._templates[endpoint] = RequestTemplate(endpoint, url, headers)
+
+    def invalidate(self, endpoint: str):
+        """Drops the template for an endpoint, or for the endpoint it is a sub-path of, i.e. replies of comments."""
+        with self._lock:
+            for template_endpoint in list(self._templates):
+                if endpoint.startswith(template_endpoint):
+                    del self._templates[template_endpoint]
+
+    def on_response(self, response):
+        """Response listener for PyTok, capturing templates from the browser's own API requests."""
+        endpoint = endpoint_for(response.url)
+        if endpoint is None or not hasattr(response, '_body'):
+            return
+        reason = is_throttled(response.status, response._body)
+        if reason == VERIFY:
+            self.invalidate(endpoint)
+        elif reason is None:
+            self.capture(endpoint, response.url, response.request.headers)
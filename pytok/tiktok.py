@@ -1,10 +1,12 @@
+import asyncio
 import logging
 import os
 import re
 import time
 import uuid  # Add uuid for instance IDs
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, AsyncIterator, Callable, Iterable
 
+import requests
 from browserforge.injectors.playwright import AsyncNewContext
 from browserforge.headers import Browser as ForgeBrowser
 from playwright.async_api import async_playwright
@@ -20,12 +22,27 @@ from .api.trending import Trending
 from .exceptions import *
 from .utils import LOGGER_NAME
 from .captcha_solver import CaptchaSolver
+from .tracing import Tracer, JsonLinesExporter, NOOP_TRACER
+from .recording import Recorder, Replayer
+from .governor import RateGovernor, egress_governor, is_throttled, DEFAULT_EGRESS
+from .sessions import SessionStore
+from .templates import RequestTemplateCache, endpoint_for
+from .strategies import StrategySelector
+from .cache import EntityCache
+from .comment_state import CommentStateStore
+from .trajectories import TRAJECTORIES
+from .concurrency import BoundedSeenSet, CrawlProgress, merge
+from . import metrics
 from dataclasses import dataclass
 
 os.environ["no_proxy"] = "127.0.0.1,localhost"
 
 BASE_URL = "https://m.tiktok.com/"
 DESKTOP_BASE_URL = "https://www.tiktok.com/"
+# seconds to connect, and to wait for each read, of a direct request
+HTTP_TIMEOUT = (10, 30)
+# pixels, covering the slide captcha's drags, whose trajectories are generated at startup
+TRAJECTORY_WARM_DISTANCES = range(25, 400, 25)
 
 
 class PyTok:
@@ -37,12 +54,24 @@ class PyTok:
     def __init__(
             self,
             logging_level: int = logging.WARNING,
-            request_delay: Optional[int] = 0,
+            request_delay: Optional[float] = 1.0,
             headless: Optional[bool] = False,
             browser: Optional[str] = "chromium",
             manual_captcha_solves: Optional[bool] = False,
             log_captcha_solves: Optional[bool] = False,
             instance_id: Optional[str] = None,
+            fine_grained_scroll: Optional[bool] = False,
+            tracer: Optional[Tracer] = None,
+            trace_file: Optional[str] = None,
+            record_path: Optional[str] = None,
+            replay_path: Optional[str] = None,
+            base_url: Optional[str] = DESKTOP_BASE_URL,
+            egress: Optional[str] = DEFAULT_EGRESS,
+            rate_governor: Optional[RateGovernor] = None,
+            session_store: Optional[SessionStore] = None,
+            strategy_selector: Optional[StrategySelector] = None,
+            entity_cache: Optional[EntityCache] = None,
+            comment_state_store: Optional[CommentStateStore] = None,
     ):
         """The PyTok class. Used to interact with TikTok.
 
@@ -52,11 +81,56 @@ class PyTok:
 
         * request_delay: The amount of time in seconds to wait before making a request, optional
             This is used to throttle your own requests as you may end up making too
-            many requests to TikTok for your IP.
+            many requests to TikTok for your IP. It sets the starting rate of the rate
+            governor, 1 request per second by default, which then speeds up while TikTok
+            responds normally and slows down when it pushes back. Requests are also held to
+            the rate limit of the instance's egress, which starts at 2 requests per second and
+            is shared with every instance in the process. 0 or None turns pacing off, both the
+            instance's and the egress's, and requests are made without delay.
 
         * instance_id: Optional unique identifier for this instance
             If not provided, a random UUID will be generated.
 
+        * fine_grained_scroll: Scroll step by step from Python rather than inside the page, optional
+            Every step is a separate browser round-trip, so this is much slower, but it
+            can be useful when tuning scrolling behaviour against bot detection.
+
+        * tracer: A pytok.tracing.Tracer to record per-phase latency spans with, optional
+            Use this to export spans to OpenTelemetry via pytok.tracing.OpenTelemetryExporter.
+
+        * trace_file: Path of a JSON-lines file to append latency spans to, optional
+            Tracing is disabled, and adds no overhead, if neither tracer nor trace_file is given.
+
+        * record_path: Path to save all network traffic of this session to as a HAR-like archive, optional
+
+        * replay_path: Path of an archive saved with record_path to serve all network traffic from, optional
+            Requests that were not recorded are aborted, so the session runs entirely offline.
+
+        * base_url: The root URL of TikTok to scrape, optional
+            Point this at a pytok.simulator.Simulator to load test against a local stand-in.
+
+        * egress: Name of the IP or proxy this instance's traffic leaves through, optional
+            All instances in the process with the same egress share a rate limit, which starts
+            at 2 and goes up to at most 10 requests per second.
+
+        * rate_governor: A pytok.governor.RateGovernor to pace requests with, optional
+            Used instead of the governors set up from request_delay and egress.
+
+        * session_store: A pytok.sessions.SessionStore, or the path of its directory, optional
+            The instance starts from the healthiest saved session instead of a fresh context,
+            and saves its session back to the store on shutdown.
+
+        * strategy_selector: A pytok.strategies.StrategySelector to choose between fetch strategies with, optional
+            Share one between instances so that a strategy found failing by one is skipped by all.
+
+        * entity_cache: A pytok.cache.EntityCache, or the path of its SQLite file, optional
+            User info, user videos and video info are served from the cache while it has
+            them, and stale entries are refreshed in the background where possible.
+
+        * comment_state_store: A pytok.comment_state.CommentStateStore, or the path of its SQLite file, optional
+            Keeps track of the comments crawled per video, for Video.comments(incremental=True).
+            States are only kept in memory if not given.
+
         * **kwargs
             Parameters that are passed on to basically every module and methods
             that interact with this main class. These may or may not be documented
@@ -68,9 +142,31 @@ class PyTok:
         self._browser_type = browser  # Renamed to avoid conflict with instance
         self._manual_captcha_solves = manual_captcha_solves
         self._log_captcha_solves = log_captcha_solves
+        self._fine_grained_scroll = fine_grained_scroll
+        if tracer is None and trace_file is not None:
+            tracer = Tracer(JsonLinesExporter(trace_file))
+        self._tracer = tracer or NOOP_TRACER
+        self._recorder = Recorder(record_path) if record_path else None
+        self._replayer = Replayer(replay_path) if replay_path else None
+        self._base_url = base_url.rstrip('/')
         
         # Assign a unique ID to this instance
         self.instance_id = instance_id or str(uuid.uuid4())
+
+        if rate_governor is None and request_delay:
+            rate_governor = RateGovernor(
+                self.instance_id,
+                initial_rate=1 / request_delay,
+                parent=egress_governor(egress, initial_rate=2.0, max_rate=10.0),
+            )
+        # None when pacing is turned off
+        self._governor = rate_governor
+        if isinstance(session_store, str):
+            session_store = SessionStore(session_store)
+        self._session_store = session_store
+        self._session = None
+        # held by concurrent crawls while they use the page, as only one navigation can happen at a time
+        self._page_lock = asyncio.Lock()
         
         # Stats tracking
         self.created_at = time.time()
@@ -85,7 +181,17 @@ class PyTok:
         # Create a local instance attribute to store API parent references
         self._api_classes = {}
         
-        self.request_cache = {}
+        self._request_templates = RequestTemplateCache()
+        self._strategies = strategy_selector or StrategySelector()
+        if isinstance(entity_cache, str):
+            entity_cache = EntityCache(entity_cache)
+        self._entity_cache = entity_cache
+        if isinstance(comment_state_store, str):
+            comment_state_store = CommentStateStore(comment_state_store)
+        self._comment_states = comment_state_store or CommentStateStore()
+        # background refreshes of stale cache entries, by (kind, key)
+        self._revalidations = {}
+        self._trajectory_warmup = None
         self._playwright = None
         self._browser = None
         self._context = None
@@ -178,8 +284,178 @@ class PyTok:
             trending_instance.parent = self
             return trending_instance
 
+    async def hashtags_videos(
+            self,
+            names: Iterable[str],
+            count: int = 30,
+            concurrency: int = 4,
+            max_seen: int = 100_000,
+            on_progress: Optional[Callable[[CrawlProgress], None]] = None,
+            **kwargs,
+    ) -> AsyncIterator[Video]:
+        """
+        Crawls the videos of many hashtags concurrently, yielding each video only once.
+
+        Hashtag pages are loaded one at a time, but once a hashtag's page has been loaded its videos
+        are paged directly from the API alongside those of other hashtags.
+
+        - Parameters:
+            - names (list): The hashtags to crawl, omitting the #.
+            - count (int): The amount of videos to get from each hashtag.
+            - concurrency (int): The number of hashtags to crawl at once.
+            - max_seen (int): The number of video ids to remember for deduplication.
+            - on_progress (callable): Called with a pytok.concurrency.CrawlProgress whenever a hashtag makes progress.
+
+        Each yielded video has a matched_hashtags list of the hashtags it was found under. Hashtags
+        found after the video was yielded are appended to the list.
+
+        Example Usage
+        ```py
+        async for video in api.hashtags_videos(['funny', 'cats'], count=100):
+            print(video.id, video.matched_hashtags)
+        ```
+        """
+        names = list(dict.fromkeys(names))
+        seen = BoundedSeenSet(max_seen)
+        progress = {name: CrawlProgress(name) for name in names}
+
+        def report(name):
+            if on_progress:
+                on_progress(progress[name])
+
+        def on_done(name, error):
+            progress[name].done = True
+            progress[name].error = error
+            if error is not None:
+                self.logger.warning(f"Failed to crawl hashtag {name}: {error}")
+            report(name)
+
+        def crawl(name):
+            async def videos():
+                hashtag = self.hashtag(name=name)
+                async with self._page_lock:
+                    await hashtag.info()
+                # scraping holds the page lock while it scrolls
+                async for video in hashtag._get_videos(count, **kwargs):
+                    yield video
+            return videos
+
+        async for name, video in merge({name: crawl(name) for name in names}, concurrency, on_done=on_done):
+            progress[name].items += 1
+            previous = seen.get(video.id)
+            if previous is not None:
+                if name not in previous.matched_hashtags:
+                    previous.matched_hashtags.append(name)
+                report(name)
+                continue
+            video.matched_hashtags = [name]
+            seen.add(video.id, video)
+            progress[name].new_items += 1
+            report(name)
+            metrics.ITEMS_YIELDED.labels(kind='video').inc()
+            yield video
+
+    async def users_info(
+            self,
+            usernames: Iterable[str],
+            concurrency: int = 8,
+            on_error: Optional[Callable[[str, Exception], None]] = None,
+    ) -> AsyncIterator:
+        """
+        Looks up the info of many users concurrently, yielding (username, info) pairs as they arrive.
+
+        Profile pages aren't loaded where it can be helped: each user's info comes from the entity
+        cache, the user detail API once its request template has been captured, or the profile's
+        HTML document fetched with the session's cookies, and only as a last resort from loading
+        the profile in the browser, one at a time.
+
+        - Parameters:
+            - usernames (list): The usernames to look up.
+            - concurrency (int): The number of lookups to run at once, which are still paced by the rate governor.
+            - on_error (callable): Called with the username and the error of each failed lookup, which is logged otherwise.
+
+        Example Usage
+        ```py
+        async for username, user_info in api.users_info(['therock', 'tiktok'], concurrency=16):
+            print(username, user_info['followerCount'], user_info['heartCount'], user_info['videoCount'])
+        ```
+        """
+        # shared by the workers, so that each username is looked up once
+        pending = iter(dict.fromkeys(usernames))
+
+        def worker():
+            async def infos():
+                for username in pending:
+                    try:
+                        user_info = await self.user(username=username)._get_info_batched()
+                    except Exception as ex:
+                        if on_error:
+                            on_error(username, ex)
+                        else:
+                            self.logger.warning(f"Failed to get info of user {username}: {ex}")
+                        continue
+                    yield username, user_info
+            return infos
+
+        async for _, (username, user_info) in merge({index: worker() for index in range(concurrency)}, concurrency):
+            metrics.ITEMS_YIELDED.labels(kind='user').inc()
+            yield username, user_info
+
+    async def searches(
+            self,
+            search_terms: Iterable[str],
+            obj_type: str = "item",
+            count: int = 28,
+            concurrency: int = 4,
+            on_progress: Optional[Callable[[CrawlProgress], None]] = None,
+            **kwargs,
+    ) -> AsyncIterator:
+        """
+        Runs many searches concurrently, yielding (search_term, result) pairs as results arrive.
+
+        - Parameters:
+            - search_terms (list): The phrases to search for.
+            - obj_type (str): user | item
+            - count (int): The amount of results to get for each search term.
+            - concurrency (int): The number of searches to run at once.
+            - on_progress (callable): Called with a pytok.concurrency.CrawlProgress whenever a search makes progress.
+
+        Example Usage
+        ```py
+        async for search_term, video in api.searches(['cats', 'dogs'], count=100):
+            # do something
+        ```
+        """
+        search_terms = list(dict.fromkeys(search_terms))
+        progress = {search_term: CrawlProgress(search_term) for search_term in search_terms}
+
+        def on_done(search_term, error):
+            progress[search_term].done = True
+            progress[search_term].error = error
+            if error is not None:
+                self.logger.warning(f"Failed to search for {search_term}: {error}")
+            if on_progress:
+                on_progress(progress[search_term])
+
+        def search(search_term):
+            return lambda: self.search(search_term=search_term).search_type(obj_type, count=count, **kwargs)
+
+        sources = {search_term: search(search_term) for search_term in search_terms}
+        async for search_term, result in merge(sources, concurrency, on_done=on_done):
+            progress[search_term].items += 1
+            progress[search_term].new_items += 1
+            if on_progress:
+                on_progress(progress[search_term])
+            yield search_term, result
+
     async def __aenter__(self):
+        with self._tracer.span('pytok.start', instance_id=self.instance_id, browser=self._browser_type):
+            return await self._start()
+
+    async def _start(self):
         self.logger.info(f"Initializing PyTok instance {self.instance_id}")
+        if not self._manual_captcha_solves:
+            self._trajectory_warmup = asyncio.create_task(self._warm_trajectories())
         self._playwright = await async_playwright().start()
         fingerprint_options = {}
         if self._browser_type == "firefox":
@@ -192,8 +468,21 @@ class PyTok:
             raise Exception("Browser not supported")
         self._context = await AsyncNewContext(self._browser, fingerprint_options=fingerprint_options)
         device_config = self._playwright.devices['Desktop Chrome']
-        self._context = await self._browser.new_context(**device_config)
+        storage_state = None
+        if self._session_store:
+            self._session = self._session_store.checkout(self._browser_type)
+            if self._session:
+                self.logger.info(f"PyTok instance {self.instance_id} resuming session {self._session.id}")
+                device_config = self._session.fingerprint['context_options']
+                storage_state = self._session.storage_state
+            else:
+                self._session = self._session_store.new(
+                    {'browser_type': self._browser_type, 'context_options': device_config})
+        self._context = await self._browser.new_context(**device_config, storage_state=storage_state)
         await Malenia.apply_stealth(self._context)
+        if self._replayer:
+            self._replayer.start_server()
+            await self._context.route('**/*', self._replayer.route)
         self._page = await self._context.new_page()
 
         # move mouse to 0, 0 to have known mouse start position
@@ -201,6 +490,11 @@ class PyTok:
 
         self._requests = []
         self._responses = []
+        self._response_listeners = []
+        self._response_listeners.append(self._govern_response)
+        self._response_listeners.append(self._request_templates.on_response)
+        if self._recorder:
+            self._response_listeners.append(self._recorder.on_response)
 
         self._page.on("request", lambda request: self._requests.append(request))
 
@@ -210,6 +504,9 @@ class PyTok:
                 response._body = await response.body()
             except Exception:
                 pass
+            finally:
+                for listener in list(self._response_listeners):
+                    listener(response)
 
         self._page.on("response", save_responses_and_body)
 
@@ -218,9 +515,87 @@ class PyTok:
         self.logger.info(f"PyTok instance {self.instance_id} initialized successfully")
         return self
 
+    def _http_get(self, url, headers=None, cookies=None, timeout=HTTP_TIMEOUT, stream=False) -> requests.Response:
+        """
+        Makes a direct HTTP request outside of the browser, recording or replaying it if enabled.
+        This blocks, so call it from a worker thread, i.e. with asyncio.to_thread.
+        """
+        request_url = url
+        if self._replayer:
+            request_url, headers = self._replayer.rewrite(url, headers)
+        r = requests.get(request_url, headers=headers, cookies=cookies, timeout=timeout, stream=stream)
+        if self._recorder:
+            self._recorder.record_direct(url, r, stream=stream)
+        return r
+
+    def _govern_response(self, response):
+        # only API responses say anything about how TikTok sees our request rate, and responses
+        # without a body, i.e. redirects, say nothing at all
+        if '/api/' in response.url and hasattr(response, '_body'):
+            self._observe(response.url, response.status, response._body)
+
+    def _observe(self, url, status, body):
+        """
+        Feeds back the outcome of an API response to the rate governor and session health.
+        Called on the event loop, as neither is safe to update from other threads.
+        """
+        if status != 200 and status != 429 and status < 500:
+            # redirects, beacons and client errors say nothing about how TikTok sees our request rate
+            return
+        data_endpoint = endpoint_for(url) is not None
+        if not body and not data_endpoint:
+            return
+        reason = is_throttled(status, body, expect_body=data_endpoint)
+        if reason is None:
+            if self._governor:
+                self._governor.success()
+            if self._session:
+                self._session.record(None)
+        else:
+            self._throttle(reason)
+
+    def _throttle(self, reason):
+        """Records TikTok pushing back, i.e. with a captcha."""
+        if self._governor:
+            self._governor.throttle(reason)
+        if self._session:
+            self._session.record(reason)
+
+    async def _cache_lookup(self, kind, key, revalidate=None, keys=None):
+        """
+        Returns the cached value of an entity, or None if it has to be fetched. A stale value is
+        returned too, after starting a background refresh with revalidate(stale_value), whose
+        result is stored under keys(value), or under key if keys isn't given.
+        """
+        if self._entity_cache is None or not key:
+            return None
+        # the disk tier queries SQLite, which would hold up every other crawl on the event loop
+        entry = await asyncio.to_thread(self._entity_cache.get, kind, key)
+        if entry is None:
+            metrics.CACHE_LOOKUPS.labels(kind=kind, result='miss').inc()
+            return None
+        metrics.CACHE_LOOKUPS.labels(kind=kind, result='fresh' if entry.fresh else 'stale').inc()
+        if not entry.fresh and revalidate is not None and (kind, key) not in self._revalidations:
+            async def refresh():
+                try:
+                    value = await revalidate(entry.value)
+                    await self._cache_store(kind, keys(value) if keys else [key], value)
+                except Exception as ex:
+                    # the stale value is served until it is dropped or fetched again
+                    self.logger.debug(f"Failed to refresh cached {kind} {key}: {ex}")
+                finally:
+                    self._revalidations.pop((kind, key), None)
+            self._revalidations[(kind, key)] = asyncio.create_task(refresh())
+        return entry.value
+
+    async def _cache_store(self, kind, keys, value):
+        if self._entity_cache is not None:
+            await asyncio.to_thread(self._entity_cache.set, kind, keys, value)
+
     async def request_delay(self):
-        if self._request_delay is not None:
-            await self._page.wait_for_timeout(self._request_delay * 1000)
+        """Waits until the rate governor allows another request."""
+        if self._governor:
+            await self._governor.acquire()
 
     def __del__(self):
         """A basic cleanup method, called automatically from the code"""
@@ -240,9 +615,32 @@ class PyTok:
         if m:
             return m.group(1)
 
+    async def _warm_trajectories(self):
+        """Fills the trajectory cache in a thread, so that the first captchas don't generate trajectories on the event loop."""
+        try:
+            # a bucket at a time, so that shutting down doesn't wait for the rest
+            for distance in TRAJECTORY_WARM_DISTANCES:
+                await asyncio.to_thread(TRAJECTORIES.warm, [distance])
+        except Exception as ex:
+            # gestures generate their own trajectories instead
+            self.logger.debug(f"Failed to warm up captcha trajectories: {ex}")
+
     async def shutdown(self) -> None:
         self.logger.info(f"Shutting down PyTok instance {self.instance_id}")
+        background = list(self._revalidations.values())
+        if self._trajectory_warmup:
+            background.append(self._trajectory_warmup)
+        for task in background:
+            task.cancel()
+        await asyncio.gather(*background, return_exceptions=True)
         try:
+            if self._session:
+                storage_state = None
+                try:
+                    storage_state = await self._context.storage_state() if self._context else None
+                finally:
+                    self._session_store.checkin(self._session, storage_state)
+                    self._session = None
             if self._context:
                 await self._context.close()
             if self._browser:
@@ -252,6 +650,13 @@ class PyTok:
         except Exception as e:
             self.logger.error(f"Error during shutdown of instance {self.instance_id}: {str(e)}")
         finally:
+            self._tracer.shutdown()
+            if self._governor:
+                self._governor.close()
+            if self._recorder:
+                self._recorder.save()
+            if self._replayer:
+                self._replayer.shutdown()
             if self._headless:
                 display = getattr(self, "_display", None)
                 if display:
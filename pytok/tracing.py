@@ -0,0 +1,297 @@
+"""
+Lightweight latency tracing for PyTok operations.
+
+Spans are opened around the major methods of PyTok and the API classes and record their name,
+attributes (username, endpoint, cursor, bytes, ...) and duration. Finished spans are handed to an
+exporter, either a local JSON-lines file or an OpenTelemetry tracer provider.
+
+Example Usage
+```py
+async with PyTok(trace_file='trace.jsonl') as api:
+    ...
+```
+
+When no exporter is configured the tracer is disabled, and traced methods call straight through
+to the underlying method without creating any spans.
+"""
+import contextvars
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Optional
+
+_current_span = contextvars.ContextVar('pytok_current_span', default=None)
+
+
+class Span:
+    """A single timed operation."""
+
+    __slots__ = ('name', 'attributes', 'trace_id', 'span_id', 'parent_id', 'start', 'end', 'error', 'exporter_state')
+
+    def __init__(self, name: str, attributes: dict, parent: Optional['Span'] = None):
+        self.name = name
+        self.attributes = attributes
+        self.trace_id = parent.trace_id if parent is not None else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent is not None else None
+        self.start = time.time()
+        self.end = None
+        self.error = None
+        self.exporter_state = None
+
+    @property
+    def duration(self) -> Optional[float]:
+        if self.end is None:
+            return None
+        return self.end - self.start
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def set_attributes(self, **attributes):
+        self.attributes.update(attributes)
+
+    def record_error(self, error: BaseException):
+        self.error = f"{type(error).__name__}: {error}"
+
+    def to_dict(self) -> dict:
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start': self.start,
+            'duration_ms': self.duration * 1000 if self.duration is not None else None,
+            'attributes': self.attributes,
+            'error': self.error,
+        }
+
+
+class _NoopSpan:
+    """Stands in for a span when tracing is disabled."""
+
+    def set_attribute(self, key, value):
+        pass
+
+    def set_attributes(self, **attributes):
+        pass
+
+    def record_error(self, error):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class _SpanContext:
+    def __init__(self, tracer: 'Tracer', name: str, attributes: dict):
+        self._tracer = tracer
+        self._name = name
+        self._attributes = attributes
+        self._span = None
+        self._token = None
+
+    def __enter__(self) -> Span:
+        self._span = self._tracer.start_span(self._name, **self._attributes)
+        self._token = _current_span.set(self._span)
+        return self._span
+
+    def __exit__(self, exc_type, exc, tb):
+        _current_span.reset(self._token)
+        if exc is not None and isinstance(exc, Exception):
+            self._span.record_error(exc)
+        self._tracer.end_span(self._span)
+        return False
+
+    async def __aenter__(self) -> Span:
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return self.__exit__(exc_type, exc, tb)
+
+
+class JsonLinesExporter:
+    """Appends every finished span to a local file, one JSON object per line."""
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def start(self, span: Span):
+        pass
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+
+    def shutdown(self):
+        with self._lock:
+            self._file.close()
+
+
+class OpenTelemetryExporter:
+    """
+    Forwards spans to an OpenTelemetry tracer provider, so they can be shipped with any
+    OpenTelemetry span exporter. Requires the opentelemetry-api package.
+    """
+
+    def __init__(self, tracer_provider=None, instrumentation_name: str = 'pytok'):
+        try:
+            from opentelemetry import trace
+        except ImportError as e:
+            raise ImportError(
+                "OpenTelemetryExporter requires the opentelemetry-api package: pip install opentelemetry-api") from e
+        self._trace = trace
+        self._tracer = trace.get_tracer(instrumentation_name, tracer_provider=tracer_provider)
+
+    def start(self, span: Span):
+        context = None
+        parent = _current_span.get()
+        if parent is not None and parent.exporter_state is not None:
+            context = self._trace.set_span_in_context(parent.exporter_state)
+        span.exporter_state = self._tracer.start_span(
+            span.name, context=context, start_time=int(span.start * 1e9))
+
+    def export(self, span: Span):
+        otel_span = span.exporter_state
+        if otel_span is None:
+            return
+        for key, value in span.attributes.items():
+            if value is not None:
+                otel_span.set_attribute(key, value if isinstance(value, (str, bool, int, float)) else str(value))
+        if span.error is not None:
+            otel_span.set_status(self._trace.Status(self._trace.StatusCode.ERROR, span.error))
+        otel_span.end(end_time=int(span.end * 1e9))
+
+    def shutdown(self):
+        pass
+
+
+class Tracer:
+    """
+    Creates spans and hands them to an exporter once they finish.
+
+    Example Usage
+    ```py
+    tracer = Tracer(JsonLinesExporter('trace.jsonl'))
+    with tracer.span('navigate', url=url) as span:
+        ...
+        span.set_attribute('bytes', len(body))
+    ```
+    """
+
+    def __init__(self, exporter=None):
+        self.exporter = exporter
+        self.enabled = exporter is not None
+
+    def start_span(self, name: str, **attributes) -> Span:
+        span = Span(name, attributes, parent=_current_span.get())
+        self.exporter.start(span)
+        return span
+
+    def end_span(self, span: Span):
+        span.end = time.time()
+        self.exporter.export(span)
+
+    def span(self, name: str, **attributes):
+        if not self.enabled:
+            return NOOP_SPAN
+        return _SpanContext(self, name, attributes)
+
+    def shutdown(self):
+        if self.enabled:
+            self.exporter.shutdown()
+
+
+NOOP_TRACER = Tracer()
+
+
+def get_tracer(obj) -> Tracer:
+    """Finds the tracer of a PyTok instance, or of the PyTok instance an API object belongs to."""
+    owner = getattr(obj, 'parent', None) or obj
+    return getattr(owner, '_tracer', None) or NOOP_TRACER
+
+
+def _resolve_attributes(obj, attribute_names: dict) -> dict:
+    return {key: getattr(obj, name, None) for key, name in attribute_names.items()}
+
+
+async def _traced_coroutine(tracer, name, attributes, coroutine):
+    with tracer.span(name, **attributes):
+        return await coroutine
+
+
+async def _traced_async_generator(tracer, name, attributes, generator):
+    span = tracer.start_span(name, **attributes)
+    items = 0
+    try:
+        while True:
+            # only mark the span as current while the generator is running, not while the consumer is
+            token = _current_span.set(span)
+            try:
+                item = await generator.__anext__()
+            except StopAsyncIteration:
+                break
+            finally:
+                _current_span.reset(token)
+            items += 1
+            yield item
+    except Exception as e:
+        span.record_error(e)
+        raise
+    finally:
+        span.set_attribute('items', items)
+        await generator.aclose()
+        tracer.end_span(span)
+
+
+def traced(name: str, **attribute_names):
+    """
+    Decorates an async method or async generator method so that each call is recorded as a span.
+
+    Keyword arguments map span attribute names to attributes of the object the method is called on,
+    i.e. `@traced('user.videos', username='username')`. Async generators get a span covering the
+    whole iteration, with the number of items yielded recorded as the 'items' attribute.
+    """
+    def decorator(func):
+        if inspect.isasyncgenfunction(func):
+            @functools.wraps(func)
+            def generator_wrapper(self, *args, **kwargs):
+                tracer = get_tracer(self)
+                if not tracer.enabled:
+                    return func(self, *args, **kwargs)
+                attributes = _resolve_attributes(self, attribute_names)
+                return _traced_async_generator(tracer, name, attributes, func(self, *args, **kwargs))
+            return generator_wrapper
+
+        @functools.wraps(func)
+        def coroutine_wrapper(self, *args, **kwargs):
+            tracer = get_tracer(self)
+            if not tracer.enabled:
+                return func(self, *args, **kwargs)
+            attributes = _resolve_attributes(self, attribute_names)
+            return _traced_coroutine(tracer, name, attributes, func(self, *args, **kwargs))
+        return coroutine_wrapper
+
+    return decorator
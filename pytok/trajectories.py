@@ -0,0 +1,202 @@
+"""
+Human-like mouse trajectories for captcha drag gestures, and a dispatcher that replays them cheaply.
+
+A trajectory is a whole pointer path precomputed with timestamps: a HumanCurve resampled at a
+mouse's polling rate, over a duration given by Fitts' law. Generating a curve is slow, so the
+TrajectoryCache keeps a few trajectories per distance bucket and fits one to each gesture, with
+a little jitter so that no two gestures are identical. The MouseDispatcher then replays the path
+over a single CDP session, sending each batch of events in one go and stamping every event with
+its intended time, rather than awaiting a round-trip per point.
+
+Example Usage
+```py
+dispatcher = MouseDispatcher(page)
+await dispatcher.move(TRAJECTORIES.between((0, 0), (120, 300)))
+await dispatcher.down(120, 300)
+await dispatcher.move(TRAJECTORIES.between((120, 300), (290, 300)), buttons=1)
+await dispatcher.up(290, 300)
+await dispatcher.close()
+```
+"""
+import asyncio
+import math
+import random
+import threading
+import time
+from typing import Callable, Dict, List, Sequence, Tuple
+
+# (x, y, seconds since the start of the gesture)
+Point = Tuple[float, float, float]
+
+CURVE_KWARGS = {
+    'knotsCount': 7,
+    'distortionMean': 14.3,
+    'distortionStdev': 22.7,
+    'distortionFrequency': 0.8,
+    'targetPoints': 500,
+}
+# how often a typical mouse reports its position
+POLLING_RATE = 125
+
+
+def gesture_duration(distance: float) -> float:
+    """Seconds a person takes to move the pointer a distance, by Fitts' law with a target about 20 pixels wide."""
+    return 0.25 + 0.1 * math.log2(1 + distance / 20)
+
+
+def generate_trajectory(distance: float, rate: int = POLLING_RATE) -> List[Point]:
+    """Returns a trajectory from (0, 0) to (distance, 0), resampled at rate points per second."""
+    # only needed to generate trajectories, which the cache does rarely
+    from pyclick import HumanCurve
+
+    distance = max(1, int(round(distance)))
+    curve = HumanCurve([0, 0], [distance, 0], **CURVE_KWARGS).points
+    duration = gesture_duration(distance) * random.uniform(0.85, 1.15)
+    count = max(2, int(duration * rate))
+    # the curve is tweened, so evenly spaced samples keep its speeding up and slowing down
+    trajectory = []
+    for i in range(count):
+        x, y = curve[round(i * (len(curve) - 1) / (count - 1))]
+        trajectory.append((float(x), float(y), duration * i / (count - 1)))
+    return trajectory
+
+
+def fit_trajectory(trajectory: Sequence[Point], start: Tuple[float, float], end: Tuple[float, float],
+                   jitter: float = 0.0) -> List[Point]:
+    """Scales and rotates a trajectory from (0, 0) to (length, 0) so that it runs from start to end instead."""
+    length = trajectory[-1][0] or 1.0
+    dx, dy = end[0] - start[0], end[1] - start[1]
+    # the rotation, scaled by how much longer or shorter the gesture is than the trajectory
+    cos, sin = dx / length, dy / length
+    points = []
+    for i, (x, y, t) in enumerate(trajectory):
+        if 0 < i < len(trajectory) - 1 and jitter:
+            y += random.uniform(-jitter, jitter)
+        points.append((start[0] + x * cos - y * sin, start[1] + x * sin + y * cos, t))
+    points[-1] = (end[0], end[1], points[-1][2])
+    return points
+
+
+class TrajectoryCache:
+    """A few pre-generated trajectories per distance bucket, reused for every gesture of about that distance."""
+
+    def __init__(self, bucket_size: int = 25, variants: int = 8,
+                 generate: Callable[[float], List[Point]] = generate_trajectory):
+        """
+        ##### Parameters
+        * bucket_size: Width in pixels of the distance buckets
+        * variants: The number of trajectories to keep per bucket, one of which is picked at random
+        * generate: Function returning a trajectory from (0, 0) to (distance, 0)
+        """
+        self.bucket_size = bucket_size
+        self.variants = variants
+        self._generate = generate
+        self._lock = threading.Lock()
+        self._buckets: Dict[int, List[List[Point]]] = {}
+
+    def _bucket(self, distance):
+        return max(1, int(round(distance / self.bucket_size)))
+
+    def get(self, distance: float) -> List[Point]:
+        """Returns a trajectory about distance long, generating one if its bucket isn't full yet."""
+        bucket = self._bucket(distance)
+        with self._lock:
+            trajectories = self._buckets.setdefault(bucket, [])
+            if len(trajectories) >= self.variants:
+                return random.choice(trajectories)
+        trajectory = self._generate(bucket * self.bucket_size)
+        with self._lock:
+            if len(trajectories) < self.variants:
+                trajectories.append(trajectory)
+        return trajectory
+
+    def warm(self, distances: Sequence[float]):
+        """Fills the buckets of the given distances, i.e. from a background thread at startup."""
+        for distance in distances:
+            bucket = self._bucket(distance)
+            while len(self._buckets.get(bucket, [])) < self.variants:
+                self.get(distance)
+
+    def between(self, start: Tuple[float, float], end: Tuple[float, float], jitter: float = 1.0) -> List[Point]:
+        """Returns a trajectory from start to end."""
+        distance = math.hypot(end[0] - start[0], end[1] - start[1])
+        return fit_trajectory(self.get(distance), start, end, jitter=jitter)
+
+
+TRAJECTORIES = TrajectoryCache()
+
+
+class MouseDispatcher:
+    """Replays trajectories as trusted mouse events, batched over a CDP session where the browser has one."""
+
+    def __init__(self, page, batch_interval: float = 0.05):
+        """
+        ##### Parameters
+        * page: The Playwright page to dispatch events to
+        * batch_interval: Seconds of a trajectory to send at once
+        """
+        self.page = page
+        self.batch_interval = batch_interval
+        self._client = None
+        self._connected = False
+
+    async def _get_client(self):
+        if not self._connected:
+            self._connected = True
+            try:
+                self._client = await self.page.context.new_cdp_session(self.page)
+            except Exception:
+                # only chromium speaks CDP, other browsers go through page.mouse
+                self._client = None
+        return self._client
+
+    def _event(self, type, x, y, buttons=0, timestamp=None, **params):
+        event = {'type': type, 'x': x, 'y': y, 'buttons': buttons,
+                 'button': 'left' if buttons or type != 'mouseMoved' else 'none'}
+        if timestamp is not None:
+            event['timestamp'] = timestamp
+        event.update(params)
+        return event
+
+    async def move(self, trajectory: Sequence[Point], buttons: int = 0):
+        """Moves the pointer along a trajectory, keeping to its timing."""
+        client = await self._get_client()
+        if client is None:
+            for x, y, _ in trajectory:
+                await self.page.mouse.move(x, y)
+            return
+
+        loop = asyncio.get_running_loop()
+        start, wall_start = loop.time(), time.time()
+        batch = []
+        for i, (x, y, t) in enumerate(trajectory):
+            batch.append(self._event('mouseMoved', x, y, buttons, timestamp=wall_start + t))
+            if t - (batch[0]['timestamp'] - wall_start) < self.batch_interval and i < len(trajectory) - 1:
+                continue
+            # send a batch once its last event is due, so the pointer never gets ahead of the path
+            await asyncio.sleep(max(0.0, start + t - loop.time()))
+            await asyncio.gather(*(client.send('Input.dispatchMouseEvent', event) for event in batch))
+            batch = []
+
+    async def down(self, x: float, y: float):
+        client = await self._get_client()
+        if client is None:
+            await self.page.mouse.move(x, y)
+            await self.page.mouse.down()
+            return
+        await client.send('Input.dispatchMouseEvent', self._event('mousePressed', x, y, 1, clickCount=1))
+
+    async def up(self, x: float, y: float):
+        client = await self._get_client()
+        if client is None:
+            await self.page.mouse.up()
+            return
+        await client.send('Input.dispatchMouseEvent', self._event('mouseReleased', x, y, 0, clickCount=1))
+
+    async def close(self):
+        if self._client is not None:
+            try:
+                await self._client.detach()
+            except Exception:
+                pass
+            self._client = None
@@ -0,0 +1,148 @@
+"""
+The renditions of a video, and policies for picking which of them to download.
+
+An item's video payload has TikTok's default rendition in `playAddr`, a watermarked one in
+`downloadAddr`, and usually a list of further renditions in `bitrateInfo`, each with its bitrate,
+resolution, codec, size and the URLs of several CDNs serving it. A policy ranks the renditions,
+and a download tries them in that order, falling back to the next URL or rendition when one fails.
+
+Example Usage
+```py
+video = api.video(id='7041997751718137094')
+await video.info()
+variant = await video.select_variant(policy=TARGET_BYTES, target_bytes=2_000_000, codec='h264')
+print(f"Downloading {variant.name}, {variant.size} bytes")
+video_bytes = await video.bytes(policy=TARGET_BYTES, target_bytes=2_000_000, codec='h264')
+```
+"""
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from .exceptions import NotAvailableException
+
+# TikTok's own choice first, then the other renditions in the order TikTok lists them
+DEFAULT = 'default'
+LOWEST_BITRATE = 'lowest_bitrate'
+HIGHEST_BITRATE = 'highest_bitrate'
+MAX_RESOLUTION = 'max_resolution'
+# the largest rendition no bigger than a number of bytes, or else the smallest
+TARGET_BYTES = 'target_bytes'
+POLICIES = (DEFAULT, LOWEST_BITRATE, HIGHEST_BITRATE, MAX_RESOLUTION, TARGET_BYTES)
+
+
+@dataclass
+class VideoVariant:
+    """A rendition of a video."""
+
+    urls: List[str] = field(default_factory=list)
+    """URLs the rendition can be downloaded from, one per CDN."""
+    name: Optional[str] = None
+    """TikTok's name for the rendition, i.e. 'normal_720_0', or 'play' and 'download' for the top level addresses."""
+    bitrate: Optional[int] = None
+    """Bits per second."""
+    width: Optional[int] = None
+    height: Optional[int] = None
+    codec: Optional[str] = None
+    """i.e. 'h264' or 'h265_hvc1'."""
+    size: Optional[int] = None
+    """Bytes, if TikTok says or it has been asked of the CDN."""
+    duration: Optional[float] = None
+    """Seconds."""
+    watermarked: bool = False
+
+    @property
+    def estimated_size(self) -> Optional[int]:
+        """The size in bytes, or an estimate of it from the bitrate and duration."""
+        if self.size is not None:
+            return self.size
+        if self.bitrate and self.duration:
+            return int(self.bitrate * self.duration / 8)
+        return None
+
+
+def parse_variants(video_data: dict) -> List[VideoVariant]:
+    """Returns the renditions in an item's video payload, in the order TikTok gives them."""
+    duration = video_data.get('duration')
+    variants = []
+    if video_data.get('playAddr'):
+        variants.append(VideoVariant(
+            urls=[video_data['playAddr']],
+            name='play',
+            bitrate=video_data.get('bitrate'),
+            width=video_data.get('width'),
+            height=video_data.get('height'),
+            codec=video_data.get('codecType'),
+            duration=duration,
+        ))
+    for info in video_data.get('bitrateInfo') or []:
+        play_addr = info.get('PlayAddr') or {}
+        urls = play_addr.get('UrlList') or []
+        if not urls:
+            continue
+        variants.append(VideoVariant(
+            urls=list(urls),
+            name=info.get('GearName'),
+            bitrate=info.get('Bitrate'),
+            width=play_addr.get('Width'),
+            height=play_addr.get('Height'),
+            codec=info.get('CodecType'),
+            size=play_addr.get('DataSize'),
+            duration=duration,
+        ))
+    if video_data.get('downloadAddr'):
+        variants.append(VideoVariant(urls=[video_data['downloadAddr']], name='download', duration=duration,
+                                     watermarked=True))
+    return variants
+
+
+def _unknown_last(value, descending=False):
+    if value is None:
+        return (1, 0)
+    return (0, -value if descending else value)
+
+
+def rank_variants(variants: List[VideoVariant], policy: str = DEFAULT, target_bytes: Optional[int] = None,
+                  codec: Optional[str] = None) -> List[VideoVariant]:
+    """
+    Returns the renditions in the order to try them in, the preferred one first.
+
+    - Parameters:
+        - variants (list[VideoVariant]): The renditions of a video, as from parse_variants.
+        - policy (str): One of POLICIES.
+        - target_bytes (int): The size to stay under, for the TARGET_BYTES policy.
+        - codec (str): Only consider renditions whose codec starts with this, i.e. 'h264'.
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown rendition policy {policy!r}, expected one of {POLICIES}")
+    if policy == TARGET_BYTES and target_bytes is None:
+        raise ValueError("The target_bytes policy needs target_bytes")
+
+    if codec is not None:
+        # the watermarked download doesn't say its codec, but is always h264
+        variants = [variant for variant in variants
+                    if (variant.codec or ('h264' if variant.watermarked else '')).lower().startswith(codec.lower())]
+        if not variants:
+            raise NotAvailableException(f"Video has no {codec} rendition")
+
+    # the watermarked rendition is only ever a last resort
+    unmarked = [variant for variant in variants if not variant.watermarked]
+    watermarked = [variant for variant in variants if variant.watermarked]
+
+    if policy == LOWEST_BITRATE:
+        unmarked.sort(key=lambda variant: _unknown_last(variant.bitrate))
+    elif policy == HIGHEST_BITRATE:
+        unmarked.sort(key=lambda variant: _unknown_last(variant.bitrate, descending=True))
+    elif policy == MAX_RESOLUTION:
+        unmarked.sort(key=lambda variant: (
+            _unknown_last(variant.width * variant.height if variant.width and variant.height else None,
+                          descending=True),
+            _unknown_last(variant.bitrate, descending=True),
+        ))
+    elif policy == TARGET_BYTES:
+        fitting = [variant for variant in unmarked
+                   if variant.estimated_size is not None and variant.estimated_size <= target_bytes]
+        fitting.sort(key=lambda variant: -variant.estimated_size)
+        rest = [variant for variant in unmarked if variant not in fitting]
+        rest.sort(key=lambda variant: _unknown_last(variant.estimated_size))
+        unmarked = fitting + rest
+    return unmarked + watermarked
@@ -0,0 +1,48 @@
+from pytok.cache import EntityCache
+
+
+def test_entries_go_stale_then_expire():
+    cache = EntityCache(ttls={'user': 10}, stale_for=5)
+    cache.set('user', ['therock', 'MS4wLjABAAAA-rock'], {'uniqueId': 'therock'}, now=100)
+
+    entry = cache.get('user', 'MS4wLjABAAAA-rock', now=105)
+    assert entry.value == {'uniqueId': 'therock'} and entry.fresh
+    assert not cache.get('user', 'therock', now=112).fresh
+    assert cache.get('user', 'therock', now=116) is None
+    assert cache.get('video', 'therock', now=100) is None
+
+
+def test_memory_tier_is_lru():
+    cache = EntityCache(maxsize=2)
+    cache.set('video', ['1'], {'id': '1'})
+    cache.set('video', ['2'], {'id': '2'})
+    cache.get('video', '1')
+    cache.set('video', ['3'], {'id': '3'})
+    assert cache.get('video', '2') is None
+    assert cache.get('video', '1') is not None
+
+
+def test_disk_tier_outlives_the_process(tmp_path):
+    path = str(tmp_path / 'entities.sqlite3')
+    cache = EntityCache(path, maxsize=1)
+    cache.set('user_videos', ['therock'], {'items': [{'id': '1'}], 'complete': True})
+    cache.set('video', ['1'], {'id': '1'})
+    # evicted from memory, so read back from disk
+    assert cache.get('user_videos', 'therock').value['complete']
+    cache.close()
+
+    cache = EntityCache(path)
+    assert cache.get('video', '1').value == {'id': '1'}
+    cache.invalidate('video', '1')
+    assert cache.get('video', '1') is None
+    cache.close()
+
+
+def test_lookups_return_copies():
+    cache = EntityCache()
+    user = {'uniqueId': 'therock', 'stats': {'followerCount': 1}}
+    cache.set('user', ['therock'], user)
+    # i.e. utils.get_user_df merging stats into the user
+    user['stats']['followerCount'] = 2
+    cache.get('user', 'therock').value['stats'].update(videoCount=3)
+    assert cache.get('user', 'therock').value == {'uniqueId': 'therock', 'stats': {'followerCount': 1}}
@@ -0,0 +1,34 @@
+from pytok.comment_state import CHANGED, KNOWN, NEW, CommentStateStore
+
+
+def test_comments_are_classified_against_the_last_crawl():
+    store = CommentStateStore()
+    state = store.get('1')
+    state.record({'cid': 'a', 'create_time': 100, 'reply_comment_total': 2})
+    state.record({'cid': 'b', 'create_time': 90, 'reply_comment_total': 0})
+    assert (state.newest_cid, state.newest_create_time) == ('a', 100)
+
+    # not stored yet, so another crawl still sees nothing
+    assert store.get('1').classify({'cid': 'a', 'reply_comment_total': 2}) == NEW
+    store.set(state)
+
+    state = store.get('1')
+    assert state.classify({'cid': 'a', 'reply_comment_total': 2}) == KNOWN
+    assert state.classify({'cid': 'a', 'reply_comment_total': 3}) == CHANGED
+    assert state.classify({'cid': 'c', 'reply_comment_total': 0}) == NEW
+
+
+def test_states_outlive_the_process(tmp_path):
+    path = str(tmp_path / 'comment_state.sqlite3')
+    store = CommentStateStore(path)
+    state = store.get('1')
+    state.record({'cid': 'a', 'create_time': 100, 'reply_comment_total': 1})
+    store.set(state, now=200)
+    store.close()
+
+    store = CommentStateStore(path)
+    state = store.get('1')
+    assert state.updated_at == 200 and state.classify({'cid': 'a', 'reply_comment_total': 1}) == KNOWN
+    store.delete('1')
+    assert store.get('1').reply_totals == {}
+    store.close()
@@ -0,0 +1,98 @@
+import asyncio
+import json
+import logging
+from urllib import parse as url_parsers
+
+import pytest
+
+pytest.importorskip('playwright')
+
+from pytok.api.video import Video
+from pytok.templates import RequestTemplate
+
+TEMPLATE = RequestTemplate('api/comment/list', 'https://www.tiktok.com/api/comment/list/?aweme_id=0&cursor=0&count=20')
+
+
+class FakeResponse:
+    def __init__(self, body, status=200):
+        self.status = status
+        self._body = json.dumps(body).encode()
+
+    async def body(self):
+        return self._body
+
+
+class FakeRequest:
+    def __init__(self, response):
+        self._response = response
+
+    async def response(self):
+        return self._response
+
+
+class FakeExpectRequest:
+    def __init__(self, page, url):
+        self.page = page
+        self.url = url
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    @property
+    def value(self):
+        async def request():
+            cursor = int(url_parsers.parse_qs(url_parsers.urlparse(self.url).query)['cursor'][0])
+            return FakeRequest(FakeResponse(self.page.pages[cursor]))
+        return request()
+
+
+class FakePage:
+    """Serves comment pages by cursor, as the browser would when going to the API URL directly."""
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.visited = []
+
+    def expect_request(self, url):
+        return FakeExpectRequest(self, url)
+
+    async def goto(self, url):
+        self.visited.append(url)
+
+
+class FakeParent:
+    _tracer = None
+    logger = logging.getLogger('test_comments')
+
+    def __init__(self, page):
+        self._page = page
+
+    async def request_delay(self):
+        pass
+
+
+async def _pages(pages, count=200):
+    page = FakePage(pages)
+    video = Video(id='1', parent=FakeParent(page))
+    fetched = [comments async for comments in video._get_comment_pages_browser(count, TEMPLATE)]
+    return fetched, page.visited
+
+
+def test_browser_pages_stop_when_the_comments_run_out():
+    pages = {
+        0: {'comments': [{'cid': 'a'}, {'cid': 'b'}], 'cursor': 2, 'has_more': 1},
+        2: {'comments': [{'cid': 'c'}], 'cursor': 3, 'has_more': 0},
+    }
+    fetched, visited = asyncio.run(_pages(pages))
+    assert [[comment['cid'] for comment in comments] for comments in fetched] == [['a', 'b'], ['c']]
+    # fewer comments than asked for, but no more pages are requested
+    assert len(visited) == 2
+
+
+def test_browser_pages_of_a_video_without_comments():
+    fetched, visited = asyncio.run(_pages({0: {'comments': None, 'cursor': 0, 'has_more': 0}}))
+    assert fetched == []
+    assert len(visited) == 1
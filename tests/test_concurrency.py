@@ -0,0 +1,65 @@
+import asyncio
+
+from pytok.concurrency import BoundedSeenSet, merge
+
+
+def test_bounded_seen_set_forgets_least_recently_seen():
+    seen = BoundedSeenSet(maxsize=2)
+    seen.add('a')
+    seen.add('b')
+    seen.get('a')
+    seen.add('c')
+    assert 'a' in seen and 'c' in seen and 'b' not in seen
+    assert len(seen) == 2
+
+
+def test_merge_runs_sources_concurrently_and_reports_errors():
+    running, max_running = 0, 0
+
+    def source(items, fail=False):
+        async def iterate():
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            try:
+                for item in items:
+                    await asyncio.sleep(0.01)
+                    yield item
+                if fail:
+                    raise ValueError("source failed")
+            finally:
+                running -= 1
+        return iterate
+
+    async def run():
+        done = {}
+        sources = {'a': source([1, 2]), 'b': source([3], fail=True), 'c': source([4, 5, 6])}
+        items = [pair async for pair in merge(sources, concurrency=2, on_done=lambda key, error: done.update({key: error}))]
+        return items, done
+
+    items, done = asyncio.run(run())
+    assert sorted(item for _, item in items) == [1, 2, 3, 4, 5, 6]
+    assert max_running == 2
+    assert done['a'] is None and isinstance(done['b'], ValueError)
+
+
+def test_merge_cancels_sources_when_consumer_stops():
+    cancelled = []
+
+    def source():
+        async def iterate():
+            try:
+                for i in range(100):
+                    await asyncio.sleep(0.01)
+                    yield i
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+        return iterate
+
+    async def run():
+        async for _ in merge({'a': source(), 'b': source()}, buffer=1):
+            break
+
+    asyncio.run(run())
+    assert len(cancelled) == 2
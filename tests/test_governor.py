@@ -0,0 +1,61 @@
+import asyncio
+import time
+
+from pytok import governor, metrics
+from pytok.governor import RateGovernor, TokenBucket, is_throttled
+
+
+def test_is_throttled():
+    assert is_throttled(200, b'{"itemList": [], "hasMore": false}') is None
+    assert is_throttled(200, b'{"type": "verify", "verify_event": ""}') == governor.VERIFY
+    assert is_throttled(200, b'') == governor.EMPTY
+    # beacons and redirects have no body either, but say nothing about the request rate
+    assert is_throttled(204, b'') is None
+    assert is_throttled(302, b'') is None
+    assert is_throttled(200, b'', expect_body=False) is None
+    assert is_throttled(429, b'{}') == governor.STATUS
+    assert is_throttled(503, b'{}') == governor.STATUS
+
+
+def test_token_bucket_spaces_requests():
+    bucket = TokenBucket(rate=10, burst=2)
+    waits = [bucket.reserve() for _ in range(4)]
+    # the burst goes through immediately, then requests are a tenth of a second apart
+    assert waits[0] == waits[1] == 0
+    assert 0.05 < waits[2] <= 0.1
+    assert 0.15 < waits[3] <= 0.2
+
+
+def test_governor_is_aimd():
+    parent = RateGovernor('test-egress', scope='egress', initial_rate=4.0, max_rate=10.0)
+    rate_governor = RateGovernor('test-instance', initial_rate=2.0, increase=0.5, decrease=0.5, parent=parent)
+
+    rate_governor.observe(200, b'{"itemList": []}')
+    assert rate_governor.rate == 2.5
+    assert parent.rate == 4.05
+
+    rate_governor.observe(200, b'{"type": "verify"}')
+    assert rate_governor.rate == 1.25
+    assert parent.rate == 2.025
+
+    for _ in range(100):
+        rate_governor.success()
+    assert rate_governor.rate == rate_governor.max_rate
+
+    assert 'pytok_governor_rate{scope="instance",name="test-instance"} 5.0' in metrics.REGISTRY.expose()
+    rate_governor.close()
+    parent.close()
+    assert 'name="test-instance"' not in metrics.REGISTRY.expose()
+
+
+def test_governor_acquire_waits():
+    rate_governor = RateGovernor('test-acquire', initial_rate=20.0, max_rate=20.0)
+
+    async def run():
+        start = time.monotonic()
+        for _ in range(3):
+            await rate_governor.acquire()
+        return time.monotonic() - start
+
+    assert asyncio.run(run()) >= 0.09
+    rate_governor.close()
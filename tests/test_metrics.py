@@ -0,0 +1,39 @@
+import urllib.request
+
+from pytok import metrics
+
+
+def test_exposition_format():
+    registry = metrics.Registry()
+    pages = metrics.Counter('test_pages_loaded', "Pages loaded.", ['kind'], registry=registry)
+    latency = metrics.Histogram('test_flush_seconds', "Flush latency.", buckets=(0.1, 1.0), registry=registry)
+    rate = metrics.Gauge('test_rate', "Current rate.", registry=registry)
+
+    pages.labels(kind='user').inc()
+    pages.labels(kind='user').inc(2)
+    latency.observe(0.05)
+    latency.observe(0.5)
+    latency.observe(5)
+    rate.set(1.5)
+
+    text = registry.expose()
+    assert '# TYPE test_pages_loaded counter' in text
+    assert 'test_pages_loaded_total{kind="user"} 3.0' in text
+    assert 'test_flush_seconds_bucket{le="0.1"} 1' in text
+    assert 'test_flush_seconds_bucket{le="1.0"} 2' in text
+    assert 'test_flush_seconds_bucket{le="+Inf"} 3' in text
+    assert 'test_flush_seconds_count 3' in text
+    assert 'test_rate 1.5' in text
+
+
+def test_http_server_serves_registry():
+    registry = metrics.Registry()
+    metrics.Counter('test_requests', "Requests.", registry=registry).inc()
+    server = metrics.start_http_server(0, registry=registry)
+    try:
+        port = server.server_address[1]
+        with urllib.request.urlopen(f'http://127.0.0.1:{port}/metrics') as response:
+            body = response.read().decode()
+        assert 'test_requests_total 1.0' in body
+    finally:
+        server.shutdown()
@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+from pytok.mongo import MongoWriter
+
+
+class FakeBulkWriteError(Exception):
+    def __init__(self, index):
+        super().__init__(f"write {index} failed")
+        self.details = {'writeErrors': [{'index': index}]}
+
+
+class FakeCollection:
+    def __init__(self, name, calls):
+        self.name = name
+        self.calls = calls
+
+    def bulk_write(self, requests, ordered):
+        assert ordered
+        self.calls.append((self.name, list(requests)))
+        if 'bad' in requests:
+            raise FakeBulkWriteError(requests.index('bad'))
+        return len(requests)
+
+
+class FakeClient:
+    def __init__(self):
+        self.calls = []
+        self.closed = False
+
+    def __getitem__(self, db_name):
+        return self
+
+    def get_collection(self, name, write_concern=None):
+        return FakeCollection(name, self.calls)
+
+    def close(self):
+        self.closed = True
+
+
+def test_writes_are_batched_per_collection_and_drained_on_close():
+    client = FakeClient()
+
+    async def run():
+        writer = MongoWriter('mongodb://localhost', 'tiktok_data', client=client)
+        await writer.write('posts', ['delete 1', 'insert 1'])
+        await writer.write('posts', ['delete 2', 'insert 2'])
+        await writer.write('Creator', ['update'])
+        # started once everything is queued, so that the batches don't depend on timing
+        writer.start()
+        await writer.close()
+
+    asyncio.run(run())
+    assert client.calls == [('posts', ['delete 1', 'insert 1', 'delete 2', 'insert 2']), ('Creator', ['update'])]
+    assert client.closed
+
+
+def test_a_failed_write_only_fails_its_own_requests():
+    client = FakeClient()
+
+    async def run():
+        writer = MongoWriter('mongodb://localhost', 'tiktok_data', client=client)
+        writes = [asyncio.create_task(writer.write('posts', requests, wait=True))
+                  for requests in (['insert 1'], ['bad'], ['insert 2'])]
+        await asyncio.sleep(0)
+        writer.start()
+        results = await asyncio.gather(*writes, return_exceptions=True)
+        await writer.close()
+        return results
+
+    first, failed, last = asyncio.run(run())
+    assert client.calls[0] == ('posts', ['insert 1', 'bad', 'insert 2'])
+    assert first is None and isinstance(failed, FakeBulkWriteError)
+    # the write after the failure is sent again on its own
+    assert last == 1 and client.calls[-1] == ('posts', ['insert 2'])
+
+
+def test_closed_writer_refuses_writes():
+    async def run():
+        writer = MongoWriter('mongodb://localhost', 'tiktok_data', client=FakeClient())
+        await writer.close()
+        with pytest.raises(RuntimeError):
+            await writer.write('posts', ['insert'])
+
+    asyncio.run(run())
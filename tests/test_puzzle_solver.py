@@ -0,0 +1,37 @@
+from benchmarks import generators
+from pytok.captcha_solver import MIN_SLIDE_CONFIDENCE, PuzzleSolver
+
+SEEDS = range(8)
+
+
+def test_band_search_finds_the_hole():
+    for seed in SEEDS:
+        background, piece, x, y = generators.make_slide_captcha(seed=seed)
+        match = PuzzleSolver(background, piece, tip_y=y).match()
+        assert abs(match.x - x) <= 5
+        assert abs(match.y - y) <= 5
+        assert match.confidence >= MIN_SLIDE_CONFIDENCE
+
+
+def test_band_search_only_searches_the_band():
+    background, piece, x, y = generators.make_slide_captcha(seed=0)
+    # a tip_y well off the hole keeps the match within the band around it
+    tip_y = y + 60
+    match = PuzzleSolver(background, piece, tip_y=tip_y, band_margin=10).match()
+    assert tip_y - 10 <= match.y <= tip_y + 10
+
+
+def test_tip_y_on_another_scale_searches_the_whole_image():
+    for seed in SEEDS:
+        background, piece, x, y = generators.make_slide_captcha(seed=seed)
+        # i.e. tip_y given for a larger rendering of the background, where the band doesn't fit
+        match = PuzzleSolver(background, piece, tip_y=10_000).match()
+        assert abs(match.x - x) <= 5
+        assert match == PuzzleSolver(background, piece).match()
+
+
+def test_wrong_piece_is_not_confident():
+    for seed in SEEDS:
+        background, _, _, y = generators.make_slide_captcha(seed=seed)
+        _, other_piece, _, _ = generators.make_slide_captcha(seed=seed + 100)
+        assert PuzzleSolver(background, other_piece, tip_y=y).match().confidence < MIN_SLIDE_CONFIDENCE
@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+
+from pytok.api.base import Base
+
+
+async def _pages(num_pages, fetched, fail_at=None):
+    for i in range(num_pages):
+        await asyncio.sleep(0.01)
+        if i == fail_at:
+            raise ValueError("page failed")
+        fetched.append(i)
+        yield i
+
+
+def test_read_ahead_keeps_at_most_prefetch_pages_ahead():
+    async def run():
+        fetched, consumed = [], []
+        async for page in Base()._read_ahead(_pages(6, fetched), prefetch=2):
+            await asyncio.sleep(0.05)
+            consumed.append(page)
+            assert len(fetched) - len(consumed) <= 2
+        return consumed
+
+    assert asyncio.run(run()) == list(range(6))
+
+
+def test_read_ahead_stops_fetching_when_consumer_stops():
+    async def run():
+        fetched = []
+        async for page in Base()._read_ahead(_pages(100, fetched), prefetch=3):
+            if page == 1:
+                break
+        await asyncio.sleep(0.1)
+        return fetched
+
+    assert len(asyncio.run(run())) <= 5
+
+
+def test_read_ahead_raises_fetch_errors_to_consumer():
+    async def run():
+        consumed = []
+        async for page in Base()._read_ahead(_pages(5, [], fail_at=2), prefetch=2):
+            consumed.append(page)
+        return consumed
+
+    with pytest.raises(ValueError):
+        asyncio.run(run())
@@ -0,0 +1,94 @@
+import types
+import urllib.request
+
+from pytok.recording import NetworkArchive, Recorder, Replayer, make_entry, decode_body
+
+ITEM_LIST_URL = 'https://www.tiktok.com/api/post/item_list/?secUid=abc&cursor={cursor}&msToken={token}'
+
+
+def _item_list_entry(cursor, token, body):
+    return make_entry('GET', ITEM_LIST_URL.format(cursor=cursor, token=token), {'accept': '*/*'}, None,
+                      200, {'content-type': 'application/json'}, body, 'direct')
+
+
+def test_archive_round_trip(tmp_path):
+    archive = NetworkArchive()
+    archive.add(_item_list_entry(0, 'a', b'{"cursor": 0}'))
+    archive.add(make_entry('GET', 'https://p16.tiktokcdn.com/puzzle.jpeg', {}, None,
+                           200, {'content-type': 'image/jpeg'}, b'\xff\xd8\xff', 'browser'))
+    path = tmp_path / 'session.har.json'
+    archive.save(str(path))
+
+    loaded = NetworkArchive.load(str(path))
+    assert len(loaded.entries) == 2
+    assert decode_body(loaded.entries[1]['response']['content']) == b'\xff\xd8\xff'
+
+
+def test_match_ignores_volatile_params():
+    archive = NetworkArchive()
+    archive.add(_item_list_entry(0, 'a', b'{"cursor": 0}'))
+    archive.add(_item_list_entry(35, 'b', b'{"cursor": 35}'))
+
+    entry = archive.match('GET', ITEM_LIST_URL.format(cursor=35, token='fresh'))
+    assert decode_body(entry['response']['content']) == b'{"cursor": 35}'
+    assert archive.match('GET', 'https://www.tiktok.com/api/comment/list/?aweme_id=1') is None
+
+
+def test_replay_server_serves_recorded_response(tmp_path):
+    archive = NetworkArchive()
+    archive.add(_item_list_entry(0, 'a', b'{"cursor": 0}'))
+    path = tmp_path / 'session.har.json'
+    archive.save(str(path))
+
+    replayer = Replayer(str(path))
+    replayer.start_server()
+    try:
+        url, headers = replayer.rewrite(ITEM_LIST_URL.format(cursor=0, token='fresh'), {'accept': '*/*'})
+        assert url.startswith('http://127.0.0.1')
+        with urllib.request.urlopen(urllib.request.Request(url, headers=headers)) as response:
+            assert response.read() == b'{"cursor": 0}'
+    finally:
+        replayer.shutdown()
+
+
+class FakeStreamedResponse:
+    """The parts of a streamed requests.Response that the recorder touches."""
+
+    def __init__(self, chunks, content_type='video/mp4'):
+        self.request = types.SimpleNamespace(method='GET', headers={'range': 'bytes=0-'})
+        self.status_code = 200
+        self.headers = {'content-type': content_type}
+        self.chunks = chunks
+        self.read = 0
+        self.closed = False
+
+    @property
+    def content(self):
+        raise AssertionError("the recorder read the whole body")
+
+    def iter_content(self, chunk_size=1):
+        for chunk in self.chunks:
+            self.read += 1
+            yield chunk
+
+    def close(self):
+        self.closed = True
+
+
+def test_streamed_bodies_are_recorded_to_files_as_they_are_read(tmp_path):
+    path = str(tmp_path / 'session.har.json')
+    recorder = Recorder(path)
+    r = FakeStreamedResponse([b'abc', b'def'])
+    recorder.record_direct('https://v16.tiktokcdn.com/video.mp4', r, stream=True)
+    assert r.read == 0 and recorder.archive.entries == []
+
+    assert next(r.iter_content(1024)) == b'abc'
+    r.close()
+    assert r.closed
+    # only what was read is recorded
+    content = recorder.archive.entries[0]['response']['content']
+    assert content['size'] == 3 and 'text' not in content
+    recorder.save()
+
+    status, _, body = Replayer(path).response_for('GET', 'https://v16.tiktokcdn.com/video.mp4')
+    assert (status, body) == (200, b'abc')
@@ -0,0 +1,53 @@
+import time
+
+from pytok import governor
+from pytok.sessions import SessionStore
+
+FINGERPRINT = {'browser_type': 'chromium', 'context_options': {'user_agent': 'Mozilla/5.0', 'viewport': {'width': 1280, 'height': 720}}}
+
+
+def _storage_state(expires=-1):
+    return {'cookies': [{'name': 'msToken', 'value': 'abc', 'domain': '.tiktok.com', 'path': '/', 'expires': expires}],
+            'origins': []}
+
+
+def test_checked_in_session_is_resumed(tmp_path):
+    store = SessionStore(str(tmp_path))
+    assert store.checkout('chromium') is None
+
+    session = store.new(FINGERPRINT)
+    store.checkin(session, _storage_state())
+
+    resumed = store.checkout('chromium')
+    assert resumed.id == session.id
+    assert resumed.fingerprint == FINGERPRINT
+    assert resumed.storage_state['cookies'][0]['value'] == 'abc'
+    # only one instance gets a session at a time
+    assert store.checkout('chromium') is None
+    assert store.checkout('firefox') is None
+
+
+def test_unhealthy_and_expired_sessions_are_discarded(tmp_path):
+    store = SessionStore(str(tmp_path), max_age=60)
+
+    captcha_prone = store.new(FINGERPRINT)
+    for _ in range(3):
+        captcha_prone.record(governor.CAPTCHA)
+    store.checkin(captcha_prone, _storage_state())
+
+    stale_cookies = store.new(FINGERPRINT)
+    store.checkin(stale_cookies, _storage_state(expires=time.time() + 1))
+    time.sleep(1.1)
+
+    assert store.checkout('chromium') is None
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_healthiest_session_is_preferred(tmp_path):
+    store = SessionStore(str(tmp_path))
+    sessions = [store.new(FINGERPRINT) for _ in range(2)]
+    sessions[0].record(governor.VERIFY)
+    for session in sessions:
+        store.checkin(session, _storage_state())
+
+    assert store.checkout('chromium').id == sessions[1].id
@@ -0,0 +1,45 @@
+import json
+import urllib.request
+
+from pytok.simulator import Simulator, SimulatorConfig, encode_sec_uid, decode_sec_uid
+
+
+def _get_json(url):
+    with urllib.request.urlopen(url) as r:
+        return json.loads(r.read())
+
+
+def test_sec_uid_round_trip():
+    assert decode_sec_uid(encode_sec_uid('some.user_1')) == 'some.user_1'
+    assert decode_sec_uid('not a sec uid') is None
+
+
+def test_item_list_pages_through_account():
+    simulator = Simulator(SimulatorConfig(latency=0, videos_per_account=(80, 80)))
+    base_url = simulator.start()
+    try:
+        sec_uid = encode_sec_uid('therock')
+        ids, cursor, has_more = [], 0, True
+        while has_more:
+            page = _get_json(f"{base_url}/api/post/item_list/?secUid={sec_uid}&cursor={cursor}&count=35")
+            ids += [item['id'] for item in page['itemList']]
+            cursor, has_more = page['cursor'], page['hasMore']
+        assert len(ids) == len(set(ids)) == 80
+
+        with urllib.request.urlopen(f"{base_url}/@therock?lang=en") as r:
+            html = r.read().decode()
+        assert '__UNIVERSAL_DATA_FOR_REHYDRATION__' in html
+        assert simulator.stats()['api/post/item_list'] == 3
+    finally:
+        simulator.shutdown()
+
+
+def test_verify_responses_are_injected():
+    simulator = Simulator(SimulatorConfig(latency=0, verify_rate=1.0))
+    base_url = simulator.start()
+    try:
+        page = _get_json(f"{base_url}/api/comment/list/?aweme_id=1&cursor=0&count=20")
+        assert page['type'] == 'verify'
+        assert simulator.stats()['injected_verify'] == 1
+    finally:
+        simulator.shutdown()
@@ -0,0 +1,76 @@
+import asyncio
+import json
+import sqlite3
+
+import pytest
+
+from pytok.sinks import JsonLinesSink, SQLiteSink, Sink, pipe
+
+
+class Entity:
+    def __init__(self, data):
+        self.as_dict = data
+
+
+class SlowSink(Sink):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.batches = []
+        self.release = asyncio.Event()
+
+    async def _write_batch(self, batch):
+        await self.release.wait()
+        self.batches.append([item['id'] for item in batch])
+
+
+async def items(count):
+    for index in range(count):
+        yield Entity({'id': str(index), 'stats': {'playCount': index}})
+
+
+def test_writes_wait_while_the_previous_batch_is_written():
+    async def run():
+        sink = SlowSink(batch_size=2, flush_interval=None)
+        for index in range(3):
+            await sink.write({'id': index})
+        # the first batch is being written and the second one is filling up
+        writer = asyncio.create_task(sink.write({'id': 3}))
+        await asyncio.sleep(0.01)
+        assert not writer.done()
+        sink.release.set()
+        await writer
+        await sink.close()
+        return sink.batches
+
+    assert asyncio.run(run()) == [[0, 1], [2, 3]]
+
+
+def test_pipe_to_json_lines(tmp_path):
+    path = tmp_path / 'videos.jsonl'
+    assert asyncio.run(pipe(items(5), JsonLinesSink(str(path), batch_size=2))) == 5
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [line['id'] for line in lines] == ['0', '1', '2', '3', '4']
+    assert lines[4]['stats'] == {'playCount': 4}
+
+
+def test_sqlite_sink_upserts(tmp_path):
+    path = str(tmp_path / 'comments.sqlite3')
+
+    async def run():
+        async with SQLiteSink(path, table='comments', key='cid') as sink:
+            await sink.write({'cid': 'a', 'text': 'first'})
+            await sink.write({'cid': 'a', 'text': 'edited'})
+            await sink.write({'cid': 'b', 'text': 'second'})
+
+    asyncio.run(run())
+    rows = sqlite3.connect(path).execute('SELECT key, data FROM comments ORDER BY key').fetchall()
+    assert [(key, json.loads(data)['text']) for key, data in rows] == [('a', 'edited'), ('b', 'second')]
+
+
+def test_zstd_json_lines(tmp_path):
+    zstandard = pytest.importorskip('zstandard')
+    path = tmp_path / 'videos.jsonl.zst'
+    asyncio.run(pipe(items(3), JsonLinesSink(str(path), compression='zstd', batch_size=2)))
+    with open(path, 'rb') as f:
+        data = zstandard.ZstdDecompressor().stream_reader(f, read_across_frames=True).read()
+    assert len(data.decode().splitlines()) == 3
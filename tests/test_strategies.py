@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+
+from pytok.exceptions import ApiFailedException
+from pytok.strategies import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, StrategySelector
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_strategy(calls, name, items=(), fail=False):
+    async def strategy():
+        calls.append(name)
+        for item in items:
+            yield item
+        if fail:
+            raise ApiFailedException(f"{name} failed")
+    return strategy
+
+
+def collect(selector, strategies, **kwargs):
+    async def run():
+        return [item async for item in selector.run('api/post/item_list', strategies, **kwargs)]
+    return asyncio.run(run())
+
+
+def test_circuit_breaker_opens_and_probes():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=10, clock=clock)
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN and not breaker.allow()
+
+    clock.now = 10
+    assert breaker.state == HALF_OPEN and breaker.allow()
+    # a failed probe opens it again for another cooldown
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+    clock.now = 20
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.failures == 0
+
+
+def test_falls_back_and_skips_open_strategies():
+    clock = FakeClock()
+    selector = StrategySelector(failure_threshold=2, cooldown=60, clock=clock)
+    calls = []
+    strategies = {
+        'api': make_strategy(calls, 'api', items=[1], fail=True),
+        'scraping': make_strategy(calls, 'scraping', items=[1, 2, 3]),
+    }
+
+    assert collect(selector, strategies) == [1, 1, 2, 3]
+    assert calls == ['api', 'scraping']
+
+    # scraping is working while api is not, so scraping goes first
+    calls.clear()
+    assert collect(selector, strategies) == [1, 2, 3]
+    assert calls == ['scraping']
+    assert selector.stats('api/post/item_list', 'api').breaker.state == CLOSED
+
+    # once api's breaker is open it is skipped, until its cooldown has passed
+    selector.record('api/post/item_list', 'api', False, 1.0)
+    assert selector.order('api/post/item_list', ['api', 'scraping']) == ['scraping']
+    clock.now = 60
+    assert selector.order('api/post/item_list', ['api', 'scraping']) == ['api', 'scraping']
+
+
+def test_raises_when_every_strategy_fails():
+    selector = StrategySelector()
+    calls = []
+    strategies = {
+        'api': make_strategy(calls, 'api', fail=True),
+        'scraping': make_strategy(calls, 'scraping', fail=True),
+    }
+    with pytest.raises(ApiFailedException, match='scraping failed'):
+        collect(selector, strategies)
+    assert calls == ['api', 'scraping']
+
+
+def test_other_errors_propagate():
+    selector = StrategySelector()
+
+    async def broken():
+        raise KeyError('cursor')
+        yield
+
+    with pytest.raises(KeyError):
+        collect(selector, {'api': broken})
+    assert selector.stats('api/post/item_list', 'api').attempts == 0
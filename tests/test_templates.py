@@ -0,0 +1,48 @@
+from pytok.templates import RequestTemplateCache
+
+ITEM_LIST_URL = ('https://www.tiktok.com/api/post/item_list/?aid=1988&count=35&cursor=0'
+                 '&secUid=MS4wLjABAAAAabc&msToken=token')
+
+
+class FakeRequest:
+    def __init__(self, headers):
+        self.headers = headers
+
+
+class FakeResponse:
+    def __init__(self, url, status, body, headers=None):
+        self.url = url
+        self.status = status
+        self._body = body
+        self.request = FakeRequest(headers or {})
+
+
+def test_template_is_captured_and_rewritten():
+    templates = RequestTemplateCache()
+    templates.on_response(FakeResponse(ITEM_LIST_URL, 200, b'{"itemList": []}', {'accept': '*/*', ':authority': 'www.tiktok.com'}))
+    templates.on_response(FakeResponse('https://www.tiktok.com/api/related/item_list/?itemID=1', 200, b'{}'))
+
+    template = templates.get('api/post/item_list')
+    assert template.headers == {'accept': '*/*'}
+    url = template.url_for({'secUid': 'MS4wLjABAAAAxyz', 'cursor': 35})
+    assert 'secUid=MS4wLjABAAAAxyz' in url and 'cursor=35' in url and 'msToken=token' in url
+    assert templates.get('api/related/item_list') is None
+
+
+def test_template_is_invalidated_on_verify():
+    templates = RequestTemplateCache()
+    templates.on_response(FakeResponse(ITEM_LIST_URL, 200, b'{"itemList": []}'))
+    templates.on_response(FakeResponse(ITEM_LIST_URL, 200, b'{"type": "verify"}'))
+    assert templates.get('api/post/item_list') is None
+
+    templates.capture('api/comment/list', 'https://www.tiktok.com/api/comment/list/?aweme_id=1')
+    templates.invalidate('api/comment/list/reply')
+    assert templates.get('api/comment/list') is None
+
+
+def test_search_templates_are_captured_from_full_endpoints():
+    templates = RequestTemplateCache()
+    templates.on_response(FakeResponse('https://www.tiktok.com/api/search/item/full/?keyword=cats&offset=0', 200,
+                                       b'{"item_list": []}'))
+    url = templates.get('api/search/item').url_for({'keyword': 'dogs', 'offset': 12})
+    assert 'keyword=dogs' in url and 'offset=12' in url
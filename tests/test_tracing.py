@@ -0,0 +1,62 @@
+import asyncio
+import json
+
+from pytok.tracing import Tracer, JsonLinesExporter, traced
+
+
+class FakeParent:
+    def __init__(self, tracer):
+        self._tracer = tracer
+
+
+class FakeEntity:
+    def __init__(self, parent):
+        self.parent = parent
+        self.username = 'therock'
+
+    @traced('entity.info', username='username')
+    async def info(self):
+        with self.parent._tracer.span('navigate', url='https://www.tiktok.com/@therock'):
+            await asyncio.sleep(0)
+        return {'uniqueId': self.username}
+
+    @traced('entity.videos', username='username')
+    async def videos(self, count):
+        for i in range(count):
+            yield i
+
+
+def _read_spans(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_spans_exported_with_parents(tmp_path):
+    trace_path = tmp_path / 'trace.jsonl'
+    tracer = Tracer(JsonLinesExporter(str(trace_path)))
+    entity = FakeEntity(FakeParent(tracer))
+
+    async def run():
+        await entity.info()
+        return [video async for video in entity.videos(3)]
+
+    assert asyncio.run(run()) == [0, 1, 2]
+    tracer.shutdown()
+
+    spans = {span['name']: span for span in _read_spans(trace_path)}
+    assert spans['navigate']['parent_id'] == spans['entity.info']['span_id']
+    assert spans['entity.info']['attributes']['username'] == 'therock'
+    assert spans['entity.videos']['attributes']['items'] == 3
+    assert all(span['duration_ms'] >= 0 for span in spans.values())
+
+
+def test_disabled_tracer_calls_straight_through():
+    entity = FakeEntity(FakeParent(Tracer()))
+    generator = entity.videos(2)
+    # without an exporter the decorated method returns the undecorated generator
+    assert generator.__qualname__ == 'FakeEntity.videos'
+
+    async def run():
+        return [video async for video in generator]
+
+    assert asyncio.run(run()) == [0, 1]
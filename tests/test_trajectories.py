@@ -0,0 +1,92 @@
+import asyncio
+import math
+
+from pytok.trajectories import MouseDispatcher, TrajectoryCache, fit_trajectory
+
+
+def straight(distance):
+    # ten points over a tenth of a second, bowing out sideways in the middle
+    return [(distance * i / 9, 5 * math.sin(math.pi * i / 9), 0.1 * i / 9) for i in range(10)]
+
+
+def test_fit_trajectory_runs_from_start_to_end():
+    points = fit_trajectory(straight(100), (10, 10), (10, 60))
+    assert points[0][:2] == (10, 10)
+    assert points[-1][:2] == (10, 60)
+    # rotated a quarter turn and halved, so the bow is now along x
+    assert abs(points[4][1] - (10 + 50 * 4 / 9)) < 1e-9
+    assert points[4][0] != 10
+    assert [point[2] for point in points] == [point[2] for point in straight(100)]
+
+
+def test_cache_reuses_trajectories_per_bucket():
+    generated = []
+
+    def generate(distance):
+        generated.append(distance)
+        return straight(distance)
+
+    cache = TrajectoryCache(bucket_size=25, variants=2, generate=generate)
+    for distance in (98, 102, 110, 104):
+        cache.get(distance)
+    # 98 to 110 all fall in the 100 pixel bucket, which holds two variants
+    assert generated == [100, 100]
+    cache.get(140)
+    assert generated == [100, 100, 150]
+
+
+def test_warm_fills_buckets_ahead_of_gestures():
+    generated = []
+
+    def generate(distance):
+        generated.append(distance)
+        return straight(distance)
+
+    cache = TrajectoryCache(bucket_size=25, variants=2, generate=generate)
+    asyncio.run(asyncio.to_thread(cache.warm, range(25, 100, 25)))
+    assert generated == [25, 25, 50, 50, 75, 75]
+    cache.between((0, 0), (0, 50))
+    assert len(generated) == 6
+
+
+class FakeCDPSession:
+    def __init__(self):
+        self.events = []
+
+    async def send(self, method, params):
+        self.events.append((method, params))
+
+    async def detach(self):
+        pass
+
+
+class FakeContext:
+    def __init__(self, session):
+        self.session = session
+
+    async def new_cdp_session(self, page):
+        return self.session
+
+
+class FakePage:
+    def __init__(self, session):
+        self.context = FakeContext(session)
+
+
+def test_dispatcher_sends_timed_events_over_cdp():
+    session = FakeCDPSession()
+    page = FakePage(session)
+
+    async def drag():
+        dispatcher = MouseDispatcher(page, batch_interval=0.05)
+        await dispatcher.down(0, 0)
+        await dispatcher.move(fit_trajectory(straight(100), (0, 0), (100, 0)), buttons=1)
+        await dispatcher.up(100, 0)
+        await dispatcher.close()
+
+    asyncio.run(drag())
+    types = [params['type'] for _, params in session.events]
+    assert types == ['mousePressed'] + ['mouseMoved'] * 10 + ['mouseReleased']
+    moves = [params for _, params in session.events if params['type'] == 'mouseMoved']
+    assert all(move['buttons'] == 1 and move['button'] == 'left' for move in moves)
+    assert abs(moves[-1]['timestamp'] - moves[0]['timestamp'] - 0.1) < 1e-6
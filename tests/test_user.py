@@ -8,7 +8,8 @@ username = 'marierenaudstab'
 
 
 async def test_user_videos():
-    async with PyTok(headless=True) as api:
+    # set PYTOK_REPLAY_PATH to an archive saved with PyTok(record_path=...) to run offline
+    async with PyTok(headless=True, replay_path=os.environ.get('PYTOK_REPLAY_PATH')) as api:
         user = api.user(username=username)
         user_data = await user.info()
         count = 0
@@ -0,0 +1,55 @@
+import pytest
+
+from pytok.exceptions import NotAvailableException
+from pytok.variants import (DEFAULT, LOWEST_BITRATE, MAX_RESOLUTION, TARGET_BYTES, parse_variants,
+                            rank_variants)
+
+VIDEO_DATA = {
+    'duration': 10,
+    'playAddr': 'https://v16.tiktokcdn.com/play.mp4',
+    'downloadAddr': 'https://v16.tiktokcdn.com/download.mp4',
+    'bitrate': 1_000_000,
+    'codecType': 'h264',
+    'bitrateInfo': [
+        {'GearName': 'normal_1080_0', 'Bitrate': 2_000_000, 'CodecType': 'h265_hvc1',
+         'PlayAddr': {'Width': 1080, 'Height': 1920, 'DataSize': 2_600_000,
+                      'UrlList': ['https://v16.tiktokcdn.com/1080.mp4', 'https://v19.tiktokcdn.com/1080.mp4']}},
+        {'GearName': 'normal_720_0', 'Bitrate': 1_000_000, 'CodecType': 'h264',
+         'PlayAddr': {'Width': 720, 'Height': 1280, 'UrlList': ['https://v16.tiktokcdn.com/720.mp4']}},
+        {'GearName': 'lower_540_0', 'Bitrate': 500_000, 'CodecType': 'h264',
+         'PlayAddr': {'Width': 540, 'Height': 960, 'UrlList': []}},
+    ],
+}
+
+
+def names(variants):
+    return [variant.name for variant in variants]
+
+
+def test_variants_are_parsed_in_tiktoks_order():
+    variants = parse_variants(VIDEO_DATA)
+    # a rendition without URLs can't be downloaded
+    assert names(variants) == ['play', 'normal_1080_0', 'normal_720_0', 'download']
+    assert variants[1].urls == ['https://v16.tiktokcdn.com/1080.mp4', 'https://v19.tiktokcdn.com/1080.mp4']
+    assert variants[1].estimated_size == 2_600_000
+    assert variants[2].estimated_size == 1_250_000
+
+
+def test_policies_rank_with_the_watermarked_rendition_last():
+    variants = parse_variants(VIDEO_DATA)
+    assert names(rank_variants(variants)) == ['play', 'normal_1080_0', 'normal_720_0', 'download']
+    assert names(rank_variants(variants, LOWEST_BITRATE))[:2] == ['play', 'normal_720_0']
+    assert names(rank_variants(variants, MAX_RESOLUTION))[:2] == ['normal_1080_0', 'normal_720_0']
+    assert names(rank_variants(variants, TARGET_BYTES, target_bytes=2_000_000))[:2] == ['play', 'normal_720_0']
+    # nothing fits, so the smallest goes first
+    assert names(rank_variants(variants, TARGET_BYTES, target_bytes=1000))[:3] == ['play', 'normal_720_0', 'normal_1080_0']
+
+
+def test_codec_filters_renditions():
+    variants = parse_variants(VIDEO_DATA)
+    assert names(rank_variants(variants, DEFAULT, codec='h265')) == ['normal_1080_0']
+    assert 'normal_1080_0' not in names(rank_variants(variants, codec='h264'))
+    with pytest.raises(NotAvailableException):
+        rank_variants(variants, codec='av1')
+    with pytest.raises(ValueError):
+        rank_variants(variants, TARGET_BYTES)